@@ -4,14 +4,15 @@ import redis
 from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 from dotenv import load_dotenv
+from redis_pool import close_async_redis, get_async_redis
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Redis client
-redis_client = redis.Redis(host='localhost', port=6379, decode_responses=True)
+# Redis client (async, κοινές ρυθμίσεις pool με τον server)
+redis_client = get_async_redis()
 
 # MongoDB client  
 mongo_client = AsyncIOMotorClient('mongodb://localhost:27017')
@@ -28,7 +29,7 @@ class AnalyticsWorker:
 #Το group θα παρακολουθεί ποια messages έχουν επεξεργαστεί
     async def setup_consumer_group(self):
         try:
-            redis_client.xgroup_create(
+            await redis_client.xgroup_create(
                 self.stream_name, 
                 self.consumer_group, 
                 id="0",
@@ -56,13 +57,14 @@ class AnalyticsWorker:
                 "timestamp": fields.get("timestamp"),
                 "api_key": fields.get("api_key"),
                 "response_time_ms": float(fields.get("response_time_ms", 0)) if fields.get("response_time_ms") else None,
+                "aborted": fields.get("aborted") == "1",
                 "processed_at": datetime.now(timezone.utc).isoformat()
             }
             
             result = await analytics_db.chat_events.insert_one(mongo_doc)
             
             if result.inserted_id:
-                redis_client.xack(self.stream_name, self.consumer_group, msg_id)
+                await redis_client.xack(self.stream_name, self.consumer_group, msg_id)
                 logger.info(f"Processed message {msg_id}")
                 return True
             else:
@@ -80,7 +82,7 @@ class AnalyticsWorker:
         
         while self.running:
             try:
-                messages = redis_client.xreadgroup(
+                messages = await redis_client.xreadgroup(
                     self.consumer_group,
                     self.consumer_name,
                     streams={self.stream_name: ">"},
@@ -111,6 +113,7 @@ class AnalyticsWorker:
         finally:
             logger.info("Analytics Worker shutting down...")
             mongo_client.close()
+            await close_async_redis()
 
 async def main():
     worker = AnalyticsWorker()
@@ -0,0 +1,133 @@
+"""
+Answer Cache Module
+Cache απαντήσεων ανά εταιρεία για τις ερωτήσεις που κάνουν ξανά και ξανά
+οι επισκέπτες ("ωράριο", "τιμή του Χ"). Το κλειδί είναι api_key +
+έκδοση του prompt + κανονικοποιημένη ερώτηση, με exact και near-duplicate
+matching, TTL και LRU eviction.
+"""
+
+import re
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from knowledge_index import STOPWORDS
+
+_NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+_NOT_RE = re.compile(r"n['’]t\b")
+
+# Λέξεις που αλλάζουν το νόημα της ερώτησης: δεν πετιούνται σαν stopwords
+NEGATIONS = frozenset({"not", "no", "never", "without", "δεν", "μη", "μην", "χωρις", "ουτε"})
+_KEPT_WORDS = NEGATIONS | {"to", "from", "απο", "σε", "προς"}
+_QUESTION_STOPWORDS = frozenset(STOPWORDS) - _KEPT_WORDS
+
+
+def normalize_question(text: str) -> str:
+    """
+    Lowercase, χωρίς τόνους και σημεία στίξης, με ενιαία κενά
+    """
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+
+def question_features(text: str) -> FrozenSet[str]:
+    """
+    Οι όροι της ερώτησης (χωρίς stopwords, με τις αρνήσεις) και τα διαδοχικά
+    ζεύγη τους, ώστε το "london to athens" να διαφέρει από το "athens to london"
+    """
+    terms = [t for t in normalize_question(_NOT_RE.sub(" not", text.lower())).split()
+             if len(t) > 1 and t not in _QUESTION_STOPWORDS]
+    return frozenset(terms) | frozenset(f"{a}>{b}" for a, b in zip(terms, terms[1:]))
+
+
+class _Entry:
+    __slots__ = ("terms", "answer", "expires_at")
+
+    def __init__(self, terms: FrozenSet[str], answer: str, expires_at: float):
+        self.terms = terms
+        self.answer = answer
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    """
+    Κρατά ανά api_key ένα LRU από (prompt_version, ερώτηση) -> απάντηση
+    """
+
+    def __init__(self, max_entries_per_tenant: int = 256, ttl: float = 3600,
+                 similarity: float = 0.85, min_terms_for_similarity: int = 2):
+        self.max_entries = max_entries_per_tenant
+        self.ttl = ttl
+        self.similarity = similarity
+        self.min_terms = min_terms_for_similarity
+        self._tenants: Dict[str, "OrderedDict[Tuple[str, str], _Entry]"] = defaultdict(OrderedDict)
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"exact_hits": 0, "near_hits": 0, "misses": 0, "stores": 0}
+        )
+
+    def get(self, api_key: str, prompt_version: str, question: str) -> Optional[str]:
+        entries = self._tenants.get(api_key)
+        counters = self._counters[api_key]
+        if not entries:
+            counters["misses"] += 1
+            return None
+
+        now = time.monotonic()
+        key = (prompt_version, normalize_question(question))
+
+        entry = entries.get(key)
+        if entry is not None:
+            if entry.expires_at > now:
+                entries.move_to_end(key)
+                counters["exact_hits"] += 1
+                return entry.answer
+            del entries[key]
+
+        # Near-duplicate: Jaccard πάνω στους όρους και τα ζεύγη τους· ποτέ με διαφορετικές αρνήσεις
+        terms = question_features(question)
+        negations = terms & NEGATIONS
+        if sum(">" not in t for t in terms) >= self.min_terms:
+            best_key, best_score = None, 0.0
+            for other_key, other in list(entries.items()):
+                if other.expires_at <= now:
+                    del entries[other_key]
+                    continue
+                if other_key[0] != prompt_version or not other.terms or other.terms & NEGATIONS != negations:
+                    continue
+                score = len(terms & other.terms) / len(terms | other.terms)
+                if score > best_score:
+                    best_key, best_score = other_key, score
+            if best_key is not None and best_score >= self.similarity:
+                entries.move_to_end(best_key)
+                counters["near_hits"] += 1
+                return entries[best_key].answer
+
+        counters["misses"] += 1
+        return None
+
+    def put(self, api_key: str, prompt_version: str, question: str, answer: str) -> None:
+        if not answer:
+            return
+        entries = self._tenants[api_key]
+        key = (prompt_version, normalize_question(question))
+        entries[key] = _Entry(question_features(question), answer, time.monotonic() + self.ttl)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        self._counters[api_key]["stores"] += 1
+
+    def invalidate(self, api_key: str) -> None:
+        self._tenants.pop(api_key, None)
+
+    def stats(self, api_key: str) -> Dict[str, float]:
+        counters = dict(self._counters.get(api_key) or {"exact_hits": 0, "near_hits": 0, "misses": 0, "stores": 0})
+        hits = counters["exact_hits"] + counters["near_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._tenants.get(api_key) or ()),
+        }
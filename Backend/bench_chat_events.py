@@ -0,0 +1,114 @@
+"""
+Benchmark: publish_chat_event πριν (έως 7 διαδοχικές εντολές) και μετά (ένα Lua script).
+
+    python bench_chat_events.py --messages 2000
+    python bench_chat_events.py --host redis.internal --port 6379
+
+Τρέχει σε ξεχωριστά keys (prefix bench:) ώστε να μην πειράζει τα πραγματικά stats.
+Με --fake χρησιμοποιεί το fakeredis (χωρίς δίκτυο, μετρά μόνο το κόστος των εντολών).
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+
+import redis.asyncio as aioredis
+
+from chat_events import ChatEventPublisher
+
+STREAM = "bench:chat_events"
+
+
+async def legacy_publish(client: aioredis.Redis, role: str, api_key: str, response_time_ms=None) -> None:
+    """
+    Η προηγούμενη υλοποίηση του publish_chat_event (XADD, HINCRBY x3, HINCRBYFLOAT, HGET x2, HSET x2)
+    """
+    event_data = {
+        "event_id": str(uuid.uuid4()), "session_id": "sess_bench", "role": role,
+        "content": "benchmark message", "company_name": "Bench", "api_key": api_key,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+    if response_time_ms is not None:
+        event_data["response_time_ms"] = response_time_ms
+    await client.xadd(STREAM, event_data)
+
+    await client.hincrby(f"stats:{api_key}", "total_messages", 1)
+    if role == "user":
+        await client.hincrby(f"stats:{api_key}", "total_user_messages", 1)
+    elif role == "assistant":
+        await client.hincrby(f"stats:{api_key}", "total_assistant_messages", 1)
+        if response_time_ms is not None:
+            await client.hincrbyfloat(f"response_stats:{api_key}", "total_time", response_time_ms / 1000)
+            total_time = float(await client.hget(f"response_stats:{api_key}", "total_time") or 0)
+            assistant_count = int(await client.hget(f"stats:{api_key}", "total_assistant_messages") or 0)
+            if assistant_count > 0:
+                await client.hset(f"response_stats:{api_key}", "avg", total_time / assistant_count)
+    await client.hset(f"stats:{api_key}", "last_message_at", datetime.now(timezone.utc).isoformat())
+
+
+async def lua_publish(publisher: ChatEventPublisher, role: str, api_key: str, response_time_ms=None) -> None:
+    event_data = {
+        "event_id": str(uuid.uuid4()), "session_id": "sess_bench", "role": role,
+        "content": "benchmark message", "company_name": "Bench", "api_key": api_key,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+    if response_time_ms is not None:
+        event_data["response_time_ms"] = response_time_ms
+    await publisher.publish(event_data, response_time_ms)
+
+
+async def run(name: str, publish, messages: int) -> None:
+    latencies = []
+    start = time.perf_counter()
+    for i in range(messages):
+        # Εναλλάξ user / assistant όπως σε μια πραγματική συνομιλία
+        t = time.perf_counter()
+        if i % 2 == 0:
+            await publish("user")
+        else:
+            await publish("assistant", 850.0)
+        latencies.append((time.perf_counter() - t) * 1000)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:<8} {messages / elapsed:>10.0f} msg/s   "
+          f"mean {statistics.mean(latencies):.3f} ms   p50 {statistics.median(latencies):.3f} ms   p99 {p99:.3f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--fake", action="store_true")
+    args = parser.parse_args()
+
+    if args.fake:
+        import fakeredis
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    else:
+        client = aioredis.Redis(host=args.host, port=args.port, decode_responses=True)
+
+    legacy_key, lua_key = "bench:legacy", "bench:lua"
+    publisher = ChatEventPublisher(client, stream=STREAM)
+    try:
+        await run("legacy", lambda role, rt=None: legacy_publish(client, role, legacy_key, rt), args.messages)
+        await run("lua", lambda role, rt=None: lua_publish(publisher, role, lua_key, rt), args.messages)
+
+        # Τα δύο μονοπάτια πρέπει να καταλήγουν στα ίδια counters
+        for key in (legacy_key, lua_key):
+            stats = await client.hgetall(f"stats:{key}")
+            response = await client.hgetall(f"response_stats:{key}")
+            print(f"{key}: messages={stats.get('total_messages')} "
+                  f"assistant={stats.get('total_assistant_messages')} avg={float(response.get('avg', 0)):.3f}s")
+    finally:
+        await client.delete(STREAM, *[f"{prefix}:{key}" for key in (legacy_key, lua_key)
+                                      for prefix in ("stats", "response_stats")])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
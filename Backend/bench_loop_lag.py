@@ -0,0 +1,137 @@
+"""
+Benchmark: καθυστέρηση του event loop (loop lag) με πολλά ταυτόχρονα chats,
+με blocking redis.Redis (όπως πριν) και με redis.asyncio + κοινό pool.
+
+    python bench_loop_lag.py --chats 200
+    python bench_loop_lag.py --fake --rtt-ms 1
+
+Κάθε "chat" κάνει τις κλήσεις Redis του /widget-chat (session, user event,
+stats, assistant event) με ενδιάμεσο streaming. Ένα task μετρά πόσο αργότερα
+από το αναμενόμενο ξυπνά ένα sleep: όσο μπλοκάρεται το loop, τόσο μεγαλώνει.
+Με --fake δεν χρειάζεται Redis: το round-trip προσομοιώνεται με --rtt-ms.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import redis
+
+from redis_pool import get_async_redis, redis_settings
+
+
+class SyncOps:
+    """
+    Οι κλήσεις με blocking client μέσα σε coroutine (μπλοκάρουν το loop)
+    """
+
+    def __init__(self, client, rtt: float = 0.0):
+        self.client = client
+        self.rtt = rtt
+
+    def _call(self, fn, *args, **kwargs):
+        if self.rtt:
+            time.sleep(self.rtt)
+        return fn(*args, **kwargs)
+
+    async def request(self, i: int) -> None:
+        self._call(self.client.hincrby, "bench:stats", "total_sessions", 1)
+        self._call(self.client.xadd, "bench:events", {"role": "user", "n": i}, maxlen=1000)
+
+    async def response(self, i: int) -> None:
+        self._call(self.client.xadd, "bench:events", {"role": "assistant", "n": i}, maxlen=1000)
+        self._call(self.client.hset, f"bench:session:{i}", mapping={"last_activity": time.time()})
+        self._call(self.client.sadd, "bench:active_sessions", i)
+
+
+class AsyncOps:
+    def __init__(self, client, rtt: float = 0.0):
+        self.client = client
+        self.rtt = rtt
+
+    async def _call(self, fn, *args, **kwargs):
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        return await fn(*args, **kwargs)
+
+    async def request(self, i: int) -> None:
+        await self._call(self.client.hincrby, "bench:stats", "total_sessions", 1)
+        await self._call(self.client.xadd, "bench:events", {"role": "user", "n": i}, maxlen=1000)
+
+    async def response(self, i: int) -> None:
+        await self._call(self.client.xadd, "bench:events", {"role": "assistant", "n": i}, maxlen=1000)
+        await self._call(self.client.hset, f"bench:session:{i}", mapping={"last_activity": time.time()})
+        await self._call(self.client.sadd, "bench:active_sessions", i)
+
+
+async def chat(ops, i: int, frames: int, frame_interval: float) -> None:
+    await ops.request(i)
+    for _ in range(frames):
+        await asyncio.sleep(frame_interval)  # το upstream stream
+    await ops.response(i)
+
+
+async def measure(name: str, ops, chats: int, frames: int, frame_interval: float, tick: float = 0.005) -> None:
+    lags = []
+    done = asyncio.Event()
+
+    async def monitor():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(tick)
+            lags.append((time.perf_counter() - start - tick) * 1000)
+
+    monitor_task = asyncio.create_task(monitor())
+    start = time.perf_counter()
+    # Τα chats φτάνουν σταδιακά, όπως σε πραγματική κίνηση
+    tasks = []
+    for i in range(chats):
+        tasks.append(asyncio.create_task(chat(ops, i, frames, frame_interval)))
+        await asyncio.sleep(0.001)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    done.set()
+    await monitor_task
+
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(f"{name:<6} {chats} chats in {elapsed:.2f}s   loop lag: "
+          f"mean {statistics.mean(lags):.2f} ms   p50 {statistics.median(lags):.2f} ms   "
+          f"p99 {p99:.2f} ms   max {lags[-1]:.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--frame-interval-ms", type=float, default=30)
+    parser.add_argument("--fake", action="store_true")
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="προσομοιωμένο round-trip (μόνο με --fake)")
+    args = parser.parse_args()
+
+    frame_interval = args.frame_interval_ms / 1000
+    if args.fake:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        rtt = args.rtt_ms / 1000
+        sync_ops = SyncOps(fakeredis.FakeRedis(server=server, decode_responses=True), rtt)
+        async_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        async_ops = AsyncOps(async_client, rtt)
+    else:
+        sync_ops = SyncOps(redis.Redis(**redis_settings()))
+        async_client = get_async_redis()
+        async_ops = AsyncOps(async_client)
+
+    try:
+        await measure("sync", sync_ops, args.chats, args.frames, frame_interval)
+        await measure("async", async_ops, args.chats, args.frames, frame_interval)
+    finally:
+        keys = ["bench:stats", "bench:events", "bench:active_sessions"]
+        keys += [f"bench:session:{i}" for i in range(args.chats)]
+        await async_client.delete(*keys)
+        await async_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Benchmark: κωδικοποίηση SSE frames ανά core, πριν (dict + json.dumps +
+datetime.now() ανά frame, full_response += ...) και μετά (SSEEncoder με
+έτοιμο prefix/suffix, timestamp ανά batch και list/join buffer).
+
+    python bench_sse.py --frames 200000
+    python bench_sse.py --chars 8 --greek
+
+Τρέχει σε ένα thread χωρίς event loop, οπότε μετρά μόνο το CPU κόστος του encoding.
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+
+from sse_encoder import SSEEncoder
+
+
+def legacy(contents, session_id: str) -> int:
+    full_response = ""
+    size = 0
+    for i, content in enumerate(contents):
+        if i == 0:
+            frame = f"data: {json.dumps({'response': content, 'timestamp': datetime.now().isoformat(), 'session_id': session_id})}\n\n"
+        else:
+            frame = f"data: {json.dumps({'response': content, 'timestamp': datetime.now().isoformat()})}\n\n"
+        full_response += content
+        size += len(frame)
+    return size + len(full_response)
+
+
+def encoder_path(contents, session_id: str, encoder: SSEEncoder) -> int:
+    parts = []
+    size = 0
+    for i, content in enumerate(contents):
+        if i == 0:
+            frame = encoder.frame(content, session_id=session_id)
+        else:
+            frame = encoder.frame(content)
+        parts.append(content)
+        size += len(frame)
+    return size + len("".join(parts))
+
+
+def run(name: str, fn, contents, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(contents)
+        best = min(best, time.perf_counter() - start)
+    fps = len(contents) / best
+    print(f"{name:<8} {fps:>12,.0f} frames/s/core   {best / len(contents) * 1e6:.3f} µs/frame")
+    return fps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=200_000)
+    parser.add_argument("--chars", type=int, default=64, help="χαρακτήρες ανά frame (SSE_FLUSH_MAX_CHARS)")
+    parser.add_argument("--greek", action="store_true", help="ελληνικό κείμενο (χρειάζεται \\u escaping στο json)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sample = "Καλημέρα, πώς μπορώ να βοηθήσω; " if args.greek else "Hello, how can I help you today? "
+    text = (sample * (args.chars // len(sample) + 1))[:args.chars]
+    contents = [text] * args.frames
+    encoder = SSEEncoder.from_env()
+    session_id = "sess_0123456789abcdef"
+
+    before = run("legacy", lambda c: legacy(c, session_id), contents, args.repeat)
+    after = run("encoder", lambda c: encoder_path(c, session_id, encoder), contents, args.repeat)
+    print(f"speedup  {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Browser Pool Module
+Μακρόβιοι headless Chrome drivers για το scraping, αντί για νέο Chrome
+(και νέο ChromeDriverManager().install()) σε κάθε σελίδα.
+
+- Το chromedriver βρίσκεται μία φορά ανά process (resolve_chromedriver, στο startup).
+- Το pool έχει το πολύ BROWSER_POOL_SIZE drivers. Όποιος ζητήσει σελίδα
+  όταν είναι όλοι πιασμένοι περιμένει (έως BROWSER_ACQUIRE_TIMEOUT).
+- Κάθε σελίδα ανοίγει σε καινούριο tab. Όταν τελειώσει, το tab κλείνει και
+  τα cookies / storage του origin σβήνονται, ώστε η επόμενη σελίδα να ξεκινά καθαρή.
+- Πριν δοθεί, ένας driver ελέγχεται ότι ζει ακόμα. Μετά από
+  BROWSER_MAX_PAGES σελίδες κλείνει και τη θέση του παίρνει καινούριος,
+  ώστε να μη μαζεύει μνήμη.
+
+Το pool είναι thread-safe: το scraping τρέχει σε ThreadPoolExecutor.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.chrome.service import Service as ChromeService
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+
+_driver_path: Optional[str] = None
+_driver_resolved = False
+_resolve_lock = threading.Lock()
+
+
+def resolve_chromedriver() -> Optional[str]:
+    """
+    Το path του chromedriver: CHROMEDRIVER_PATH αν έχει οριστεί, αλλιώς
+    webdriver_manager. Αν αποτύχουν και τα δύο επιστρέφει None και το βρίσκει
+    το Selenium Manager του selenium (>= 4.6)
+    """
+    global _driver_path, _driver_resolved
+    with _resolve_lock:
+        if not _driver_resolved:
+            _driver_path = os.getenv('CHROMEDRIVER_PATH') or None
+            if _driver_path is None:
+                try:
+                    from webdriver_manager.chrome import ChromeDriverManager
+                    _driver_path = ChromeDriverManager().install()
+                except Exception as e:
+                    logger.warning("webdriver_manager failed, falling back to Selenium Manager: %s", e)
+            _driver_resolved = True
+            logger.info("Using chromedriver: %s", _driver_path or "Selenium Manager")
+    return _driver_path
+
+
+def chrome_options(headless: bool = True) -> ChromeOptions:
+    options = ChromeOptions()
+    if headless:
+        options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument(f"user-agent={USER_AGENT}")
+    return options
+
+
+def launch_chrome(headless: bool = True) -> webdriver.Chrome:
+    path = resolve_chromedriver()
+    service = ChromeService(path) if path else ChromeService()
+    return webdriver.Chrome(service=service, options=chrome_options(headless))
+
+
+class _PooledDriver:
+    __slots__ = ("driver", "base_handle", "pages")
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.base_handle = driver.current_window_handle
+        self.pages = 0
+
+
+class BrowserPool:
+    def __init__(self, size: int = 4, max_pages: int = 50, headless: bool = True,
+                 page_load_timeout: float = 30, acquire_timeout: float = 120):
+        self.size = max(size, 1)
+        self.max_pages = max(max_pages, 1)
+        self.headless = headless
+        self.page_load_timeout = page_load_timeout
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: "queue.LifoQueue[_PooledDriver]" = queue.LifoQueue()  # ο πιο «ζεστός» driver πρώτος
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._closed = False
+        self.counters = {"launched": 0, "recycled": 0, "unhealthy": 0, "pages": 0,
+                         "waits": 0, "wait_ms_total": 0.0, "timeouts": 0}
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls) -> "BrowserPool":
+        return cls(
+            size=int(os.getenv('BROWSER_POOL_SIZE', 4)),
+            max_pages=int(os.getenv('BROWSER_MAX_PAGES', 50)),
+            headless=os.getenv('BROWSER_HEADLESS', '1') != '0',
+            page_load_timeout=float(os.getenv('BROWSER_PAGE_LOAD_TIMEOUT', 30)),
+            acquire_timeout=float(os.getenv('BROWSER_ACQUIRE_TIMEOUT', 120)),
+        )
+
+    @contextmanager
+    def page(self) -> Iterator[webdriver.Chrome]:
+        """
+        Ένας driver του pool σε καινούριο tab, για μία σελίδα
+        """
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            self._count("waits")
+            if not self._slots.acquire(timeout=self.acquire_timeout):
+                self._count("timeouts")
+                raise TimeoutError(f"No browser available after {self.acquire_timeout}s")
+            with self._lock:
+                self.counters["wait_ms_total"] += (time.perf_counter() - start) * 1000
+
+        pooled = None
+        reusable = False
+        try:
+            pooled = self._checkout()
+            with self._lock:
+                self._in_use += 1
+            pooled.driver.switch_to.new_window('tab')
+            try:
+                yield pooled.driver
+            finally:
+                reusable = self._reset(pooled)
+        finally:
+            if pooled is not None:
+                with self._lock:
+                    self._in_use -= 1
+                self._checkin(pooled, reusable)
+            self._slots.release()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _checkout(self) -> _PooledDriver:
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return self._launch()
+            if self._healthy(pooled):
+                return pooled
+            self._count("unhealthy")
+            self._quit(pooled)
+
+    def _launch(self) -> _PooledDriver:
+        driver = launch_chrome(self.headless)
+        try:
+            driver.set_page_load_timeout(self.page_load_timeout)
+            pooled = _PooledDriver(driver)
+        except Exception:
+            driver.quit()
+            raise
+        self._count("launched")
+        return pooled
+
+    @staticmethod
+    def _healthy(pooled: _PooledDriver) -> bool:
+        # Ένα round-trip στον driver: αποτυγχάνει αν ο Chrome έκλεισε ή κόλλησε
+        try:
+            pooled.driver.switch_to.window(pooled.base_handle)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(pooled: _PooledDriver) -> bool:
+        """
+        Κλείνει τα tabs της σελίδας και σβήνει cookies / storage· False αν ο driver δεν είναι πια χρήσιμος
+        """
+        driver = pooled.driver
+        try:
+            origins: List[str] = []
+            for handle in driver.window_handles:
+                if handle == pooled.base_handle:
+                    continue
+                driver.switch_to.window(handle)
+                parsed = urlparse(driver.current_url)
+                if parsed.scheme in ('http', 'https'):
+                    origins.append(f"{parsed.scheme}://{parsed.netloc}")
+                driver.close()
+            driver.switch_to.window(pooled.base_handle)
+
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            for origin in dict.fromkeys(origins):
+                driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+            return True
+        except Exception as e:
+            logger.warning("Browser reset failed, discarding driver: %s", e)
+            return False
+
+    def _checkin(self, pooled: _PooledDriver, reusable: bool) -> None:
+        pooled.pages += 1
+        self._count("pages")
+        if not reusable or self._closed:
+            self._quit(pooled)
+        elif pooled.pages >= self.max_pages:
+            self._count("recycled")
+            self._quit(pooled)
+        else:
+            self._idle.put(pooled)
+
+    @staticmethod
+    def _quit(pooled: _PooledDriver) -> None:
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counters = dict(self.counters)
+            in_use = self._in_use
+        waits = counters.pop("waits")
+        wait_ms_total = counters.pop("wait_ms_total")
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "in_use": in_use,
+            "max_pages": self.max_pages,
+            "waits": waits,
+            "avg_wait_ms": round(wait_ms_total / waits, 2) if waits else 0.0,
+            **counters,
+        }
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    Το κοινό pool του process (ένα για όλα τα scraping jobs)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool.from_env()
+        return _pool
+
+
+def close_browser_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -1,5 +1,8 @@
 # calendar_helper.py
-import os, json, pymysql
+# Οι μέθοδοι που διαβάζουν / γράφουν στη βάση ή μιλούν με το Google είναι async:
+# η βάση μέσω του κοινού pool (db.py), οι blocking κλήσεις του Google client σε thread.
+import asyncio
+import os, json
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
@@ -9,9 +12,12 @@ from googleapiclient.discovery import build
 from google.auth.transport.requests import Request  # <-- ΜΟΝΟ εδώ, μία φορά
 from datetime import datetime, timedelta, timezone
 
+import db
+
 class GoogleCalendarHelper:
-    def __init__(self, api_key: str | None = None):
+    def __init__(self, api_key: str | None = None, company_cache=None):
         self.api_key = api_key
+        self.company_cache = company_cache  # TenantConfigCache του server, για invalidate μετά το save
         self.SCOPES = [
             "https://www.googleapis.com/auth/calendar",
             "https://www.googleapis.com/auth/calendar.events",
@@ -35,26 +41,23 @@ class GoogleCalendarHelper:
         )
         return auth_url
 
-    def get_credentials_from_code(self, code: str):
+    async def get_credentials_from_code(self, code: str):
         try:
             flow = Flow.from_client_secrets_file(
                 self.credentials_file,
                 scopes=self.SCOPES,
                 redirect_uri=self.redirect_uri,
             )
-            flow.fetch_token(code=code)
+            await asyncio.to_thread(flow.fetch_token, code=code)
             return flow.credentials
         except Exception as e:
             print("Error getting credentials:", e)
             return None
 
-    def save_credentials_to_db(self, credentials) -> bool:
+    async def save_credentials_to_db(self, credentials) -> bool:
         if not self.api_key:
             return False
-        from server5 import get_database_connection
-        conn = get_database_connection()
         try:
-            cursor = conn.cursor()
             creds_data = {
                 "token": credentials.token,
                 "refresh_token": credentials.refresh_token,
@@ -63,32 +66,24 @@ class GoogleCalendarHelper:
                 "client_secret": credentials.client_secret,
                 "scopes": list(credentials.scopes or []),
             }
-            cursor.execute(
+            saved = await db.execute(
                 "UPDATE companies SET google_credentials = %s WHERE api_key = %s",
                 (json.dumps(creds_data), self.api_key),
-            )
-            conn.commit()
-            return cursor.rowcount == 1
+            ) == 1
+            if saved and self.company_cache is not None:
+                await self.company_cache.invalidate(self.api_key)
+            return saved
         except Exception as e:
             print("Error saving credentials:", e)
             return False
-        finally:
-            conn.close()
 
-    def load_credentials(self):
+    async def load_credentials(self):
         if not self.api_key:
             return None
-        from server5 import get_database_connection
-        conn = get_database_connection()
-        try:
-            cursor = conn.cursor(pymysql.cursors.DictCursor)  # <-- DictCursor για result['google_credentials']
-            cursor.execute(
-                "SELECT google_credentials FROM companies WHERE api_key = %s",
-                (self.api_key,),
-            )
-            row = cursor.fetchone()
-        finally:
-            conn.close()
+        row = await db.fetchone(
+            "SELECT google_credentials FROM companies WHERE api_key = %s",
+            (self.api_key,),
+        )
 
         if not row or not row.get("google_credentials"):
             return None
@@ -107,27 +102,27 @@ class GoogleCalendarHelper:
             print("Error loading credentials:", e)
             return None
 
-    def get_calendar_service(self):  # <-- ΜΕΣΑ στην κλάση
+    async def get_calendar_service(self):  # <-- ΜΕΣΑ στην κλάση
         try:
-            creds = self.load_credentials()
+            creds = await self.load_credentials()
             if not creds:
                 return None
             if not creds.valid:
                 if creds.expired and creds.refresh_token:
-                    creds.refresh(Request())
-                    self.save_credentials_to_db(creds)  # <-- ξανασώσε τα φρέσκα tokens
+                    await asyncio.to_thread(creds.refresh, Request())
+                    await self.save_credentials_to_db(creds)  # <-- ξανασώσε τα φρέσκα tokens
                 else:
                     return None
-            return build("calendar", "v3", credentials=creds)
+            return await asyncio.to_thread(build, "calendar", "v3", credentials=creds)
         except Exception as e:
             print(f"Error creating calendar service: {e}")
             return None
     
     
 
-    def get_available_slots(self, date: str, appointment_settings: dict = None):
+    async def get_available_slots(self, date: str, appointment_settings: dict = None):
         try:
-            service = self.get_calendar_service()
+            service = await self.get_calendar_service()
             if not service:
                 return []
 
@@ -170,13 +165,13 @@ class GoogleCalendarHelper:
            )
 
         # Fetch existing events (υπάρχον κώδικας)
-            events_result = service.events().list(
+            events_result = await asyncio.to_thread(service.events().list(
                 calendarId='primary',
                 timeMin=start_local.isoformat(),
                 timeMax=end_local.isoformat(),
                 singleEvents=True,
                 orderBy='startTime'
-            ).execute()
+            ).execute)
             events = events_result.get('items', [])
 
             print(f"📅 DEBUG: Date={date}, Found {len(events)} events")
@@ -219,10 +214,10 @@ class GoogleCalendarHelper:
             print("Error getting available slots:", e)
             return []
 
-    def create_event(self, title: str, description: str, start_datetime: str,
+    async def create_event(self, title: str, description: str, start_datetime: str,
                  duration_minutes: int = 60, attendee_email: str | None = None) -> str | None:
         try:
-            service = self.get_calendar_service()
+            service = await self.get_calendar_service()
             if not service:
                 return None
 
@@ -238,7 +233,7 @@ class GoogleCalendarHelper:
             if attendee_email:
                 event["attendees"] = [{"email": attendee_email}]
 
-            created = service.events().insert(calendarId='primary', body=event).execute()
+            created = await asyncio.to_thread(service.events().insert(calendarId='primary', body=event).execute)
             return created.get("id")
         except Exception as e:
             print("Error creating event:", e)
@@ -0,0 +1,62 @@
+"""
+Chat Events Module
+Κάθε μήνυμα του chat γράφεται στο Redis Stream chat_events (το διαβάζει ο
+analytics_worker) και ενημερώνει τους counters της εταιρείας. Όλα γίνονται
+σε ένα Lua script: ένα round-trip ανά μήνυμα και ατομικός υπολογισμός του
+μέσου χρόνου απόκρισης, χωρίς read-modify-write από τους workers.
+Οι μισές απαντήσεις streams που κόπηκαν (aborted) γράφονται στο stream αλλά
+μετράνε μόνο στο aborted_streams, όχι στα μηνύματα / στον χρόνο απόκρισης.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+# KEYS: stream, stats, response_stats
+# ARGV: kind (user / assistant / aborted), last_message_at, response_time σε δευτερόλεπτα (ή ''),
+#       και μετά field, value, ... του event
+PUBLISH_CHAT_EVENT_LUA = """
+local id = redis.call('XADD', KEYS[1], '*', unpack(ARGV, 4))
+if ARGV[1] == 'aborted' then
+    redis.call('HINCRBY', KEYS[2], 'aborted_streams', 1)
+    return id
+end
+redis.call('HINCRBY', KEYS[2], 'total_messages', 1)
+if ARGV[1] == 'user' then
+    redis.call('HINCRBY', KEYS[2], 'total_user_messages', 1)
+elseif ARGV[1] == 'assistant' then
+    local count = redis.call('HINCRBY', KEYS[2], 'total_assistant_messages', 1)
+    if ARGV[3] ~= '' then
+        local total = tonumber(redis.call('HINCRBYFLOAT', KEYS[3], 'total_time', ARGV[3]))
+        redis.call('HSET', KEYS[3], 'avg', tostring(total / count))
+    end
+end
+redis.call('HSET', KEYS[2], 'last_message_at', ARGV[2])
+return id
+"""
+
+
+class ChatEventPublisher:
+    def __init__(self, redis_client: aioredis.Redis, stream: str = "chat_events"):
+        self.stream = stream
+        self._script = redis_client.register_script(PUBLISH_CHAT_EVENT_LUA)
+
+    async def publish(self, event_data: Dict[str, Any], response_time_ms: Optional[float] = None) -> str:
+        """
+        Γράφει το event και ενημερώνει stats:{api_key} / response_stats:{api_key}.
+        Επιστρέφει το id του event στο stream.
+        """
+        api_key = event_data["api_key"]
+        fields: List[Any] = []
+        for field, value in event_data.items():
+            fields += [field, value]
+
+        return await self._script(
+            keys=[self.stream, f"stats:{api_key}", f"response_stats:{api_key}"],
+            args=[
+                "aborted" if event_data.get("aborted") else event_data["role"],
+                event_data["timestamp"],
+                response_time_ms / 1000 if response_time_ms is not None else "",
+                *fields,
+            ],
+        )
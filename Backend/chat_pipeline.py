@@ -0,0 +1,195 @@
+"""
+Chat Pipeline Module
+Τα chat endpoints (/chat, /widget-chat) τρέχουν την ίδια σειρά από stages
+πάνω σε ένα ChatContext:
+
+    prepare:  tenant -> domain -> rate limit -> session -> ... -> context -> capacity
+    stream:   source (LLM / in-flight / answer cache) -> SSE frames
+    complete: publish / session state / memory / answer cache
+
+Κάθε stage είναι async συνάρτηση ctx -> None, χρονομετρείται στο request
+log με το όνομά της και μπορεί να σταματήσει το request με HTTPException.
+Ένα endpoint είναι απλώς μια λίστα από stages, οπότε μια νέα λειτουργία
+(cache, retrieval, όρια) μπαίνει μία φορά με insert_stage().
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, Request
+
+from request_log import RequestLog
+from sse_encoder import SSEEncoder
+from stream_flush import StreamReader
+
+
+@dataclass
+class ChatContext:
+    route: str
+    api_key: str
+    message_data: Any
+    request: Optional[Request] = None
+    reqlog: Optional[RequestLog] = None
+    started_at: float = field(default_factory=time.time)
+
+    company_data: Optional[dict] = None
+    company_name: str = ""
+    session_id: Optional[str] = None
+    conversation_summary: str = ""
+
+    # Answer cache / single-flight
+    cacheable: bool = False
+    prompt_version: str = ""
+    cached_answer: Optional[str] = None
+    flight_key: Optional[Tuple] = None
+    llm_reservation: Optional[Any] = None  # θέση στο LLM scheduler, την καταναλώνει το source
+
+    messages: Optional[List[dict]] = None
+    stream_started_at: float = 0.0
+    response_parts: List[str] = field(default_factory=list)  # join στο τέλος αντί για += ανά frame
+    frames_sent: int = 0
+
+    def __post_init__(self):
+        if self.reqlog is None:
+            self.reqlog = RequestLog(self.route, api_key=self.api_key)
+
+    @property
+    def full_response(self) -> str:
+        if len(self.response_parts) > 1:
+            self.response_parts[:] = ["".join(self.response_parts)]
+        return self.response_parts[0] if self.response_parts else ""
+
+
+Stage = Callable[[ChatContext], Awaitable[None]]
+FrameSource = Callable[[ChatContext], AsyncIterator[str]]
+
+_DISCONNECTED = object()
+
+
+async def _next_or_end(frames: AsyncIterator[str]) -> Any:
+    try:
+        return await frames.__anext__()
+    except StopAsyncIteration:
+        return StreamReader.END
+
+
+class ChatPipeline:
+    def __init__(self, route: str, stages: List[Tuple[str, Stage]], source: FrameSource,
+                 on_complete: Optional[List[Tuple[str, Stage]]] = None,
+                 on_abort: Optional[Stage] = None,
+                 encoder: Optional[SSEEncoder] = None,
+                 first_frame_fields: Optional[Callable[[ChatContext], Dict[str, Any]]] = None,
+                 disconnect_poll_interval: Optional[float] = None):
+        self.route = route
+        self.stages = list(stages)
+        self.source = source
+        self.on_complete = list(on_complete or [])
+        self.on_abort = on_abort
+        self.encoder = encoder or SSEEncoder.from_env()
+        self.first_frame_fields = first_frame_fields  # π.χ. το session_id του widget
+        self.disconnect_poll_interval = disconnect_poll_interval
+
+    def insert_stage(self, name: str, stage: Stage, before: Optional[str] = None,
+                     after: Optional[str] = None) -> None:
+        names = [n for n, _ in self.stages]
+        if before is not None:
+            index = names.index(before)
+        elif after is not None:
+            index = names.index(after) + 1
+        else:
+            index = len(self.stages)
+        self.stages.insert(index, (name, stage))
+
+    def context(self, api_key: str, message_data: Any, request: Optional[Request] = None) -> ChatContext:
+        return ChatContext(route=self.route, api_key=api_key, message_data=message_data, request=request)
+
+    async def prepare(self, ctx: ChatContext) -> ChatContext:
+        """
+        Τρέχει τα stages πριν ξεκινήσει το response (εδώ ακόμα μπορούμε να απαντήσουμε 403 / 429)
+        """
+        for name, stage in self.stages:
+            await stage(ctx)
+            ctx.reqlog.mark(name)
+        return ctx
+
+    async def stream(self, ctx: ChatContext) -> AsyncIterator[bytes]:
+        frames = None
+        reader = None
+        aborted = True  # γίνεται False μόνο όταν το stream τελειώσει ή αποτύχει κανονικά
+        try:
+            ctx.stream_started_at = time.time()
+            frames = self.source(ctx)
+            poll_disconnect = ctx.request is not None and self.disconnect_poll_interval is not None
+            disconnect_checked_at = time.monotonic()
+            if poll_disconnect:
+                reader = StreamReader(frames)
+
+            encoder = self.encoder
+            while True:
+                if reader is not None:
+                    content = await self._next_frame(ctx, reader)
+                    if content is _DISCONNECTED:
+                        return
+                else:
+                    content = await _next_or_end(frames)
+                if content is StreamReader.END:
+                    break
+
+                if ctx.frames_sent == 0:
+                    ctx.reqlog.mark("first_frame")
+                ctx.response_parts.append(content)
+                if ctx.frames_sent == 0 and self.first_frame_fields is not None:
+                    yield encoder.frame(content, **self.first_frame_fields(ctx))
+                else:
+                    yield encoder.frame(content)
+                ctx.frames_sent += 1
+
+                # Ο επισκέπτης έκλεισε το tab: σταματάμε αντί να διαβάζουμε μέχρι το max_tokens
+                if poll_disconnect and time.monotonic() - disconnect_checked_at >= self.disconnect_poll_interval:
+                    disconnect_checked_at = time.monotonic()
+                    if await ctx.request.is_disconnected():
+                        return
+
+            yield encoder.DONE
+            aborted = False
+            ctx.reqlog.mark("stream_done")
+
+            for name, hook in self.on_complete:
+                await hook(ctx)
+                ctx.reqlog.mark(name)
+            ctx.reqlog.emit("ok", frames=ctx.frames_sent, response_chars=len(ctx.full_response))
+
+        except Exception as e:
+            aborted = False
+            ctx.reqlog.emit("error", error=str(e))
+            yield self.encoder.error(str(e))
+            raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            if reader is not None:
+                await reader.aclose()
+            # Π.χ. follower ενός in-flight stream ή αποτυχία πριν το LLM: η θέση δεν χρειάστηκε
+            if ctx.llm_reservation is not None:
+                ctx.llm_reservation.release()
+            if aborted:
+                # Cancel/close από τον server όταν κόβεται η σύνδεση: το cleanup δεν πρέπει να ακυρωθεί
+                with anyio.CancelScope(shield=True):
+                    if frames is not None:
+                        await frames.aclose()
+                    if self.on_abort is not None:
+                        await self.on_abort(ctx)
+                ctx.reqlog.emit("aborted", response_chars=len(ctx.full_response))
+
+    async def _next_frame(self, ctx: ChatContext, reader: StreamReader) -> Any:
+        """
+        Το επόμενο frame (ή END)· όσο το περιμένουμε, π.χ. πριν το πρώτο token,
+        ελέγχουμε κάθε disconnect_poll_interval αν ο client είναι ακόμα εκεί
+        """
+        while True:
+            try:
+                return await reader.next(self.disconnect_poll_interval)
+            except asyncio.TimeoutError:
+                if await ctx.request.is_disconnected():
+                    return _DISCONNECTED
@@ -0,0 +1,135 @@
+"""
+Conversation Memory Module
+Κρατά το ιστορικό κάθε session στο Redis ώστε ο client να στέλνει μόνο το
+νέο μήνυμα. Στο prompt μπαίνουν οι πιο πρόσφατοι γύροι που χωράνε στο
+token budget, και οι παλαιότεροι διπλώνονται σε ένα rolling summary που
+υπολογίζεται εκτός του hot path.
+"""
+
+import json
+import logging
+from typing import Callable, Dict, List, Tuple
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """You maintain a running summary of a customer-support chat.
+Merge the previous summary with the new messages into one short summary (max 120 words),
+written in the language of the conversation. Keep names, products, prices, dates,
+contact details and any open questions. Do not add information that is not in the messages."""
+
+
+class ConversationMemory:
+    """
+    conversation:{api_key}:{session_id}          -> Redis list με JSON turns {role, content, tokens}
+    conversation_summary:{api_key}:{session_id}  -> rolling summary των γύρων που διπλώθηκαν
+
+    Το session_id το στέλνει ο client, οπότε τα keys μπαίνουν κάτω από το api_key
+    ώστε ένα tenant να μη διαβάζει ή να γράφει στο ιστορικό άλλου.
+    """
+
+    def __init__(self, redis_client: aioredis.Redis, count_tokens: Callable[[str], int],
+                 openai_client=None, summary_model: str = "gpt-4o-mini",
+                 token_budget: int = 1500, max_turns: int = 40, ttl: int = 1800):
+        self.redis = redis_client
+        self.count_tokens = count_tokens
+        self.openai_client = openai_client
+        self.summary_model = summary_model
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.ttl = ttl
+
+    def _turns_key(self, api_key: str, session_id: str) -> str:
+        return f"conversation:{api_key}:{session_id}"
+
+    def _summary_key(self, api_key: str, session_id: str) -> str:
+        return f"conversation_summary:{api_key}:{session_id}"
+
+    async def load(self, api_key: str, session_id: str) -> Tuple[str, List[Dict[str, str]], int]:
+        """
+        Επιστρέφει (summary, turns μέσα στο budget, πλήθος παλαιότερων turns εκτός budget)
+        """
+        pipe = self.redis.pipeline()
+        pipe.get(self._summary_key(api_key, session_id))
+        pipe.lrange(self._turns_key(api_key, session_id), 0, -1)
+        summary, raw_turns = await pipe.execute()
+
+        turns = [json.loads(raw) for raw in raw_turns]
+        budget = self.token_budget - (self.count_tokens(summary) if summary else 0)
+
+        # Από το νεότερο προς το παλαιότερο μέχρι να γεμίσει το budget
+        kept = 0
+        used = 0
+        for turn in reversed(turns):
+            if used + turn["tokens"] > budget and kept > 0:
+                break
+            used += turn["tokens"]
+            kept += 1
+
+        recent = [{"role": t["role"], "content": t["content"]} for t in turns[len(turns) - kept:]]
+        return summary or "", recent, len(turns) - kept
+
+    async def append(self, api_key: str, session_id: str, *turns: Tuple[str, str]) -> None:
+        """
+        Προσθέτει έναν ή περισσότερους γύρους (role, content) σε ένα round-trip
+        """
+        key = self._turns_key(api_key, session_id)
+        pipe = self.redis.pipeline()
+        pipe.rpush(key, *[
+            json.dumps({"role": role, "content": content, "tokens": self.count_tokens(content)}, ensure_ascii=False)
+            for role, content in turns
+        ])
+        pipe.ltrim(key, -self.max_turns, -1)
+        pipe.expire(key, self.ttl)
+        pipe.expire(self._summary_key(api_key, session_id), self.ttl)
+        await pipe.execute()
+
+    async def compact(self, api_key: str, session_id: str) -> None:
+        """
+        Διπλώνει τους γύρους που δεν χωράνε πια στο budget μέσα στο summary.
+        Τρέχει ως background task μετά την απάντηση.
+        """
+        if self.openai_client is None:
+            return
+
+        _, _, overflow = await self.load(api_key, session_id)
+        if overflow <= 0:
+            return
+
+        lock_key = f"conversation_compact_lock:{api_key}:{session_id}"
+        if not await self.redis.set(lock_key, "1", nx=True, ex=60):
+            return  # τρέχει ήδη compaction για αυτό το session
+
+        try:
+            summary, _, overflow = await self.load(api_key, session_id)
+            if overflow <= 0:
+                return
+
+            old_turns = [json.loads(raw) for raw in await self.redis.lrange(self._turns_key(api_key, session_id), 0, overflow - 1)]
+            transcript = "\n".join(f"{t['role']}: {t['content']}" for t in old_turns)
+
+            response = await self.openai_client.chat.completions.create(
+                model=self.summary_model,
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Previous summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"},
+                ],
+                temperature=0.2,
+                max_tokens=300,
+            )
+            new_summary = (response.choices[0].message.content or "").strip()
+            if not new_summary:
+                return
+
+            # Νέα turns μπαίνουν στο τέλος της λίστας, οπότε το LTRIM από την αρχή είναι ασφαλές
+            pipe = self.redis.pipeline()
+            pipe.set(self._summary_key(api_key, session_id), new_summary, ex=self.ttl)
+            pipe.ltrim(self._turns_key(api_key, session_id), overflow, -1)
+            await pipe.execute()
+            logger.debug("Compacted %d turns of %s into summary", overflow, session_id)
+
+        except Exception as e:
+            logger.error(f"Conversation compaction failed for {session_id}: {e}")
+        finally:
+            await self.redis.delete(lock_key)
@@ -1,4 +1,7 @@
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 lead_capture_prompt_template = """
 === LEAD CAPTURE BEHAVIOR ===
@@ -38,38 +41,38 @@ When a user wants to book an appointment, append exactly one JSON ACTION block a
 
 
 
+# Αλλάζει όταν αλλάζει η σειρά/δομή των ενοτήτων του prompt
+PROMPT_LAYOUT_VERSION = 3
+
+
 def create_system_prompt(website_data: str, files_data: str, description: str, 
                          personaSelect: str, botRestrictions: str = "", 
                          faq_text: str = "", botTypePreset: str = "",coreFeatures: dict = None,
                          leadCaptureFields: dict = None) -> str:
     """
-    Δημιουργεί system prompt ανάλογα με το bot type preset
+    Δημιουργεί system prompt ανάλογα με το bot type preset.
+
+    Η σειρά είναι η αρχική (restrictions και γνώση της εταιρείας, μετά οι
+    οδηγίες συμπεριφοράς) και σταθερή ανά chatbot, ώστε όλο το prompt να είναι
+    prefix για το prompt caching του provider. Ό,τι αλλάζει ανά request
+    (retrieved chunks, summary, history) μπαίνει μετά από αυτό, ποτέ μέσα του.
+    Οι κενές ενότητες παραλείπονται (π.χ. website_data / files_data / faq_text
+    στα chatbots με knowledge index, restrictions που δεν ορίστηκαν).
     """
     
-    # Κοινό μέρος για όλα τα bot types
-    base_prompt = f"""
-=== BOT RESTRICTIONS ===
-{botRestrictions}
-
-CRITICAL: THE ABOVE RESTRICTIONS ARE ABSOLUTE - NO EXCEPTIONS!
-
-=== WEBSITE CONTENT ===
-{website_data}
-
-=== FILES DATA ===
-{files_data}
-
-=== COMPANY DESCRIPTION ===
-{description}
+    tenant_sections = [
+        ("BOT RESTRICTIONS", botRestrictions and botRestrictions.strip() and f"{botRestrictions}\n\nCRITICAL: THE ABOVE RESTRICTIONS ARE ABSOLUTE - NO EXCEPTIONS!"),
+        ("WEBSITE CONTENT", website_data),
+        ("FILES DATA", files_data),
+        ("COMPANY DESCRIPTION", description),
+        ("TONE AND STYLE", personaSelect),
+        ("FAQ SECTION", faq_text),
+    ]
+    tenant_prompt = ""
+    for title, content in tenant_sections:
+        if content and content.strip():
+            tenant_prompt += f"\n=== {title} ===\n{content}\n"
 
-=== TONE AND STYLE ===
-{personaSelect}
-
-=== FAQ SECTION ===
-{faq_text}
-
-
-"""
     if botTypePreset == "Sales":
         specialized_prompt = """
 === SALES BOT BEHAVIOR ===
@@ -220,20 +223,14 @@ and close with: "Would you like me to continue with more details?"
             active_fields_json=active_fields_json
         )
     
-    full_prompt = base_prompt + specialized_prompt
+    full_prompt = tenant_prompt + specialized_prompt
     if lead_capture_prompt:
         full_prompt += lead_capture_prompt
     if appointment_prompt:
         full_prompt += appointment_prompt
     
-    # Στο create_system_prompt.py, πριν το return:
-    print("=== SYSTEM PROMPT DEBUG ===")
-    if coreFeatures and coreFeatures.get("appointmentScheduling"):
-        print("✅ Appointment feature is enabled")
-        print("✅ Appointment prompt added")
-    else:
-        print("❌ Appointment feature is disabled")
-    print("=== END DEBUG ===")
+    logger.debug("System prompt built: appointment feature %s, %d characters",
+                 "enabled" if appointment_prompt else "disabled", len(full_prompt))
 
     return full_prompt
 
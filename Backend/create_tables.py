@@ -1,18 +1,9 @@
 import pymysql
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from db import get_sync_connection
 
 def create_companies_table():
-    conn = pymysql.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        port=int(os.getenv('MYSQL_PORT', 3307)),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', 'MyAnalytics2024!'),
-        database=os.getenv('MYSQL_DATABASE', 'chatbot_platform'),
-        charset='utf8mb4'
-    )
+    conn = get_sync_connection(dict_cursor=False)
     
     try:
         with conn.cursor() as cursor:
@@ -31,6 +22,9 @@ def create_companies_table():
                 files_data LONGTEXT,
                 website_data LONGTEXT,
                 prompt_snapshot LONGTEXT NOT NULL,
+                prompt_tokens INT,
+                llm_weight FLOAT NOT NULL DEFAULT 1,
+                rate_limits JSON,
                 api_key VARCHAR(255) UNIQUE NOT NULL,
                 script LONGTEXT,
                 allowedDomains TEXT,
@@ -54,5 +48,30 @@ def create_companies_table():
     finally:
         conn.close()
 
+def add_column(column: str, definition: str):
+    """
+    Προσθέτει μια στήλη σε υπάρχοντα πίνακα companies (αν δεν υπάρχει ήδη)
+    """
+    conn = get_sync_connection(dict_cursor=False)
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE companies ADD COLUMN {column} {definition}")
+            conn.commit()
+            print(f"✅ Column '{column}' added")
+    except pymysql.err.OperationalError as e:
+        # 1060 = Duplicate column name
+        if e.args and e.args[0] == 1060:
+            print(f"ℹ️ Column '{column}' already exists")
+        else:
+            print(f"❌ Error adding column: {e}")
+    finally:
+        conn.close()
+
 if __name__ == "__main__":
     create_companies_table()
+    add_column("prompt_tokens", "INT NULL AFTER prompt_snapshot")
+    # Βάρος της εταιρείας στο fair queueing των κλήσεων στο LLM
+    add_column("llm_weight", "FLOAT NOT NULL DEFAULT 1 AFTER prompt_tokens")
+    # Όρια token bucket ανά endpoint, πάνω από τα defaults του rate_limit.py
+    add_column("rate_limits", "JSON NULL AFTER llm_weight")
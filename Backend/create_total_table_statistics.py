@@ -1,21 +1,8 @@
-import pymysql
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from db import get_sync_connection
 
 def get_database_connection():
     """Σύνδεση στη βάση δεδομένων"""
-    conn = pymysql.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        port=int(os.getenv('MYSQL_PORT', 3307)),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', 'MyAnalytics2024!'),
-        database=os.getenv('MYSQL_DATABASE', 'chatbot_platform'),
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
-    return conn
+    return get_sync_connection()
 
 def create_total_analytics_table():
     """
@@ -0,0 +1,172 @@
+"""
+DB Module
+Κοινή πρόσβαση στη MySQL για όλα τα modules του backend.
+Ο server χρησιμοποιεί ένα aiomysql pool ανά process: οι συνδέσεις
+ξαναχρησιμοποιούνται αντί για νέο TCP + auth handshake σε κάθε query.
+Αν το pool είναι γεμάτο, ένα request περιμένει ελεύθερη σύνδεση (έως
+MYSQL_POOL_TIMEOUT) και η αναμονή καταγράφεται στα stats.
+Τα scripts (migration, create_tables κ.λπ.) παίρνουν blocking σύνδεση
+από το get_sync_connection() με τις ίδιες ρυθμίσεις.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import aiomysql
+import pymysql
+import pymysql.cursors
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def mysql_settings() -> Dict[str, Any]:
+    return {
+        "host": os.getenv('MYSQL_HOST', 'localhost'),
+        "port": int(os.getenv('MYSQL_PORT', 3307)),
+        "user": os.getenv('MYSQL_USER', 'root'),
+        "password": os.getenv('MYSQL_PASSWORD', 'MyAnalytics2024!'),
+        "db": os.getenv('MYSQL_DATABASE', 'chatbot_platform'),
+        "charset": 'utf8mb4',
+        "connect_timeout": int(os.getenv('MYSQL_CONNECT_TIMEOUT', 5)),
+    }
+
+
+_pool: Optional[aiomysql.Pool] = None
+_pool_lock: Optional[asyncio.Lock] = None
+_stats = {
+    "acquired": 0,
+    "waited": 0,          # πόσες φορές δεν υπήρχε ελεύθερη σύνδεση
+    "timeouts": 0,
+    "acquire_ms_total": 0.0,
+    "acquire_ms_max": 0.0,
+    "wait_ms_total": 0.0,
+}
+_in_use = 0
+_acquiring = 0
+
+
+async def get_pool() -> aiomysql.Pool:
+    """
+    Το κοινό pool του process (δημιουργείται στην πρώτη χρήση)
+    """
+    global _pool, _pool_lock
+    if _pool is not None:
+        return _pool
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            # autocommit: μια σύνδεση που ξαναχρησιμοποιείται δεν πρέπει να
+            # κρατά ανοιχτό transaction (και παλιό snapshot) από το προηγούμενο request
+            _pool = await aiomysql.create_pool(
+                minsize=int(os.getenv('MYSQL_POOL_MIN', 1)),
+                maxsize=int(os.getenv('MYSQL_POOL_MAX', 20)),
+                pool_recycle=int(os.getenv('MYSQL_POOL_RECYCLE', 3600)),
+                autocommit=True,
+                cursorclass=aiomysql.DictCursor,
+                **mysql_settings(),
+            )
+            logger.info(f"MySQL pool created (max {_pool.maxsize} connections)")
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+@asynccontextmanager
+async def acquire():
+    """
+    Σύνδεση από το pool, με μέτρηση του χρόνου αναμονής
+    """
+    global _in_use, _acquiring
+    pool = await get_pool()
+    # Αν όλες οι συνδέσεις είναι πιασμένες (ή ήδη ζητημένες), το request θα περιμένει
+    waiting = _in_use + _acquiring >= pool.maxsize
+    _acquiring += 1
+    start = time.perf_counter()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), float(os.getenv('MYSQL_POOL_TIMEOUT', 5)))
+    except asyncio.TimeoutError:
+        _stats["timeouts"] += 1
+        logger.warning(f"MySQL pool exhausted ({_in_use}/{pool.maxsize} connections in use)")
+        raise
+    finally:
+        _acquiring -= 1
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    _stats["acquired"] += 1
+    _stats["acquire_ms_total"] += elapsed_ms
+    _stats["acquire_ms_max"] = max(_stats["acquire_ms_max"], elapsed_ms)
+    if waiting:
+        _stats["waited"] += 1
+        _stats["wait_ms_total"] += elapsed_ms
+    _in_use += 1
+    try:
+        yield conn
+    finally:
+        _in_use -= 1
+        pool.release(conn)
+
+
+async def fetchone(sql: str, args=None) -> Optional[dict]:
+    async with acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, args)
+            return await cursor.fetchone()
+
+
+async def fetchall(sql: str, args=None) -> List[dict]:
+    async with acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, args)
+            return list(await cursor.fetchall())
+
+
+async def execute(sql: str, args=None) -> int:
+    """
+    Εκτελεί INSERT/UPDATE/DELETE και επιστρέφει τις γραμμές που επηρεάστηκαν
+    """
+    async with acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, args)
+            return cursor.rowcount
+
+
+def pool_stats() -> Dict[str, object]:
+    acquired = _stats["acquired"]
+    return {
+        "size": _pool.size if _pool else 0,
+        "free": _pool.freesize if _pool else 0,
+        "in_use": _in_use,
+        "waiting": max(0, _in_use + _acquiring - (_pool.maxsize if _pool else 0)),
+        "max_size": _pool.maxsize if _pool else int(os.getenv('MYSQL_POOL_MAX', 20)),
+        "acquired": acquired,
+        "waited": _stats["waited"],
+        "timeouts": _stats["timeouts"],
+        "avg_acquire_ms": round(_stats["acquire_ms_total"] / acquired, 3) if acquired else 0.0,
+        "max_acquire_ms": round(_stats["acquire_ms_max"], 3),
+        "avg_wait_ms": round(_stats["wait_ms_total"] / _stats["waited"], 3) if _stats["waited"] else 0.0,
+    }
+
+
+def get_sync_connection(dict_cursor: bool = True) -> pymysql.connections.Connection:
+    """
+    Blocking σύνδεση για scripts που δεν τρέχουν σε event loop (π.χ. migration)
+    """
+    settings = mysql_settings()
+    settings["database"] = settings.pop("db")
+    if dict_cursor:
+        settings["cursorclass"] = pymysql.cursors.DictCursor
+    return pymysql.connect(**settings)
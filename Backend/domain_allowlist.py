@@ -0,0 +1,111 @@
+"""
+Domain Allow-list Module
+Το allowedDomains μιας εταιρείας (λίστα με κόμματα / κενά / newlines)
+μετατρέπεται μία φορά σε matcher που κρατιέται μαζί με τα στοιχεία της
+εταιρείας στο tenant cache. Ο έλεγχος ανά request είναι ένα dict lookup
+στο host και σύγκριση prefix στο path.
+
+Μορφές που υποστηρίζονται (το πρωτόκολλο αγνοείται):
+    example.com             ακριβώς αυτό το host
+    example.com/shop        μόνο σελίδες κάτω από το /shop
+    *.example.com           οποιοδήποτε subdomain (όχι το ίδιο το example.com)
+    .example.com            το example.com και όλα τα subdomains του
+"""
+
+import logging
+import re
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# None = επιτρέπεται οποιοδήποτε path
+PathPrefixes = Optional[Tuple[str, ...]]
+
+
+def _split_url(url: str) -> Tuple[str, str]:
+    """
+    (host[:port], path) ενός Origin / Referer χωρίς urlparse
+    """
+    _, sep, rest = url.partition('://')
+    if not sep:
+        rest = url
+    netloc, slash, path = rest.partition('/')
+    path = '/' + path.split('?', 1)[0].split('#', 1)[0] if slash else '/'
+    return netloc.rsplit('@', 1)[-1].lower(), path.rstrip('/') or '/'
+
+
+def _merge(paths: Dict[str, PathPrefixes], netloc: str, path: str) -> None:
+    if path == '/' or paths.get(netloc, ()) is None:
+        paths[netloc] = None
+    else:
+        paths[netloc] = paths.get(netloc, ()) + (path,)
+
+
+class DomainMatcher:
+    __slots__ = ("allow_all", "exact", "suffixes")
+
+    def __init__(self, allow_all: bool = False, exact: Optional[Dict[str, PathPrefixes]] = None,
+                 suffixes: Optional[Dict[str, PathPrefixes]] = None):
+        self.allow_all = allow_all
+        self.exact = exact or {}
+        self.suffixes = suffixes or {}  # ".example.com" -> paths, ταιριάζει σε subdomains
+
+    def allows(self, url: str) -> bool:
+        if not url:
+            return False
+        netloc, path = _split_url(url)
+
+        if netloc in self.exact and self._path_allowed(self.exact[netloc], path):
+            return True
+        if self.suffixes:
+            dot = netloc.find('.')
+            while dot != -1:
+                paths = self.suffixes.get(netloc[dot:], False)
+                if paths is not False and self._path_allowed(paths, path):
+                    return True
+                dot = netloc.find('.', dot + 1)
+        return False
+
+    def allows_request(self, origin: str, referer: str) -> bool:
+        return self.allow_all or self.allows(origin) or self.allows(referer)
+
+    @staticmethod
+    def _path_allowed(prefixes: PathPrefixes, path: str) -> bool:
+        if prefixes is None:
+            return True
+        # Σύγκριση ανά segment: το /shop δεν ταιριάζει στο /shopping
+        return any(path == prefix or path.startswith(prefix + '/') for prefix in prefixes)
+
+
+def compile_allowlist(allowed_domains: Optional[str]) -> DomainMatcher:
+    if not allowed_domains or not allowed_domains.strip():
+        return DomainMatcher(allow_all=True)  # Αν δεν έχει ορίσει domains, επιτρέπει όλα
+
+    exact: Dict[str, PathPrefixes] = {}
+    suffixes: Dict[str, PathPrefixes] = {}
+    for pattern in re.split(r'[,\s]+', allowed_domains):
+        if not pattern:
+            continue
+        netloc, path = _split_url(pattern)
+        if not netloc:
+            logger.warning(f"Ignoring invalid allowed domain: {pattern!r}")
+            continue
+        if netloc.startswith('*.'):
+            _merge(suffixes, netloc[1:], path)
+        elif netloc.startswith('.'):
+            _merge(suffixes, netloc, path)
+            _merge(exact, netloc[1:], path)
+        else:
+            _merge(exact, netloc, path)
+    return DomainMatcher(exact=exact, suffixes=suffixes)
+
+
+def domain_matcher(company_data: dict) -> DomainMatcher:
+    """
+    Ο matcher της εταιρείας, αποθηκευμένος στο dict του tenant cache
+    (ξαναφτιάχνεται όταν γίνει invalidate η εταιρεία)
+    """
+    matcher = company_data.get('_domain_matcher')
+    if matcher is None:
+        matcher = company_data['_domain_matcher'] = compile_allowlist(company_data.get('allowedDomains'))
+    return matcher
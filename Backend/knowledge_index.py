@@ -0,0 +1,322 @@
+"""
+Knowledge Index Module
+Κόβει το περιεχόμενο μιας εταιρείας (σελίδες, αρχεία, FAQ) σε chunks και
+χτίζει ένα BM25 inverted index ανά api_key, ώστε στο chat να στέλνουμε
+στο μοντέλο μόνο τα πιο σχετικά κομμάτια αντί για όλο το site.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from heapq import nlargest
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+KNOWLEDGE_DIR = os.getenv('KNOWLEDGE_INDEX_DIR', os.path.join(BASE_DIR, "knowledge_index"))
+
+STOPWORDS = {
+    # English
+    "the", "and", "for", "are", "but", "not", "you", "your", "with", "this", "that",
+    "from", "have", "has", "was", "were", "will", "can", "our", "any", "all", "its",
+    "what", "how", "who", "when", "where", "which", "about", "into", "there", "their",
+    "they", "them", "then", "than", "also", "just", "more", "some", "such", "only",
+    "does", "did", "is", "in", "on", "of", "to", "at", "by", "an", "or", "be", "it",
+    "as", "do", "if", "we", "me", "my", "so", "no", "up",
+    # Ελληνικά (χωρίς τόνους, όπως βγαίνουν από το tokenize)
+    "και", "του", "της", "των", "τον", "την", "το", "τα", "τη", "τι", "οι", "ο", "η",
+    "να", "θα", "με", "σε", "για", "απο", "που", "στο", "στη", "στην", "στον", "στα",
+    "στις", "στους", "ειναι", "εχει", "εχω", "μου", "σας", "μας", "τους", "τις", "ενα",
+    "μια", "ενας", "δεν", "μη", "μην", "αν", "ως", "ή", "αλλα", "πως", "ποιο", "ποια",
+    "ποιος", "οτι", "οπως", "κατα", "μετα", "πριν", "οταν", "επισης",
+}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_FILE_HEADER_RE = re.compile(r"^=== ΑΡΧΕΙΟ: (.+?) ===$", re.MULTILINE)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase, αφαίρεση τόνων/διακριτικών και stopwords
+    """
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    return [t for t in _TOKEN_RE.findall(text) if len(t) > 1 and t not in STOPWORDS]
+
+
+def chunk_text(text: str, max_chars: int = 900, overlap: int = 150) -> List[str]:
+    """
+    Κόβει κείμενο σε chunks ~max_chars χαρακτήρων πάνω σε όρια γραμμών,
+    με μικρή επικάλυψη ώστε να μη χάνεται το νόημα στα σύνορα.
+    """
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+
+    for line in lines:
+        # Πολύ μεγάλες γραμμές (π.χ. κείμενο χωρίς αλλαγές γραμμής) κόβονται σε κομμάτια
+        while len(line) > max_chars:
+            cut = line.rfind(" ", 0, max_chars)
+            cut = cut if cut > max_chars // 2 else max_chars
+            if current:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            chunks.append(line[:cut])
+            line = line[max(cut - overlap, 0):].lstrip() if cut > overlap else line[cut:].lstrip()
+
+        if size + len(line) > max_chars and current:
+            chunks.append("\n".join(current))
+            # Κρατάμε τις τελευταίες γραμμές ως επικάλυψη
+            tail: List[str] = []
+            tail_size = 0
+            for prev in reversed(current):
+                if tail_size + len(prev) > overlap:
+                    break
+                tail.insert(0, prev)
+                tail_size += len(prev) + 1
+            current, size = tail, tail_size
+
+        current.append(line)
+        size += len(line) + 1
+
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def build_chunks(scraped_data: Dict[str, Any], files_content: str,
+                 faq_items: List[dict], max_chars: int = 900) -> List[Dict[str, str]]:
+    """
+    Μετατρέπει τα scraped pages, τα αρχεία και τα FAQ σε λίστα chunks
+    με source ("website" / "files" / "faq"), title και text.
+    """
+    chunks: List[Dict[str, str]] = []
+
+    pages = [scraped_data.get("main_page", {})] + list(scraped_data.get("discovered_links", []))
+    for page in pages:
+        if page.get("status") != "success" or not page.get("plain_text"):
+            continue
+        title = page.get("title") or page.get("url", "")
+        for text in chunk_text(page["plain_text"], max_chars):
+            chunks.append({"source": "website", "title": title, "url": page.get("url", ""), "text": text})
+
+    if files_content:
+        # Το extract_text_from_files βάζει "=== ΑΡΧΕΙΟ: name ===" πριν από κάθε αρχείο
+        parts = _FILE_HEADER_RE.split(files_content)
+        sections = [("", parts[0])] + list(zip(parts[1::2], parts[2::2]))
+        for filename, body in sections:
+            for text in chunk_text(body, max_chars):
+                chunks.append({"source": "files", "title": filename, "url": "", "text": text})
+
+    for item in faq_items or []:
+        question = (item.get("question") or "").strip()
+        answer = (item.get("answer") or "").strip()
+        if question or answer:
+            # Κάθε ερώτηση/απάντηση μένει ένα chunk
+            chunks.append({"source": "faq", "title": question, "url": "",
+                           "text": f"Q: {question}\nA: {answer}"})
+
+    return chunks
+
+
+class BM25Index:
+    """
+    Inverted index με BM25 scoring πάνω στα chunks μιας εταιρείας
+    """
+
+    def __init__(self, chunks: List[Dict[str, str]], postings: Dict[str, List[List[int]]],
+                 doc_lens: List[int], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.postings = postings
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+        self.avgdl = (sum(doc_lens) / len(doc_lens)) if doc_lens else 0.0
+
+    @classmethod
+    def build(cls, chunks: List[Dict[str, str]], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        postings: Dict[str, List[List[int]]] = {}
+        doc_lens: List[int] = []
+        for doc_id, chunk in enumerate(chunks):
+            # Ο τίτλος μετράει κι αυτός στο matching
+            terms = tokenize(f"{chunk.get('title', '')}\n{chunk['text']}")
+            doc_lens.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).append([doc_id, tf])
+        return cls(chunks, postings, doc_lens, k1, b)
+
+    def _idf(self, term: str) -> float:
+        n = len(self.doc_lens)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = 6) -> List[Tuple[float, Dict[str, str]]]:
+        """
+        Επιστρέφει τα top_k chunks ως (score, chunk), με φθίνουσα σειρά
+        """
+        return [(score, self.chunks[doc_id]) for doc_id, score in self.rank(query, top_k)]
+
+    def rank(self, query: str, top_k: int = 6) -> List[Tuple[int, float]]:
+        """
+        Επιστρέφει τα top_k ως (chunk_id, score), με φθίνουσα σειρά
+        """
+        if not self.doc_lens:
+            return []
+
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self._idf(term)
+            for doc_id, tf in plist:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lens[doc_id] / self.avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": 1,
+            "k1": self.k1,
+            "b": self.b,
+            "chunks": self.chunks,
+            "postings": self.postings,
+            "doc_lens": self.doc_lens,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        return cls(data["chunks"], data["postings"], data["doc_lens"], data.get("k1", 1.5), data.get("b", 0.75))
+
+
+def fuse_rankings(rankings: List[List[Tuple[int, float]]], top_k: int = 6, k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Reciprocal rank fusion: ενώνει τις κατατάξεις διαφορετικών retrievers
+    (π.χ. BM25 και vectors) χωρίς να χρειάζεται να συγκρίνονται τα scores τους
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for position, (doc_id, _) in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + position + 1)
+    return nlargest(top_k, fused.items(), key=lambda item: item[1])
+
+
+def index_path(api_key: str) -> str:
+    return os.path.join(KNOWLEDGE_DIR, f"{api_key}.bm25.json")
+
+
+def save_index(api_key: str, index: BM25Index) -> str:
+    os.makedirs(KNOWLEDGE_DIR, exist_ok=True)
+    path = index_path(api_key)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index.to_dict(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def build_knowledge_index(api_key: str, scraped_data: Dict[str, Any], files_content: str,
+                          faq_items: List[dict]) -> BM25Index:
+    """
+    Χτίζει και αποθηκεύει το index μιας εταιρείας (καλείται στη δημιουργία του chatbot)
+    """
+    chunks = build_chunks(scraped_data, files_content, faq_items)
+    index = BM25Index.build(chunks)
+    save_index(api_key, index)
+    _loaded_indexes.put(api_key, index)
+    logger.info(f"Knowledge index built for {api_key}: {len(chunks)} chunks, {len(index.postings)} terms")
+    return index
+
+
+class _IndexLRU:
+    """
+    Μικρό LRU με τα φορτωμένα indexes ώστε να μη διαβάζουμε το αρχείο σε κάθε request
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Optional[BM25Index]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, api_key: str):
+        with self._lock:
+            if api_key in self._entries:
+                self._entries.move_to_end(api_key)
+                return True, self._entries[api_key]
+        return False, None
+
+    def put(self, api_key: str, index: Optional[BM25Index]) -> None:
+        with self._lock:
+            self._entries[api_key] = index
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_loaded_indexes = _IndexLRU(int(os.getenv('KNOWLEDGE_INDEX_CACHE_SIZE', 64)))
+
+
+def load_index(api_key: str) -> Optional[BM25Index]:
+    """
+    Φορτώνει το index μιας εταιρείας (ή None αν δεν υπάρχει)
+    """
+    found, index = _loaded_indexes.get(api_key)
+    if found:
+        return index
+
+    index = None
+    path = index_path(api_key)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = BM25Index.from_dict(json.load(f))
+        except Exception as e:
+            logger.error(f"Failed to load knowledge index {path}: {e}")
+    _loaded_indexes.put(api_key, index)
+    return index
+
+
+async def load_index_async(api_key: str) -> Optional[BM25Index]:
+    """
+    Το load_index για async handlers: το πρώτο φόρτωμα (json.load) γίνεται σε thread
+    """
+    found, index = _loaded_indexes.get(api_key)
+    if found:
+        return index
+    return await asyncio.to_thread(load_index, api_key)
+
+
+RETRIEVED_TITLES = {"website": "WEBSITE CONTENT", "files": "FILES DATA", "faq": "FAQ SECTION"}
+
+
+def _group_hits(hits: List[Tuple[float, Dict[str, str]]]) -> Dict[str, List[str]]:
+    sections: Dict[str, List[str]] = {source: [] for source in RETRIEVED_TITLES}
+    for _, chunk in hits:
+        if chunk["source"] == "faq":
+            sections["faq"].append(chunk["text"])
+        else:
+            header = chunk.get("url") or chunk.get("title") or ""
+            sections[chunk["source"]].append(f"[{header}]\n{chunk['text']}" if header else chunk["text"])
+    return sections
+
+
+def render_retrieved(hits: List[Tuple[float, Dict[str, str]]]) -> str:
+    """
+    Τα retrieved chunks ως ξεχωριστό μήνυμα λίγο πριν την ερώτηση,
+    ώστε το prefix να μένει ίδιο σε κάθε request (prompt caching)
+    """
+    sections = _group_hits(hits)
+    parts = [
+        f"=== RETRIEVED {RETRIEVED_TITLES[source]} ===\n" + "\n\n".join(texts)
+        for source, texts in sections.items() if texts
+    ]
+    return "\n\n".join(parts)
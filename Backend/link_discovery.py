@@ -1,13 +1,15 @@
 """
 Link Explorer Module
-Extracts and processes links from a given URL using Selenium WebDriver.
+Extracts and processes links from a given URL using Selenium WebDriver,
+or from HTML that has already been fetched (parsed with lxml, no browser).
 """
 
 import re
-import time
 import traceback
 from typing import List, Dict, Optional, Set
 from urllib.parse import urljoin, urlparse, urlunparse
+import lxml.html
+from page_readiness import wait_until_ready
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
@@ -21,16 +23,18 @@ class LinkExplorer:
     A class to explore and extract links from web pages using Selenium.
     """
     
-    def __init__(self, headless: bool = True, wait_timeout: int = 10):
+    def __init__(self, headless: bool = True, wait_timeout: int = 10, browser_pool=None):
         """
         Initialize the LinkExplorer.
         
         Args:
             headless (bool): Whether to run Chrome in headless mode
             wait_timeout (int): Maximum time to wait for page elements
+            browser_pool (BrowserPool): Optional pool to borrow a browser from instead of launching one
         """
         self.headless = headless
         self.wait_timeout = wait_timeout
+        self.browser_pool = browser_pool
         self.driver = None
     
     def _setup_driver(self) -> webdriver.Chrome:
@@ -148,7 +152,7 @@ class LinkExplorer:
         
         Args:
             url: The URL to extract links from
-            wait_for_dynamic_content: Seconds to wait for dynamic content to load
+            wait_for_dynamic_content: Maximum seconds to wait for dynamic content to load
             include_external: Whether to include external domain links
             max_links: Maximum number of links to return
             exclude_patterns: Custom regex patterns to exclude
@@ -159,6 +163,7 @@ class LinkExplorer:
             - 'links': List of extracted URLs
             - 'total_found': Total number of links found before filtering
             - 'base_url': The base URL that was processed
+            - 'canonical': The page's rel=canonical URL (HTML extraction only)
             - 'error': Error message if extraction failed
         """
         url = self._normalize_url(url)
@@ -169,58 +174,20 @@ class LinkExplorer:
             'links': [],
             'total_found': 0,
             'base_url': url,
+            'canonical': None,
             'error': None
         }
         
         try:
-            # Setup WebDriver
-            self.driver = self._setup_driver()
+            if self.browser_pool is not None:
+                with self.browser_pool.page() as driver:
+                    raw_links = self._collect_links(driver, url, wait_for_dynamic_content)
+            else:
+                # Setup WebDriver
+                self.driver = self._setup_driver()
+                raw_links = self._collect_links(self.driver, url, wait_for_dynamic_content)
             
-            print(f"LinkExplorer: Loading page '{url}'...")
-            self.driver.get(url)
-            
-            # Wait for dynamic content
-            if wait_for_dynamic_content > 0:
-                time.sleep(wait_for_dynamic_content)
-            
-            # Find all anchor tags
-            link_elements = self.driver.find_elements(By.TAG_NAME, 'a')
-            raw_links = []
-            
-            for element in link_elements:
-                try:
-                    href = element.get_attribute('href')
-                    if href:
-                        cleaned_url = self._clean_and_resolve_url(href, url)
-                        if cleaned_url:
-                            raw_links.append(cleaned_url)
-                except Exception as e:
-                    print(f"Error processing link element: {e}")
-                    continue
-            
-            # Remove duplicates while preserving order
-            unique_links = list(dict.fromkeys(raw_links))
-            result['total_found'] = len(unique_links)
-            
-            print(f"LinkExplorer: Found {len(unique_links)} unique links")
-            
-            # Filter links
-            filtered_links = self._filter_links(
-                unique_links, 
-                base_domain, 
-                include_external, 
-                exclude_patterns
-            )
-            
-            # Limit results
-            if max_links and len(filtered_links) > max_links:
-                filtered_links = filtered_links[:max_links]
-                print(f"LinkExplorer: Limited results to {max_links} links")
-            
-            result['links'] = filtered_links
-            result['success'] = True
-            
-            print(f"LinkExplorer: Returning {len(filtered_links)} filtered links")
+            self._fill_result(result, raw_links, base_domain, include_external, max_links, exclude_patterns)
             
         except TimeoutException as e:
             error_msg = f"Timeout loading page '{url}': {str(e)}"
@@ -247,6 +214,118 @@ class LinkExplorer:
                 self.driver = None
         
         return result
+    
+    def extract_links_from_html(self,
+                                html: str,
+                                url: str,
+                                include_external: bool = False,
+                                max_links: int = 50,
+                                exclude_patterns: List[str] = None) -> Dict[str, any]:
+        """
+        Extract all links from HTML that has already been fetched for `url`,
+        without loading the page again.
+        
+        Args:
+            html: The page HTML
+            url: The URL the HTML was fetched from (after redirects), used to resolve relative links
+            include_external: Whether to include external domain links
+            max_links: Maximum number of links to return
+            exclude_patterns: Custom regex patterns to exclude
+            
+        Returns:
+            Same dictionary as extract_links_from_url
+        """
+        url = self._normalize_url(url)
+        base_domain = urlparse(url).netloc.lower()
+        
+        result = {
+            'success': False,
+            'links': [],
+            'total_found': 0,
+            'base_url': url,
+            'canonical': None,
+            'error': None
+        }
+        
+        try:
+            root = lxml.html.document_fromstring(html.encode('utf-8'),
+                                                 parser=lxml.html.HTMLParser(encoding='utf-8'))
+            
+            # Relative links resolve against <base href> if the page declares one
+            base_href = root.xpath('string(//base/@href)').strip()
+            resolve_base = urljoin(url, base_href) if base_href else url
+            
+            canonical_href = root.xpath('string(//link[@rel="canonical"]/@href)').strip()
+            if canonical_href:
+                result['canonical'] = self._clean_and_resolve_url(canonical_href, resolve_base)
+            
+            raw_links = []
+            for href in root.xpath('//a/@href'):
+                cleaned_url = self._clean_and_resolve_url(href.strip(), resolve_base)
+                if cleaned_url:
+                    raw_links.append(cleaned_url)
+            
+            self._fill_result(result, raw_links, base_domain, include_external, max_links, exclude_patterns)
+            
+        except Exception as e:
+            error_msg = f"Unexpected error extracting links from HTML of '{url}': {str(e)}"
+            print(f"LinkExplorer: {error_msg}")
+            result['error'] = error_msg
+        
+        return result
+    
+    def _fill_result(self, result: Dict[str, any], raw_links: List[str], base_domain: str,
+                     include_external: bool, max_links: int, exclude_patterns: List[str]) -> None:
+        """Deduplicate, filter and limit the raw links into the result dictionary."""
+        # Remove duplicates while preserving order
+        unique_links = list(dict.fromkeys(raw_links))
+        result['total_found'] = len(unique_links)
+        
+        print(f"LinkExplorer: Found {len(unique_links)} unique links")
+        
+        # Filter links
+        filtered_links = self._filter_links(
+            unique_links, 
+            base_domain, 
+            include_external, 
+            exclude_patterns
+        )
+        
+        # Limit results
+        if max_links and len(filtered_links) > max_links:
+            filtered_links = filtered_links[:max_links]
+            print(f"LinkExplorer: Limited results to {max_links} links")
+        
+        result['links'] = filtered_links
+        result['success'] = True
+        
+        print(f"LinkExplorer: Returning {len(filtered_links)} filtered links")
+    
+    def _collect_links(self, driver: webdriver.Chrome, url: str, wait_for_dynamic_content: int) -> List[str]:
+        """Load the page and return the resolved href of every anchor tag."""
+        print(f"LinkExplorer: Loading page '{url}'...")
+        driver.get(url)
+        
+        # Wait for dynamic content, until the page settles or the cap is reached
+        if wait_for_dynamic_content > 0:
+            wait_until_ready(driver, wait_for_dynamic_content)
+        
+        # Find all anchor tags
+        link_elements = driver.find_elements(By.TAG_NAME, 'a')
+        raw_links = []
+        
+        for element in link_elements:
+            try:
+                href = element.get_attribute('href')
+                if href:
+                    cleaned_url = self._clean_and_resolve_url(href, url)
+                    if cleaned_url:
+                        raw_links.append(cleaned_url)
+            except Exception as e:
+                print(f"Error processing link element: {e}")
+                continue
+        
+        return raw_links
 
 
 # Convenience functions for easy integration
@@ -283,7 +362,8 @@ def get_links_from_url(url: str,
 
 def get_detailed_links_info(url: str, 
                            include_external: bool = False,
-                           max_links: int = 50) -> Dict[str, any]:
+                           max_links: int = 50,
+                           browser_pool=None) -> Dict[str, any]:
     """
     Get detailed information about links extracted from a URL.
     
@@ -291,11 +371,12 @@ def get_detailed_links_info(url: str,
         url: The URL to extract links from
         include_external: Whether to include external links
         max_links: Maximum number of links to return
+        browser_pool: Optional BrowserPool to borrow the browser from
         
     Returns:
         Detailed dictionary with extraction results
     """
-    explorer = LinkExplorer(headless=True)
+    explorer = LinkExplorer(headless=True, browser_pool=browser_pool)
     return explorer.extract_links_from_url(
         url=url,
         include_external=include_external,
@@ -0,0 +1,249 @@
+"""
+LLM Scheduler Module
+Ελέγχει πόσες κλήσεις στο upstream LLM τρέχουν ταυτόχρονα. Υπάρχει ένα
+συνολικό όριο για όλο τον worker και, όταν γεμίσει, οι εταιρείες
+εξυπηρετούνται με weighted fair queueing: μια εταιρεία με πολλή κίνηση
+δεν μπορεί να καθυστερεί τις υπόλοιπες. Κάθε εταιρεία έχει bounded ουρά·
+όταν γεμίσει, το request απορρίπτεται αμέσως (429).
+
+Το reserve() κρατά τη θέση (slot ή θέση στην ουρά) πριν σταλούν τα headers
+του response και το slot() την καταναλώνει, ώστε το 429 να δίνεται πάντα
+πριν ξεκινήσει το stream. Μια κράτηση που δεν καταναλώθηκε ούτε
+αποδεσμεύτηκε λήγει μετά από reservation_ttl.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional, Set, Tuple
+
+
+class TenantQueueFull(Exception):
+    def __init__(self, api_key: str, retry_after: int):
+        super().__init__(f"Too many queued requests for {api_key}")
+        self.api_key = api_key
+        self.retry_after = retry_after
+
+
+class Reservation:
+    """
+    Θέση που κρατήθηκε με το reserve(): την καταναλώνει το slot(), αλλιώς release()
+    """
+    __slots__ = ("_scheduler", "api_key", "queued", "expires_at", "_done")
+
+    def __init__(self, scheduler: "FairScheduler", api_key: str, queued: bool, expires_at: float):
+        self._scheduler = scheduler
+        self.api_key = api_key
+        self.queued = queued  # κράτησε θέση στην ουρά (όχι ελεύθερο slot)
+        self.expires_at = expires_at
+        self._done = False
+
+    def release(self) -> None:
+        self._scheduler._drop_reservation(self)
+
+
+def _new_counters() -> Dict[str, float]:
+    return {"granted": 0, "rejected": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+
+class _TenantQueue:
+    def __init__(self, api_key: str, counters: Dict[str, float]):
+        self.api_key = api_key
+        self.waiting: Deque[Tuple[asyncio.Future, float]] = deque()
+        self.reservations: Set[Reservation] = set()
+        self.vtime = 0.0  # virtual finish time για το fair queueing
+        self.active = 0
+        self.counters = counters  # ζει στο FairScheduler._counters, επιβιώνει το prune
+
+    def queued(self) -> int:
+        return len(self.waiting) + sum(r.queued for r in self.reservations)
+
+    def idle(self) -> bool:
+        return not self.active and not self.waiting and not self.reservations
+
+
+class FairScheduler:
+    """
+    Κάθε slot που δίνεται σε μια εταιρεία προχωρά το virtual time της κατά
+    1/weight. Όταν ελευθερώνεται slot, το παίρνει η εταιρεία με το μικρότερο
+    virtual time που περιμένει. Όποια εταιρεία μπαίνει στην ουρά ξεκινά από
+    το τρέχον virtual time, ώστε να μη μαζεύει «πίστωση» όσο ήταν idle.
+    Οι ουρές των εταιρειών χωρίς κίνηση (ούτε active, ούτε ουρά, ούτε
+    κρατήσεις) αφαιρούνται· οι counters τους (granted, rejected, αναμονή)
+    μένουν στο _counters και τα σύνολα του worker στο self.counters.
+    """
+
+    def __init__(self, max_concurrency: int = 32, max_queue_per_tenant: int = 20,
+                 reservation_ttl: float = 30):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_queue = max(max_queue_per_tenant, 0)
+        self.reservation_ttl = reservation_ttl
+        self._tenants: Dict[str, _TenantQueue] = {}
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self._active = 0
+        self._reserved = 0
+        self._vtime = 0.0
+        self._hold_avg = 1.0  # εκθετικός μέσος όρος διάρκειας ενός slot (s)
+        self.counters = {**_new_counters(), "expired_reservations": 0}
+
+    def _tenant(self, api_key: str) -> _TenantQueue:
+        tenant = self._tenants.get(api_key)
+        if tenant is None:
+            counters = self._counters.setdefault(api_key, _new_counters())
+            tenant = self._tenants[api_key] = _TenantQueue(api_key, counters)
+        return tenant
+
+    def _prune(self, tenant: _TenantQueue) -> None:
+        if tenant.idle() and self._tenants.get(tenant.api_key) is tenant:
+            del self._tenants[tenant.api_key]
+
+    def _retry_after(self, tenant: _TenantQueue) -> int:
+        return max(1, math.ceil(self._hold_avg * (tenant.queued() + 1) / self.max_concurrency))
+
+    def _reject(self, tenant: _TenantQueue) -> TenantQueueFull:
+        tenant.counters["rejected"] += 1
+        self.counters["rejected"] += 1
+        error = TenantQueueFull(tenant.api_key, self._retry_after(tenant))
+        self._prune(tenant)
+        return error
+
+    def reserve(self, api_key: str) -> Reservation:
+        """
+        Κρατά slot ή θέση στην ουρά πριν ξεκινήσει το response· TenantQueueFull (429) αν δεν υπάρχει
+        """
+        self._expire_reservations()
+        tenant = self._tenant(api_key)
+        has_capacity = self._active + self._reserved < self.max_concurrency and not self._has_waiting()
+        if not has_capacity and tenant.queued() >= self.max_queue:
+            raise self._reject(tenant)
+        reservation = Reservation(self, api_key, not has_capacity, time.monotonic() + self.reservation_ttl)
+        tenant.reservations.add(reservation)
+        self._reserved += 1
+        return reservation
+
+    def _drop_reservation(self, reservation: Reservation) -> bool:
+        if reservation._done:
+            return False
+        reservation._done = True
+        self._reserved -= 1
+        tenant = self._tenants.get(reservation.api_key)
+        if tenant is not None:
+            tenant.reservations.discard(reservation)
+            self._prune(tenant)
+        return True
+
+    def _expire_reservations(self) -> None:
+        now = time.monotonic()
+        expired = [r for t in self._tenants.values() for r in t.reservations if r.expires_at <= now]
+        for reservation in expired:
+            self.counters["expired_reservations"] += 1
+            self._drop_reservation(reservation)
+
+    @asynccontextmanager
+    async def slot(self, api_key: str, weight: Optional[float] = None,
+                   reservation: Optional[Reservation] = None):
+        # Με κράτηση η θέση είναι ήδη δική μας: δεν απορρίπτεται εδώ
+        reserved = reservation is not None and self._drop_reservation(reservation)
+        tenant = self._tenant(api_key)
+        weight = weight if weight and weight > 0 else 1.0
+        queued_at = time.monotonic()
+
+        if self._active < self.max_concurrency and not self._has_waiting():
+            self._grant(tenant, weight)
+        else:
+            if not reserved and len(tenant.waiting) >= self.max_queue:
+                raise self._reject(tenant)
+            if not tenant.waiting:
+                tenant.vtime = max(tenant.vtime, self._vtime)
+            entry = (asyncio.get_running_loop().create_future(), weight)
+            future = entry[0]
+            tenant.waiting.append(entry)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Πήρε slot τη στιγμή που ακυρώθηκε: το επιστρέφουμε
+                    self._release(tenant, 0)
+                else:
+                    try:
+                        tenant.waiting.remove(entry)
+                    except ValueError:
+                        pass
+                    self._prune(tenant)
+                raise
+
+        waited_ms = (time.monotonic() - queued_at) * 1000
+        tenant.counters["wait_ms_total"] += waited_ms
+        tenant.counters["wait_ms_max"] = max(tenant.counters["wait_ms_max"], waited_ms)
+        self.counters["wait_ms_total"] += waited_ms
+        self.counters["wait_ms_max"] = max(self.counters["wait_ms_max"], waited_ms)
+
+        started_at = time.monotonic()
+        try:
+            yield waited_ms
+        finally:
+            self._release(tenant, time.monotonic() - started_at)
+
+    def _has_waiting(self) -> bool:
+        return any(t.waiting for t in self._tenants.values())
+
+    def _grant(self, tenant: _TenantQueue, weight: float) -> None:
+        self._active += 1
+        tenant.active += 1
+        tenant.counters["granted"] += 1
+        self.counters["granted"] += 1
+        self._vtime = max(self._vtime, tenant.vtime)
+        tenant.vtime = max(tenant.vtime, self._vtime) + 1.0 / weight
+
+    def _release(self, tenant: _TenantQueue, held: float) -> None:
+        self._active -= 1
+        tenant.active -= 1
+        if held:
+            self._hold_avg = 0.9 * self._hold_avg + 0.1 * held
+        self._dispatch()
+        self._prune(tenant)
+
+    def _dispatch(self) -> None:
+        while self._active < self.max_concurrency:
+            candidates = [t for t in self._tenants.values() if t.waiting]
+            if not candidates:
+                return
+            tenant = min(candidates, key=lambda t: t.vtime)
+            future, weight = tenant.waiting.popleft()
+            if future.done():
+                self._prune(tenant)
+                continue
+            self._grant(tenant, weight)
+            future.set_result(None)
+
+    @staticmethod
+    def _wait_stats(counters: Dict[str, float]) -> Dict[str, float]:
+        granted = counters["granted"]
+        return {
+            "granted": granted,
+            "rejected": counters["rejected"],
+            "avg_wait_ms": round(counters["wait_ms_total"] / granted, 2) if granted else 0.0,
+            "max_wait_ms": round(counters["wait_ms_max"], 2),
+        }
+
+    def stats(self) -> Dict[str, object]:
+        tenants = {}
+        for api_key, counters in self._counters.items():
+            tenant = self._tenants.get(api_key)
+            tenants[api_key] = {
+                "active": tenant.active if tenant else 0,
+                "queued": len(tenant.waiting) if tenant else 0,
+                "reserved": len(tenant.reservations) if tenant else 0,
+                **self._wait_stats(counters),
+            }
+        return {
+            "active": self._active,
+            "reserved": self._reserved,
+            "max_concurrency": self.max_concurrency,
+            "max_queue_per_tenant": self.max_queue,
+            **self._wait_stats(self.counters),
+            "expired_reservations": self.counters["expired_reservations"],
+            "tenants": tenants,
+        }
@@ -1,6 +1,5 @@
-import redis
-import pymysql
-import os
+from redis_pool import get_sync_redis
+from db import get_sync_connection
 from datetime import datetime, date
 from dotenv import load_dotenv
 import logging
@@ -14,22 +13,13 @@ logger = logging.getLogger(__name__)
 #database connection
 def get_database_connection():
     """Σύνδεση στη MySQL"""
-    conn = pymysql.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        port=int(os.getenv('MYSQL_PORT', 3307)),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', 'MyAnalytics2024!'),
-        database=os.getenv('MYSQL_DATABASE', 'chatbot_platform'),
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
-    return conn
+    return get_sync_connection()
 
 
 #redis connection
 def get_redis_connection():
     """Σύνδεση στο Redis"""
-    return redis.Redis(host='localhost', port=6379, decode_responses=True)
+    return get_sync_redis()
 
 
 def migrate_daily_analytics():
@@ -0,0 +1,126 @@
+"""
+Page Readiness Module
+Αντί για σταθερό sleep μετά το driver.get() (8 s ανά σελίδα), περιμένουμε
+όσο χρειάζεται η σελίδα για να «ηρεμήσει»:
+
+    - document.readyState == 'complete'
+    - κανένα DOM mutation για PAGE_SETTLE_QUIET_MS (MutationObserver)
+    - κανένα νέο resource (XHR / fetch / εικόνες) για το ίδιο διάστημα,
+      από το performance.getEntriesByType('resource') ως προσέγγιση network idle
+
+με ανώτατο όριο το max_wait του caller. Οι χρόνοι μαζεύονται στο settle_stats
+(p50 / p95 / πόσες σελίδες έφτασαν το όριο) για να ρυθμιστεί το όριο.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+QUIET_MS = float(os.getenv('PAGE_SETTLE_QUIET_MS', 500))
+POLL_MS = float(os.getenv('PAGE_SETTLE_POLL_MS', 100))
+MAX_SECONDS = float(os.getenv('PAGE_SETTLE_MAX_SECONDS', 8))
+
+# Εγκαθιστά τον observer την πρώτη φορά και επιστρέφει
+# [readyState, ms από το τελευταίο mutation, πλήθος resources, ms από το τελευταίο resource]
+_PROBE_JS = """
+if (!window.__settle) {
+    window.__settle = {last: performance.now()};
+    new MutationObserver(function () { window.__settle.last = performance.now(); })
+        .observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+}
+var now = performance.now();
+var resources = performance.getEntriesByType('resource');
+var lastResource = 0;
+for (var i = 0; i < resources.length; i++) {
+    if (resources[i].responseEnd > lastResource) { lastResource = resources[i].responseEnd; }
+}
+return [document.readyState, now - window.__settle.last, resources.length, now - lastResource];
+"""
+
+
+class SettleResult:
+    __slots__ = ("ms", "reason")
+
+    def __init__(self, ms: float, reason: str):
+        self.ms = ms
+        self.reason = reason  # quiet / cap / error
+
+
+class SettleStats:
+    """
+    Συγκεντρωτικά των settle χρόνων στα τελευταία `window` pages του process
+    """
+
+    def __init__(self, window: int = 1000):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.counters = {"pages": 0, "quiet": 0, "cap": 0, "error": 0}
+
+    def record(self, result: SettleResult) -> None:
+        with self._lock:
+            self._samples.append(result.ms)
+            self.counters["pages"] += 1
+            self.counters[result.reason] += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            samples = sorted(self._samples)
+            counters = dict(self.counters)
+        if not samples:
+            return {**counters, "avg_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+
+        def percentile(p: float) -> float:
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+        return {
+            **counters,
+            "avg_ms": round(sum(samples) / len(samples), 1),
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": samples[-1],
+        }
+
+
+settle_stats = SettleStats()
+
+
+def wait_until_ready(driver, max_wait: Optional[float] = None, quiet_ms: float = QUIET_MS,
+                     poll_ms: float = POLL_MS) -> SettleResult:
+    """
+    Περιμένει μετά το driver.get() μέχρι η σελίδα να ηρεμήσει ή να περάσουν max_wait δευτερόλεπτα
+    """
+    max_wait = MAX_SECONDS if max_wait is None else max_wait
+    start = time.perf_counter()
+    deadline = start + max(max_wait, 0)
+    reason = "cap"
+    resource_count = -1
+    errors = 0
+    while True:
+        try:
+            ready_state, since_mutation, count, since_resource = driver.execute_script(_PROBE_JS)
+            errors = 0
+        except Exception as e:
+            # Π.χ. η σελίδα κάνει redirect την ώρα του probe· αν επιμένει, κρατάμε ό,τι έχει φορτώσει
+            errors += 1
+            if errors >= 3:
+                logger.debug("Readiness probe failed: %s", e)
+                reason = "error"
+                break
+        else:
+            if (ready_state == 'complete' and since_mutation >= quiet_ms
+                    and count == resource_count and since_resource >= quiet_ms):
+                reason = "quiet"
+                break
+            resource_count = count
+        if time.perf_counter() >= deadline:
+            break
+        time.sleep(min(poll_ms / 1000, max(deadline - time.perf_counter(), 0)))
+
+    result = SettleResult(round((time.perf_counter() - start) * 1000, 1), reason)
+    settle_stats.record(result)
+    return result
@@ -0,0 +1,129 @@
+"""
+Rate Limit Module
+Token bucket στο Redis για τα public endpoints του widget. Κάθε request
+ελέγχει με ένα Lua script (ένα round-trip, ατομικά) δύο buckets: της
+εταιρείας συνολικά και του συγκεκριμένου client (level "session", με
+κλειδί την IP του client). Αν κάποιο δεν
+έχει αρκετά tokens δεν χρεώνεται κανένα και επιστρέφεται σε πόσο χρόνο
+αξίζει να ξαναδοκιμάσει ο client.
+"""
+
+import json
+import logging
+import math
+from typing import Dict, List, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+# KEYS: τα buckets, ARGV: capacity_i, refill_per_sec_i για κάθε bucket και στο τέλος το cost
+TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local cost = tonumber(ARGV[#ARGV])
+local tokens = {}
+local wait = 0
+
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i]) / 1000
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    available = math.min(capacity, available + math.max(0, now - ts) * rate)
+    tokens[i] = available
+    if available < cost then
+        wait = math.max(wait, math.ceil((cost - available) / rate))
+    end
+end
+
+if wait > 0 then
+    return {0, wait}
+end
+
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i]) / 1000
+    redis.call('HSET', key, 'tokens', tostring(tokens[i] - cost), 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate) + 1000)
+end
+return {1, 0}
+"""
+
+# Όρια ανά endpoint: capacity = burst, per_minute = ρυθμός αναπλήρωσης.
+# Μια εταιρεία μπορεί να τα αλλάξει από τη στήλη rate_limits του companies.
+DEFAULT_LIMITS: Dict[str, Dict[str, Dict[str, float]]] = {
+    "widget-chat": {"tenant": {"capacity": 120, "per_minute": 600}, "session": {"capacity": 10, "per_minute": 20}},
+    "rating": {"tenant": {"capacity": 60, "per_minute": 300}, "session": {"capacity": 3, "per_minute": 3}},
+    "submit-lead": {"tenant": {"capacity": 30, "per_minute": 120}, "session": {"capacity": 3, "per_minute": 3}},
+    "available-slots": {"tenant": {"capacity": 60, "per_minute": 300}, "session": {"capacity": 10, "per_minute": 30}},
+}
+
+
+class RateLimited(Exception):
+    def __init__(self, scope: str, retry_after: int):
+        super().__init__(f"Rate limit exceeded for {scope}")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def tenant_limits(company_data: Optional[dict], scope: str) -> Dict[str, Dict[str, float]]:
+    """
+    Τα όρια ενός endpoint για μια εταιρεία: defaults + ό,τι έχει οριστεί
+    στη στήλη rate_limits (JSON), π.χ. {"widget-chat": {"session": {"per_minute": 40}}}
+    """
+    limits = {level: dict(values) for level, values in DEFAULT_LIMITS[scope].items()}
+    if not company_data:
+        return limits
+
+    overrides = company_data.get('_rate_limits')
+    if overrides is None:
+        raw = company_data.get('rate_limits')
+        try:
+            overrides = (json.loads(raw) if isinstance(raw, str) else raw) or {}
+        except ValueError:
+            logger.warning(f"Invalid rate_limits for {company_data.get('api_key')}: {raw!r}")
+            overrides = {}
+        company_data['_rate_limits'] = overrides
+
+    for level, values in (overrides.get(scope) or {}).items():
+        if level in limits and isinstance(values, dict):
+            limits[level].update(values)
+    return limits
+
+
+class RateLimiter:
+    def __init__(self, redis_client: aioredis.Redis, key_prefix: str = "ratelimit:"):
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self._script = redis_client.register_script(TOKEN_BUCKET_LUA)
+
+    async def check(self, scope: str, api_key: str, client_id: str,
+                    limits: Dict[str, Dict[str, float]], cost: int = 1) -> None:
+        """
+        Χρεώνει ένα token στο bucket της εταιρείας και του client ή
+        πετάει RateLimited με το Retry-After σε δευτερόλεπτα
+        """
+        keys: List[str] = [
+            f"{self.key_prefix}{scope}:{api_key}",
+            f"{self.key_prefix}{scope}:{api_key}:{client_id}",
+        ]
+        args: List[float] = []
+        for level in ("tenant", "session"):
+            args += [limits[level]["capacity"], limits[level]["per_minute"] / 60]
+        args.append(cost)
+
+        allowed, wait_ms = await self._evaluate(keys, args)
+        if not allowed:
+            raise RateLimited(scope, max(1, math.ceil(wait_ms / 1000)))
+
+    async def _evaluate(self, keys: List[str], args: List[float]) -> Tuple[int, int]:
+        try:
+            allowed, wait_ms = await self._script(keys=keys, args=args)
+            return int(allowed), int(wait_ms)
+        except redis.RedisError as e:
+            # Αν πέσει το Redis δεν κόβουμε την κίνηση
+            logger.warning(f"Rate limit check failed, allowing request: {e}")
+            return 1, 0
@@ -0,0 +1,63 @@
+"""
+Redis Pool Module
+Κοινές ρυθμίσεις σύνδεσης στο Redis για server5 και analytics_worker.
+Οι async clients μοιράζονται ένα bounded BlockingConnectionPool: όταν
+γεμίσει, ένα request περιμένει ελεύθερη σύνδεση (έως REDIS_POOL_TIMEOUT)
+αντί να ανοίγει νέες χωρίς όριο. Τα socket timeouts και το health check
+προστατεύουν από συνδέσεις που κόλλησαν ή έκλεισαν σιωπηλά.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+import redis
+import redis.asyncio as aioredis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def redis_settings() -> Dict[str, Any]:
+    return {
+        "host": os.getenv('REDIS_HOST', 'localhost'),
+        "port": int(os.getenv('REDIS_PORT', 6379)),
+        "db": int(os.getenv('REDIS_DB', 0)),
+        "password": os.getenv('REDIS_PASSWORD') or None,
+        "socket_timeout": float(os.getenv('REDIS_SOCKET_TIMEOUT', 5)),
+        "socket_connect_timeout": float(os.getenv('REDIS_CONNECT_TIMEOUT', 2)),
+        "health_check_interval": int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30)),
+        "decode_responses": True,
+    }
+
+
+_async_client: Optional[aioredis.Redis] = None
+
+
+def get_async_redis() -> aioredis.Redis:
+    """
+    Ο κοινός async client του process (ένα pool για όλα τα modules)
+    """
+    global _async_client
+    if _async_client is None:
+        pool = aioredis.BlockingConnectionPool(
+            max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', 64)),
+            timeout=float(os.getenv('REDIS_POOL_TIMEOUT', 2)),
+            **redis_settings(),
+        )
+        _async_client = aioredis.Redis(connection_pool=pool)
+    return _async_client
+
+
+async def close_async_redis() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        await _async_client.connection_pool.disconnect()
+        _async_client = None
+
+
+def get_sync_redis() -> redis.Redis:
+    """
+    Blocking client για scripts που δεν τρέχουν σε event loop (π.χ. migration)
+    """
+    return redis.Redis(**redis_settings())
@@ -0,0 +1,68 @@
+"""
+Request Log Module
+Ένα δομημένο (JSON) record ανά chat request αντί για ~10 γραμμές log.
+Κάθε στάδιο σημειώνει σε πόσα ms από την αρχή του request ολοκληρώθηκε.
+Στο τέλος αποφασίζεται αν το record θα γραφτεί: πάντα για σφάλματα,
+aborts και αργά requests, αλλιώς με πιθανότητα REQUEST_LOG_SAMPLE_RATE.
+Το JSON φτιάχνεται μόνο όταν κάποιος handler γράψει πράγματι το record.
+"""
+
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Dict
+
+logger = logging.getLogger("chat.requests")
+
+SAMPLE_RATE = float(os.getenv('REQUEST_LOG_SAMPLE_RATE', 0.1))
+SLOW_MS = float(os.getenv('REQUEST_LOG_SLOW_MS', 5000))
+
+
+class _LazyJSON:
+    __slots__ = ("record",)
+
+    def __init__(self, record: Dict[str, Any]):
+        self.record = record
+
+    def __str__(self) -> str:
+        return json.dumps(self.record, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class RequestLog:
+    __slots__ = ("route", "fields", "stages", "_start", "_emitted")
+
+    def __init__(self, route: str, **fields: Any):
+        self.route = route
+        self.fields: Dict[str, Any] = fields
+        self.stages: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._emitted = False
+
+    def set(self, **fields: Any) -> None:
+        self.fields.update(fields)
+
+    def mark(self, stage: str) -> float:
+        elapsed_ms = round((time.perf_counter() - self._start) * 1000, 2)
+        self.stages[stage] = elapsed_ms
+        return elapsed_ms
+
+    def emit(self, outcome: str = "ok", **fields: Any) -> None:
+        """
+        Γράφει το record μία φορά (οι επόμενες κλήσεις αγνοούνται)
+        """
+        if self._emitted:
+            return
+        self._emitted = True
+        total_ms = self.mark("total")
+
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        if outcome == "ok" and total_ms < SLOW_MS and random.random() >= SAMPLE_RATE:
+            return
+        record = {"ts": time.time(), "route": self.route, "outcome": outcome}
+        record.update(self.fields)
+        record.update(fields)
+        record["stages_ms"] = self.stages
+        logger.info("%s", _LazyJSON(record))
@@ -1,32 +1,48 @@
 # Imports από τα υπάρχοντα modules
-from source_code import get_website_source_code_selenium
-from link_discovery import get_detailed_links_info
+from source_code import fetch_rendered_page
+from link_discovery import LinkExplorer
 from clean_html import clean_html_for_content
+from browser_pool import BrowserPool, get_browser_pool
+from page_readiness import MAX_SECONDS as SETTLE_MAX_SECONDS
+from site_crawler import SiteCrawler
+from static_fetch import NO_BROWSER_REASONS, StaticFetcher, get_static_fetcher, needs_browser
 
 # Standard library imports
 import json
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 import time
 from bs4 import BeautifulSoup
 import asyncio
 import aiohttp
 from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 class ScrapingController:
     """
     Controller για unified web scraping που ενοποιεί source_code, link_discovery και clean_html
     """
     
-    def __init__(self, max_links: int = 50, timeout: int = 3, headless: bool = True):
+    def __init__(self, max_links: int = 50, timeout: int = 3, headless: bool = True,
+                 browser_pool: Optional[BrowserPool] = None,
+                 static_fetcher: Optional[StaticFetcher] = None):
         self.max_links = max_links
         self.timeout = timeout
         self.headless = headless
-        # παράλληλες εργασίες 
-        self.executor = ThreadPoolExecutor(max_workers=5)
+        # Δανειζόμαστε browsers από το κοινό pool αντί για νέο Chrome ανά σελίδα
+        # (headless=False μόνο για debugging: δικό του pool με ορατό παράθυρο)
+        if browser_pool is None:
+            browser_pool = get_browser_pool() if headless else BrowserPool(size=1, headless=False)
+        self.browser_pool = browser_pool
+        # παράλληλες εργασίες: όσες και οι browsers του pool
+        self.executor = ThreadPoolExecutor(max_workers=self.browser_pool.size)
+        # Static-first: πρώτα απλό GET, browser μόνο για σελίδες που θέλουν JS (μόνο στο async scraping)
+        self.static_fetcher = static_fetcher or get_static_fetcher()
+        self.link_explorer = LinkExplorer(headless=headless, browser_pool=self.browser_pool)
 
     def scrape_website(self, url: str) -> Dict[str, Any]:
         """
-        Scrape μία σελίδα και όλα τα discovered links της
+        Scrape μία σελίδα και όλα τα discovered links της (ένα επίπεδο,
+        το crawl σε βάθος γίνεται στο scrape_website_async)
         
         Args:
             url: Το URL της κύριας σελίδας
@@ -40,21 +56,19 @@ class ScrapingController:
             "summary": {
                 "total_links_found": 0,
                 "successfully_scraped": 0,
-                "failed": 0
+                "failed": 0,
+                "fetch_paths": {"static": 0, "browser": 0}
             }
         }
 
         # 1. Scrape την κύρια σελίδα
         print(f"Scraping main page: {url}")
-        main_page_data = self._scrape_single_page(url)
+        main_page_data, links_info = self._scrape_page_with_links(url)
         result["main_page"] = main_page_data
+        self._count_fetch_path(result, main_page_data)
 
-        # 2. Discover links από την κύρια σελίδα
+        # 2. Links από το HTML της κύριας σελίδας (βρέθηκαν ήδη στο βήμα 1)
         if main_page_data.get("status") == "success":
-            print("Discovering links...")
-            links_info=get_detailed_links_info(url, include_external=False, max_links=None)
-
-    
             if links_info.get("success"):
                 all_links = links_info.get("links", [])
                 result["summary"]["total_links_found"] = len(all_links)
@@ -67,6 +81,7 @@ class ScrapingController:
                     print(f"Scraping link: {link_url}")
                     link_data = self._scrape_single_page(link_url)
                     result["discovered_links"].append(link_data)
+                    self._count_fetch_path(result, link_data)
                 
                     if link_data.get("status") == "success":
                         result["summary"]["successfully_scraped"] += 1
@@ -77,81 +92,138 @@ class ScrapingController:
 
 
     async def scrape_website_async(self, url: str) -> Dict[str, Any]:
+        """
+        Crawl του site σε βάθος (SiteCrawler) με το ίδιο JSON format με το scrape_website
+        """
         result = {
             "main_page": {},
             "discovered_links": [],
             "summary": {
                 "total_links_found": 0,
                 "successfully_scraped": 0,
-                "failed": 0
+                "failed": 0,
+                "fetch_paths": {"static": 0, "browser": 0}
             }
         }
 
-    # 1. Scrape την κύρια σελίδα
-        print(f"Scraping main page: {url}")
-        main_page_data = await self._scrape_single_page_async(url)
-        result["main_page"] = main_page_data
+        # Crawl σε βάθος: η κύρια σελίδα είναι η πρώτη (depth 0), οι υπόλοιπες
+        # έρχονται με σειρά προτεραιότητας μέχρι το όριο των max_links
+        crawler = self._crawler()
+        async for page_data in self.crawl_pages(url, crawler):
+            self._count_fetch_path(result, page_data)
+            if page_data["depth"] == 0 and not result["main_page"]:
+                result["main_page"] = page_data
+                continue
 
-    # 2. Discover links από την κύρια σελίδα
-        if main_page_data.get("status") == "success":
-            print("Discovering links...")
-            links_info = get_detailed_links_info(url, include_external=False, max_links=None)
-
-            if links_info.get("success"):
-                all_links = links_info.get("links", [])
-                result["summary"]["total_links_found"] = len(all_links)
-    
-            # Περιορίζουμε στα max_links
-                links_to_scrape = all_links[:self.max_links]
-    
-            # 3. PARALLEL scraping των discovered links
-                print(f"Starting parallel scraping of {len(links_to_scrape)} links...")
-                tasks = [self._scrape_single_page_async(link_url) for link_url in links_to_scrape]
-            
-            # Εκτέλεση όλων των tasks παράλληλα
-                link_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Επεξεργασία αποτελεσμάτων
-                for link_data in link_results:
-                    if isinstance(link_data, Exception):
-                    # Handle exception
-                        result["summary"]["failed"] += 1
-                        continue
-                    
-                    result["discovered_links"].append(link_data)
-                
-                    if link_data.get("status") == "success":
-                        result["summary"]["successfully_scraped"] += 1
-                    else:
-                        result["summary"]["failed"] += 1
+            result["discovered_links"].append(page_data)
+            if page_data.get("status") == "success":
+                result["summary"]["successfully_scraped"] += 1
+            else:
+                result["summary"]["failed"] += 1
 
+        result["summary"]["total_links_found"] = crawler.counters["discovered"]
+        result["summary"]["crawl"] = crawler.stats()
         return result
 
-    def _scrape_single_page(self, url: str) -> Dict[str, Any]:
+    def _crawler(self) -> SiteCrawler:
+        return SiteCrawler.from_env(self._scrape_page_with_links_async, max_pages=self.max_links + 1,
+                                    concurrency=self.browser_pool.size)
+
+    async def crawl_pages(self, url: str, crawler: Optional[SiteCrawler] = None) -> AsyncIterator[Dict[str, Any]]:
         """
-        Scrape μία μονή σελίδα και επιστρέφει τα δεδομένα της
+        Κάθε σελίδα του site (ήδη καθαρισμένη) μόλις ολοκληρωθεί, χωρίς να περιμένουμε όλο το crawl
+
+        Args:
+            url: Το URL της κύριας σελίδας
+            crawler: Προαιρετικά δικός μας SiteCrawler (π.χ. για τα stats του)
+        """
+        print(f"Crawling website: {url}")
+        crawler = crawler or self._crawler()
+        async for page_data in crawler.crawl(url):
+            print(f"Scraped (depth {page_data['depth']}): {page_data['url']}")
+            yield page_data
+
+    @staticmethod
+    def _count_fetch_path(result: Dict[str, Any], page_data: Dict[str, Any]) -> None:
+        fetch_path = page_data.get("fetch_path")
+        if fetch_path in result["summary"]["fetch_paths"]:
+            result["summary"]["fetch_paths"][fetch_path] += 1
+
+    def _scrape_page_with_links(self, url: str, static_html: Optional[str] = None,
+                          fetch_reason: Optional[str] = None,
+                          page_url: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Scrape μιας σελίδας και link discovery πάνω στο ίδιο HTML,
+        χωρίς να ξαναφορτωθεί η σελίδα σε browser
+
+        Args:
+            page_url: Το τελικό URL του απλού GET (μετά από redirects), για τα σχετικά links
+
+        Returns:
+            (page_data, links_info) με το format του LinkExplorer.extract_links_from_url
+        """
+        page_data, raw_html = self._scrape_page(url, static_html, fetch_reason)
+        links_info = {"success": False, "links": []}
+
+        if page_data["status"] == "success":
+            base_url = page_url if page_url and page_data["fetch_path"] == "static" else url
+            links_info = self.link_explorer.extract_links_from_html(
+                raw_html, base_url, include_external=False, max_links=None
+            )
+        return page_data, links_info
+
+    def _scrape_single_page(self, url: str, static_html: Optional[str] = None,
+                            fetch_reason: Optional[str] = None) -> Dict[str, Any]:
+        return self._scrape_page(url, static_html, fetch_reason)[0]
+
+    def _scrape_page(self, url: str, static_html: Optional[str] = None,
+                     fetch_reason: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Scrape μία μονή σελίδα και επιστρέφει τα δεδομένα της μαζί με το raw HTML
         
         Args:
             url: Το URL της σελίδας
+            static_html: HTML από απλό GET· χρησιμοποιείται αν δεν χρειάζεται browser
+            fetch_reason: Γιατί το απλό GET απέτυχε (αν απέτυχε)
             
         Returns:
-            Dictionary με τα δεδομένα της σελίδας
+            (page_data, raw_html)
         """
         page_data = {
             "url": url,
             "title": "",
             "clean_content": "",
             "status": "failed",
-            "error": None
+            "error": None,
+            "fetch_path": "browser",
+            "fetch_reason": fetch_reason
         }
         
-        # 1. Πάρε raw HTML με Selenium
+        # 1. Πάρε raw HTML: το στατικό αν αρκεί, αλλιώς με Selenium
+        if fetch_reason in NO_BROWSER_REASONS:
+            page_data["fetch_path"] = "static"
+            page_data["error"] = f"Static fetch failed: {fetch_reason}"
+            return page_data, None
+
+        raw_html = None
         try:
-            raw_html = get_website_source_code_selenium(url, wait_for_dynamic_content_seconds=8, headless=self.headless)
+            if static_html is not None:
+                page_data["fetch_reason"] = needs_browser(static_html)
+                if page_data["fetch_reason"] is None:
+                    raw_html = static_html
+                    page_data["fetch_path"] = "static"
+
+            if raw_html is None:
+                # Ανώτατο όριο (PAGE_SETTLE_MAX_SECONDS): η αναμονή τελειώνει μόλις η σελίδα ηρεμήσει
+                raw_html, settle = fetch_rendered_page(url, max_wait_seconds=SETTLE_MAX_SECONDS,
+                                                       browser_pool=self.browser_pool)
+                if settle is not None:
+                    page_data["settle_ms"] = settle.ms
+                    page_data["settle_reason"] = settle.reason
         
             if not raw_html:
                 page_data["error"] = "Failed to fetch HTML"
-                return page_data
+                return page_data, None
             
             # 2. Καθάρισε το HTML
             clean_content = clean_html_for_content(raw_html)
@@ -196,16 +268,17 @@ class ScrapingController:
         except Exception as e:
             page_data["error"] = str(e)
     
-        return page_data
+        return page_data, raw_html
 
 #το scraping εκτελείται σε ξεχωριστό thread
     
-    async def _scrape_single_page_async(self, url: str) -> Dict[str, Any]:
+    async def _scrape_page_with_links_async(self, url: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        static = await self.static_fetcher.fetch(url)
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
-            self.executor, 
-            self._scrape_single_page, 
-            url
+            self.executor,
+            partial(self._scrape_page_with_links, url, static_html=static.html,
+                    fetch_reason=static.reason, page_url=static.url)
         )
 
     def scrape_to_json(self, url: str, save_to_file: bool = False, filename: str = None) -> str:
@@ -1,18 +1,22 @@
 import json
-from typing import Dict, Any, Optional, List , Literal
+from typing import Dict, Any, Optional, List , Literal, Tuple
 
 from aiohttp import request
 from ai_filter import AIContentFilter  
-from fastapi import FastAPI, HTTPException, Query , Form , File, UploadFile, Request
+from fastapi import FastAPI, HTTPException, Query , Form , File, UploadFile, Request, Depends
 from pydantic import BaseModel, HttpUrl , Field
 from scrapping_control2 import ScrapingController
-from openai import OpenAI
+from openai import AsyncOpenAI
 from datetime import datetime
 from collections import defaultdict
 from fastapi.responses import StreamingResponse, HTMLResponse , Response
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+import anyio
 import asyncio
+import hashlib
+import ipaddress
+import math
 import time
 import tiktoken  # για token counting
 import logging
@@ -20,21 +24,35 @@ from file_extractor import extract_text_from_files
 import secrets
 import string
 import os
-from urllib.parse import urlparse
-import re
 #import redis.commands.streams as streams
 import uuid
 from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import timezone
-import redis
+from redis_pool import close_async_redis, get_async_redis
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
-import pymysql
-import pymysql.cursors
+import db
+from browser_pool import close_browser_pool, get_browser_pool, resolve_chromedriver
+from static_fetch import close_static_fetcher
+from page_readiness import settle_stats
 from fastapi import Body
 from migration import migrate_daily_analytics
 import base64 #μετατροπή εικόνων σε string για αποθήκευση στην βάση
-from create_system_prompt import create_system_prompt
+from create_system_prompt import PROMPT_LAYOUT_VERSION, create_system_prompt
+from stream_flush import FlushPolicy, coalesce_deltas, replay_text
+from answer_cache import AnswerCache, normalize_question
+from conversation_memory import ConversationMemory
+from tenant_cache import TenantConfigCache
+from single_flight import SingleFlight
+from llm_scheduler import FairScheduler, Reservation, TenantQueueFull
+from rate_limit import RateLimited, RateLimiter, tenant_limits
+from domain_allowlist import domain_matcher
+from chat_events import ChatEventPublisher
+from request_log import RequestLog
+from chat_pipeline import ChatContext, ChatPipeline
+from sse_encoder import SSEEncoder
+from knowledge_index import build_knowledge_index, fuse_rankings, load_index_async, render_retrieved
+from vector_index import build_vector_index, load_vector_index_async
 from fastapi.responses import RedirectResponse
 
 templates = Jinja2Templates(directory="templates")
@@ -44,18 +62,87 @@ templates = Jinja2Templates(directory="templates")
 load_dotenv()
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
+# Ένας encoder ανά model για όλο το process (το encoding_for_model είναι ακριβό)
+_token_encodings: Dict[str, Any] = {}
+
+def get_token_encoding(model: str = "gpt-4o"):
+    if model not in _token_encodings:
+        try:
+            _token_encodings[model] = tiktoken.encoding_for_model(model)
+        except Exception as e:
+            logger.warning("No tiktoken encoding for %s, using word estimate: %s", model, e)
+            _token_encodings[model] = None
+    return _token_encodings[model]
+
 #count tokens for given text,fullback if not gpt4turbo
-def count_tokens(text: str, model: str = "gpt-4o") -> int:    
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-        return len(encoding.encode(text))
-    except:
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    if not text:
+        return 0
+    encoding = get_token_encoding(model)
+    if encoding is None:
         # Fallback estimation
-        return len(text.split()) * 1.3
+        return math.ceil(len(text.split()) * 1.3)
+    # disallowed_special=() ώστε κείμενο χρήστη σαν "<|endoftext|>" να μη σκάει
+    return len(encoding.encode(text, disallowed_special=()))
+
+def get_prompt_version(company_data: dict) -> str:
+    """
+    Σύντομο hash του layout + prompt_snapshot: αλλάζει όταν αλλάξει το prompt,
+    ώστε οι cached απαντήσεις της παλιάς έκδοσης να μη χρησιμοποιούνται
+    """
+    version = company_data.get('_prompt_version')
+    if version is None:
+        versioned = f"v{PROMPT_LAYOUT_VERSION}\n{company_data['prompt_snapshot']}"
+        version = hashlib.sha1(versioned.encode('utf-8')).hexdigest()[:12]
+        company_data['_prompt_version'] = version
+    return version
+
+def get_prompt_tokens(company_data: dict) -> int:
+    """
+    Tokens του prompt_snapshot: υπολογίζονται μία φορά στη δημιουργία του chatbot.
+    Για παλιές εγγραφές χωρίς prompt_tokens μετράμε μία φορά και το κρατάμε
+    στο cached dict της εταιρείας.
+    """
+    tokens = company_data.get('prompt_tokens')
+    if tokens is None:
+        tokens = count_tokens(company_data['prompt_snapshot'])
+        company_data['prompt_tokens'] = tokens
+    return tokens
+
+
 
+async def build_system_prompt(company_data: dict, api_key: str, message_data: "ChatMessage"):
+    """
+    Επιστρέφει (system_prompt, retrieved knowledge, tokens των retrieved chunks).
+    Το system_prompt είναι το σταθερό prefix της εταιρείας. Για chatbots με
+    knowledge index τα top-k chunks της ερώτησης επιστρέφονται χωριστά ώστε
+    να μπουν μετά το prefix.
+    """
+    prompt_snapshot = company_data['prompt_snapshot']
+
+    index = await load_index_async(api_key)
+    if index is None:
+        return prompt_snapshot, "", 0
+
+    # Η προηγούμενη ερώτηση βοηθά σε follow-ups τύπου "και πόσο κοστίζει;"
+    last_user_turn = next((turn.content for turn in reversed(message_data.history) if turn.role == "user"), "")
+    query = f"{last_user_turn}\n{message_data.message}"
+
+    # Hybrid: lexical (BM25) + semantic (vectors), ενωμένα με reciprocal rank fusion
+    rankings = [index.rank(query, RAG_TOP_K * 2)]
+    vectors = await load_vector_index_async(api_key)
+    if vectors is not None:
+        rankings.append(vectors.search(query, RAG_TOP_K * 2))
+    hits = [
+        (score, index.chunks[doc_id])
+        for doc_id, score in fuse_rankings(rankings, RAG_TOP_K)
+        if doc_id < len(index.chunks)
+    ]
+    context_tokens = sum(count_tokens(chunk['text']) for _, chunk in hits)
+    return prompt_snapshot, render_retrieved(hits), context_tokens
 
 
 #συνάρτηση για δημιουργία API KEY
@@ -78,42 +165,27 @@ def generate_api_key(length: int = 32) -> str:
 #ενημέρωση και ανάκτηση δεδομένων από την βάση
 
 
-def get_database_connection():
-    conn = pymysql.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        port=int(os.getenv('MYSQL_PORT', 3307)),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', 'MyAnalytics2024!'),
-        database=os.getenv('MYSQL_DATABASE', 'chatbot_platform'),
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
-    return conn
-
-def insert_company(company_data: dict):
+async def insert_company(company_data: dict):
     """
     Εισάγει νέα εταιρεία στη βάση δεδομένων
     
     company_data πρέπει να περιέχει:
     - companyName, websiteURL, industry, industryOther, description,
     - greeting, persona, files_data, 
-    - website_data, prompt_snapshot, api_key, script
+    - website_data, prompt_snapshot, prompt_tokens, api_key, script
     """
-    conn = get_database_connection()
     try:
-        cursor = conn.cursor()
-        
         # SQL INSERT statement
         insert_sql = """
         INSERT INTO companies (
             companyName, websiteURL, industry, industryOther, description,
             botName, greeting, botRestrictions, files_data,
-            website_data, prompt_snapshot, api_key, script , allowedDomains,
+            website_data, prompt_snapshot, prompt_tokens, api_key, script , allowedDomains,
             primaryColor, position, themeStyle, suggestedPrompts, 
             coreFeatures, leadCaptureFields,
             chatbotLanguage, logo_url, botAvatar, personaSelect, 
             defaultFailResponse, botTypePreset, faq_data, appointment_settings
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,%s,%s,%s,%s,%s,%s,%s,%s)
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,%s,%s,%s,%s,%s,%s,%s,%s)
         """
         
         # Τα δεδομένα για εισαγωγή
@@ -129,6 +201,7 @@ def insert_company(company_data: dict):
             company_data['files_data'],
             company_data['website_data'],
             company_data['prompt_snapshot'],
+            company_data.get('prompt_tokens'),
             company_data['api_key'],
             company_data['script'],
             company_data['allowedDomains'],
@@ -148,34 +221,34 @@ def insert_company(company_data: dict):
             company_data.get('appointment_settings', '{}') 
         )
         
-        cursor.execute(insert_sql, values)
-        conn.commit()
+        await db.execute(insert_sql, values)
         
-        print(f"✅ Company '{company_data['companyName']}' inserted successfully")
+        logger.info("✅ Company '%s' inserted successfully", company_data['companyName'])
         return True
         
     
     except Exception as e:
-        print(f"❌ Database error: {str(e)}")
+        logger.error("❌ Database error: %s", e)
         return False
-    finally:
-        conn.close()
 
 #παίρνει τις πλήροφορίες από την βάση δείχνονττας το api_key
-def get_company_by_api_key(api_key: str):
+async def get_company_by_api_key(api_key: str):
     """
-    Αναζητά στοιχεία εταιρείας από τη βάση δεδομένων με API key
+    Αναζητά στοιχεία εταιρείας με API key μέσω του tenant cache (L1 process / L2 Redis)
+    
+    Returns: dictionary με όλα τα στοιχεία ή None αν δεν βρεθεί
+    """
+    return await company_cache.get(api_key)
+
+async def load_company_from_db(api_key: str):
+    """
+    Αναζητά στοιχεία εταιρείας απευθείας από τη βάση δεδομένων με API key
     
     Returns: dictionary με όλα τα στοιχεία ή None αν δεν βρεθεί
     """
-    conn = get_database_connection()
     try:
-        cursor = conn.cursor()
-        
         select_sql = "SELECT * FROM companies WHERE api_key = %s"
-        cursor.execute(select_sql, (api_key,))
-        
-        row = cursor.fetchone()
+        row = await db.fetchone(select_sql, (api_key,))
         if row:
             # Μετατρέπουμε το Row σε dictionary
             return dict(row)
@@ -183,91 +256,43 @@ def get_company_by_api_key(api_key: str):
             return None
             
     except Exception as e:
-        print(f"⚠️ Database error: {str(e)}")
+        logger.error("⚠️ Database error: %s", e)
         return None
-    finally:
-        conn.close()
 
-def update_company_script(company_name: str, new_script: str):
+async def update_company_script(company_name: str, new_script: str):
     """
     Ενημερώνει το script μιας εταιρείας (για μελλοντική χρήση)
     """
-    conn = get_database_connection()
     try:
-        cursor = conn.cursor()
-        
+        rows = await db.fetchall("SELECT api_key FROM companies WHERE companyName = %s", (company_name,))
+        api_keys = [row['api_key'] for row in rows]
+
         update_sql = "UPDATE companies SET script = %s WHERE companyName = %s"
-        cursor.execute(update_sql, (new_script, company_name))
-        conn.commit()
+        updated = await db.execute(update_sql, (new_script, company_name))
         
-        if cursor.rowcount > 0:
-            print(f"✅ Script updated for company '{company_name}'")
+        if updated > 0:
+            for api_key in api_keys:
+                await company_cache.invalidate(api_key)
+            logger.info("✅ Script updated for company '%s'", company_name)
             return True
         else:
-            print(f"❌ Company '{company_name}' not found")
+            logger.warning("❌ Company '%s' not found", company_name)
             return False
             
     except Exception as e:
-        print(f"❌ Database error: {str(e)}")
+        logger.error("❌ Database error: %s", e)
         return False
-    finally:
-        conn.close()
 
 
 
-def validate_domain(request: Request, allowedDomains: str) -> bool:
+def validate_domain(request: Request, company_data: dict) -> bool:
     """
     Ελέγχει αν το request προέρχεται από επιτρεπόμενο domain/URL
-    Αγνοεί το πρωτόκολλο (http/https)
+    Αγνοεί το πρωτόκολλο (http/https). Ο matcher φτιάχνεται μία φορά ανά εταιρεία.
     """
-    origin = request.headers.get('origin', '')
-    referer = request.headers.get('referer', '')
-    logger.info(f"🌐 Domain validation - Origin: '{origin}', Referer: '{referer}'")
-
-    
-    if not allowedDomains or allowedDomains.strip() == "":
-        return True  # Αν δεν έχει ορίσει domains, επιτρέπει όλα
-    logger.info(f"📋 Allowed domains: '{allowedDomains}'")
-    
-    # Parse allowed patterns - split με κόμματα, κενά, newlines
-    allowed_patterns = []
-    patterns = re.split(r'[,\s\n\r]+', allowedDomains)
-    
-    for pattern in patterns:
-        pattern = pattern.strip()
-        if pattern:
-            # Add protocol if missing για το parsing
-            if not pattern.startswith(('http://', 'https://')):
-                pattern = 'http://' + pattern
-            
-            parsed = urlparse(pattern)
-            domain = parsed.netloc.lower()
-            path = parsed.path.rstrip('/') or '/'
-            
-            allowed_patterns.append((domain, path))
-
-    logger.info(f"🔍 Parsed allowed patterns: {allowed_patterns}")
-    
-    # Check request headers
-    for header_url in [request.headers.get('origin', ''), request.headers.get('referer', '')]:
-        if header_url:
-            parsed = urlparse(header_url)
-            req_domain = parsed.netloc.lower()
-            req_path = parsed.path.rstrip('/') or '/'
-
-            logger.info(f"🔍 Checking request domain: '{req_domain}', path: '{req_path}'")
-            
-            for allowed_domain, allowed_path in allowed_patterns:
-                if req_domain == allowed_domain:
-                    # Αν το allowed_path είναι root ('/'), δεχόμαστε οποιοδήποτε path
-                    if allowed_path == '/' or req_path.startswith(allowed_path):
-                        logger.info(f"✅ Domain validation passed: {req_domain} matches {allowed_domain}")
-                        return True
-
-    logger.info("❌ Domain validation failed: No matching domains found")
-    return False
-    
-    
+    return domain_matcher(company_data).allows_request(
+        request.headers.get('origin', ''), request.headers.get('referer', '')
+    )
 
 
 
@@ -323,14 +348,135 @@ class CompanyInfo(BaseModel):
     appointmentSettings: Optional[dict] = Field(default_factory=dict)
 
 API_BASE = os.getenv('API_BASE')
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Κοινός async client: τα streams διαβάζονται χωρίς να μπλοκάρουν το event loop
+openai_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Πόσα chunks του knowledge index μπαίνουν στο prompt ανά ερώτηση
+RAG_TOP_K = int(os.getenv('RAG_TOP_K', 6))
+# Cache απαντήσεων για επαναλαμβανόμενες ερωτήσεις επισκεπτών στο widget
+answer_cache = AnswerCache(
+    max_entries_per_tenant=int(os.getenv('ANSWER_CACHE_SIZE', 256)),
+    ttl=float(os.getenv('ANSWER_CACHE_TTL', 3600)),
+    similarity=float(os.getenv('ANSWER_CACHE_SIMILARITY', 0.85))
+)
+# Πολιτική για το πώς ενώνονται τα deltas σε SSE frames (SSE_FLUSH_INTERVAL_MS / SSE_FLUSH_MAX_CHARS)
+flush_policy = FlushPolicy.from_env()
+# Ταυτόχρονες ίδιες ερωτήσεις (χωρίς history) μοιράζονται μία κλήση στο upstream
+inflight_chats = SingleFlight()
+# Κάθε πόσα δευτερόλεπτα ελέγχουμε αν ο client του stream είναι ακόμα συνδεδεμένος
+DISCONNECT_POLL_INTERVAL = float(os.getenv('DISCONNECT_POLL_INTERVAL', 0.5))
+# Συνολικό όριο ταυτόχρονων κλήσεων στο LLM και fair queueing ανά εταιρεία
+llm_scheduler = FairScheduler(
+    max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 32)),
+    max_queue_per_tenant=int(os.getenv('LLM_MAX_QUEUE_PER_TENANT', 20)),
+    reservation_ttl=float(os.getenv('LLM_RESERVATION_TTL', 30))
+)
 website_data_db: Dict[str, str] = {}
 files_data_db: Dict[str, str] = {}      
   
 companies_db: Dict[str, CompanyInfo] = {}
 
 # Redis client για streams και sessions
-redis_client = redis.Redis(host='localhost', port=6379, decode_responses=True)
+# Async client με κοινό bounded pool (REDIS_* ρυθμίσεις στο redis_pool.py)
+redis_client = get_async_redis()
+
+# Cache για τα στοιχεία εταιρείας: κάθε request το χρειάζεται, οπότε δεν πάμε στη MySQL κάθε φορά
+company_cache = TenantConfigCache(
+    redis_client,
+    loader=load_company_from_db,
+    max_entries=int(os.getenv('TENANT_CACHE_SIZE', 512)),
+    l1_ttl=float(os.getenv('TENANT_CACHE_L1_TTL', 60)),
+    l2_ttl=int(os.getenv('TENANT_CACHE_L2_TTL', 600))
+)
+
+# Ιστορικό συνομιλιών ανά session με token budget (ο widget στέλνει μόνο το νέο μήνυμα)
+conversation_memory = ConversationMemory(
+    redis_client,
+    count_tokens=count_tokens,
+    openai_client=openai_client,
+    summary_model=os.getenv('CONVERSATION_SUMMARY_MODEL', 'gpt-4o-mini'),
+    token_budget=int(os.getenv('CONVERSATION_TOKEN_BUDGET', 1500)),
+    max_turns=int(os.getenv('CONVERSATION_MAX_TURNS', 40))
+)
+
+# Events του chat (Redis Stream + counters) σε ένα round-trip
+chat_event_publisher = ChatEventPublisher(redis_client)
+
+# Token buckets ανά εταιρεία και ανά session για τα public endpoints του widget
+rate_limiter = RateLimiter(redis_client)
+
+# Reverse proxies (IP ή CIDR, χωρισμένα με κόμμα) που επιτρέπεται να ορίζουν το X-Forwarded-For
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.getenv('TRUSTED_PROXIES', '').split(',') if proxy.strip()
+]
+
+def is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+def get_client_ip(request: Request) -> str:
+    """
+    Η IP του client. Το X-Forwarded-For διαβάζεται μόνο όταν το request ήρθε από
+    trusted proxy: από δεξιά προς αριστερά, η πρώτη IP που δεν είναι δικός μας proxy
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    if not is_trusted_proxy(client_ip):
+        return client_ip
+    hops = [hop.strip() for hop in request.headers.get('x-forwarded-for', '').split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else client_ip
+
+def get_client_id(request: Request) -> str:
+    """
+    Το bucket του client είναι η IP του: το session_id το ορίζει ο client και
+    ένα καινούριο session σε κάθε request θα παρέκαμπτε το όριο
+    """
+    return f"ip:{get_client_ip(request)}"
+
+async def enforce_rate_limit(scope: str, api_key: str, request: Request, company_data: Optional[dict]) -> None:
+    """
+    429 με Retry-After όταν η εταιρεία ή ο client ξεπεράσει το token bucket του endpoint
+    """
+    client_id = get_client_id(request)
+    try:
+        await rate_limiter.check(scope, api_key, client_id, tenant_limits(company_data, scope))
+    except RateLimited as e:
+        logger.warning("Rate limit hit on %s for %s (%s), retry after %ss", scope, api_key, client_id, e.retry_after)
+        raise HTTPException(status_code=429, detail="Too many requests, please try again shortly",
+                            headers={"Retry-After": str(e.retry_after)})
+
+def rate_limited(scope: str):
+    """
+    FastAPI dependency για τα endpoints εκτός chat pipeline
+    """
+    async def dependency(request: Request):
+        api_key = request.query_params.get('api_key') or request.path_params.get('api_key')
+        if not api_key:
+            return
+        await enforce_rate_limit(scope, api_key, request, await get_company_by_api_key(api_key))
+    return dependency
+
+@app.on_event("startup")
+async def start_tenant_cache_listener():
+    company_cache.start_listener()
+
+@app.on_event("startup")
+async def resolve_browser_driver():
+    # Μία φορά εδώ και όχι στο πρώτο scraping (webdriver_manager μπορεί να κατεβάσει τον driver)
+    await asyncio.to_thread(resolve_chromedriver)
+
+@app.on_event("shutdown")
+async def stop_tenant_cache_listener():
+    await company_cache.stop_listener()
+    await close_async_redis()
+    await db.close_pool()
+    await asyncio.to_thread(close_browser_pool)
+    await close_static_fetcher()
 
 # MongoDB client για analytics
 mongo_client = AsyncIOMotorClient('mongodb://localhost:27017')
@@ -342,13 +488,98 @@ def generate_session_id() -> str:
     """
     return f"sess_{str(uuid.uuid4()).replace('-', '')[:16]}"
 
-def publish_chat_event(session_id: str, role: str, content: str, company_name: str, 
-                      api_key:str,response_time_ms: Optional[float] = None) -> None:
+async def iter_stream_deltas(stream, usage_sink: Optional[dict] = None):
+    """
+    Επιστρέφει μόνο το κείμενο από κάθε chunk του OpenAI stream.
+    Το usage (τελευταίο chunk με include_usage) γράφεται στο usage_sink.
+    """
+    async for chunk in stream:
+        usage = getattr(chunk, 'usage', None)
+        if usage is not None and usage_sink is not None:
+            usage_sink['usage'] = usage
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+async def record_prompt_cache_usage(api_key: str, usage) -> Optional[Tuple[int, int]]:
+    """
+    Μετρητές ανά εταιρεία για το πόσα prompt tokens σερβιρίστηκαν από το
+    prefix cache του provider (usage.prompt_tokens_details.cached_tokens)
+    """
+    if usage is None:
+        return None
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = (getattr(details, 'cached_tokens', 0) or 0) if details is not None else 0
+
+    key = f"prompt_cache:{api_key}"
+    pipe = redis_client.pipeline()
+    pipe.hincrby(key, "requests", 1)
+    pipe.hincrby(key, "prompt_tokens", prompt_tokens)
+    pipe.hincrby(key, "cached_tokens", cached_tokens)
+    if cached_tokens:
+        pipe.hincrby(key, "cache_hits", 1)
+    await pipe.execute()
+    return prompt_tokens, cached_tokens
+
+def reserve_llm_capacity(api_key: str) -> Reservation:
+    """
+    Κρατά θέση για το LLM πριν ξεκινήσει το stream· 429 αν η ουρά της εταιρείας είναι γεμάτη
+    """
+    try:
+        return llm_scheduler.reserve(api_key)
+    except TenantQueueFull as e:
+        logger.warning("LLM queue full for %s, retry after %ss", api_key, e.retry_after)
+        raise HTTPException(status_code=429, detail="Too many requests, please try again shortly",
+                            headers={"Retry-After": str(e.retry_after)})
+
+def log_context_tokens(reqlog: RequestLog, company_data: dict, context_tokens: int,
+                       message_data: "ChatMessage") -> None:
+    """
+    Tokens του context στο request log (το history μετριέται μόνο αν υπάρχει)
+    """
+    history_tokens = 0
+    if message_data.history:
+        history_tokens = count_tokens(' '.join(f"{turn.role}: {turn.content}" for turn in message_data.history))
+    reqlog.set(system_tokens=get_prompt_tokens(company_data) + context_tokens,
+               history_tokens=history_tokens,
+               user_tokens=count_tokens(message_data.message))
+
+def log_prompt_cache_usage(reqlog: RequestLog, usage: Optional[Tuple[int, int]]) -> None:
+    if usage is not None:
+        reqlog.set(prompt_tokens=usage[0], cached_tokens=usage[1])
+
+def build_chat_messages(system_prompt: str, retrieved: str, message_data: "ChatMessage",
+                        conversation_summary: str = "") -> List[dict]:
+    """
+    Από το πιο σταθερό στο πιο μεταβλητό, ώστε το prefix caching του provider
+    να πιάνει system prompt, summary και history: τα retrieved chunks
+    (αλλάζουν σε κάθε ερώτηση) μπαίνουν αμέσως πριν την ερώτηση
+    """
+    messages = [{"role": "system", "content": system_prompt}]
+    if conversation_summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{conversation_summary}"})
+    messages.extend({"role": turn.role, "content": turn.content} for turn in message_data.history)
+    if retrieved:
+        messages.append({"role": "system", "content": retrieved})
+    messages.append({"role": "user", "content": message_data.message})
+    return messages
+
+# Κρατάμε reference στα background tasks ώστε να μη μαζευτούν από τον GC πριν τελειώσουν
+background_tasks = set()
+
+def run_in_background(coro) -> None:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def publish_chat_event(session_id: str, role: str, content: str, company_name: str, 
+                      api_key:str,response_time_ms: Optional[float] = None, aborted: bool = False) -> None:
     """
     η συνάρτηση παίρνει τις πληροφορίες ενός μηνύματος chat,
     τις συλλέγει σε ένα λεξικό και τις στέλνει σε ένα Redis
     Stream με την εντολή xadd,επιτρέποντας
     σε άλλες διεργασίες (καταναλωτές) να τις επεξεργαστούν ασύγχρονα.
+    Οι counters της εταιρείας ενημερώνονται στο ίδιο Lua script.
     """
     event_data = {
         "event_id": str(uuid.uuid4()),
@@ -362,36 +593,34 @@ def publish_chat_event(session_id: str, role: str, content: str, company_name: s
     
     if response_time_ms is not None:
         event_data["response_time_ms"] = response_time_ms
-    
-    # Στέλνει το event στο Redis Stream
-    redis_client.xadd("chat_events", event_data)
-
-    try:
-        redis_client.hincrby(f"stats:{api_key}", "total_messages", 1)
+    if aborted:
+        event_data["aborted"] = 1
 
-        if role == "user":
-            redis_client.hincrby(f"stats:{api_key}", "total_user_messages", 1)
-        elif role == "assistant":
-            redis_client.hincrby(f"stats:{api_key}", "total_assistant_messages", 1)
-        
-#Ενημερώνει μέσο χρόνο απόκρισης
-            if response_time_ms is not None:
-                redis_client.hincrbyfloat(f"response_stats:{api_key}", "total_time", response_time_ms/1000)
-            
-                total_time = float(redis_client.hget(f"response_stats:{api_key}", "total_time") or 0)
-                assistant_count = int(redis_client.hget(f"stats:{api_key}", "total_assistant_messages") or 0)
-            
-                if assistant_count > 0:
-                    new_avg = total_time / assistant_count
-                    redis_client.hset(f"response_stats:{api_key}", "avg", new_avg)
-        #last meessage time
-        redis_client.hset(f"stats:{api_key}", "last_message_at", datetime.now(timezone.utc).isoformat())
+    await chat_event_publisher.publish(event_data, response_time_ms)
 
-        
+async def handle_aborted_stream(session_id: str, api_key: str, company_name: str, question: str,
+                          partial_response: str, response_time_ms: float) -> None:
+    """
+    Ο client αποσυνδέθηκε πριν τελειώσει η απάντηση: καταγράφουμε ό,τι
+    πρόλαβε να σταλεί ως assistant event με aborted. Μετράει μόνο στο
+    aborted_streams, όχι στα assistant messages ή στον μέσο χρόνο απόκρισης
+    """
+    try:
+        await publish_chat_event(
+            session_id=session_id,
+            role="assistant",
+            content=partial_response,
+            company_name=company_name,
+            api_key=api_key,
+            response_time_ms=response_time_ms,
+            aborted=True
+        )
+        turns = [("user", question)] + ([("assistant", partial_response)] if partial_response else [])
+        await conversation_memory.append(api_key, session_id, *turns)
     except Exception as e:
-        logger.error(f"Failed to update counters: {e}")
+        logger.error("Failed to record aborted stream for %s: %s", session_id, e)
 
-def update_session_state(session_id: str, api_key: str, company_name: str) -> None:
+async def update_session_state(session_id: str, api_key: str, company_name: str) -> None:
     """
     Αυτή η συνάρτηση διαχειρίζεται την κατάσταση κάθε ενεργής συνομιλίας στο Redis.
     """
@@ -411,212 +640,201 @@ def update_session_state(session_id: str, api_key: str, company_name: str) -> No
     pipe.sadd(f"active_sessions:{api_key}", session_id)
     pipe.expire(f"active_sessions:{api_key}", 1800)  # 30 λεπτά TTL
     
-    pipe.execute()
+    await pipe.execute()
 
 #migration κάθε μέρα
 
 
 
 
-#web app chat
-@app.post("/chat")
-async def chat_with_company(message_data: ChatMessage, api_key: str = Query(...)):
-    # === TIMING START ===
-    start_time = time.time()
-    logger.info(f"🚀 Chat request started with API key")
+# ---------- Chat pipeline stages (βλ. chat_pipeline.py) ----------
 
-    company_data = get_company_by_api_key(api_key)
+async def load_tenant(ctx: ChatContext) -> None:
+    company_data = await get_company_by_api_key(ctx.api_key)
     if not company_data:
         raise HTTPException(status_code=403, detail="Invalid API key")
-    
-    companyName = company_data['companyName']  # Παίρνουμε το όνομα από τη βάση
-    logger.info(f"✅ Chat request for company: {companyName}")
+    ctx.company_data = company_data
+    ctx.company_name = company_data['companyName']  # Παίρνουμε το όνομα από τη βάση
 
-    system_prompt = company_data['prompt_snapshot']
-     
-    
-    prep_time = time.time()
-    system_tokens = count_tokens(system_prompt)
-    history_text = ' '.join([f"{turn.role}: {turn.content}" for turn in message_data.history])
-    history_tokens = count_tokens(history_text) if message_data.history else 0
-    user_tokens = count_tokens(message_data.message)
-    total_tokens = system_tokens + history_tokens + user_tokens
-
-    logger.info(f"📊 System prompt: {system_tokens} tokens")
-    logger.info(f"📊 History: {history_tokens} tokens") 
-    logger.info(f"📊 User message_data.message: {user_tokens} tokens")
-    logger.info(f"📊 Total context: {total_tokens} tokens")
-    logger.info(f"⏱️ Preparation time: {prep_time - start_time:.3f}s")
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        *[{"role": turn.role, "content": turn.content} for turn in message_data.history],
-        {"role": "user", "content": message_data.message}
-    ]
+def limit_rate(scope: str):
+    async def stage(ctx: ChatContext) -> None:
+        await enforce_rate_limit(scope, ctx.api_key, ctx.request, ctx.company_data)
+    return stage
 
-    async def stream_response():
-        try:
-            api_start_time = time.time()
-            logger.info("🔄 Starting OpenAI API call...")
-            
-            stream = openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                stream=True,
-                temperature=0.5,
-                max_tokens=1000
-            )
-
-            full_response = ""
-            first_chunk_time = None
-
-            for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
-
-                    if first_chunk_time is None:
-                        first_chunk_time = time.time()
-                        logger.info(f"⚡ First chunk received: {first_chunk_time - api_start_time:.3f}s")
-                    
-                    content = chunk.choices[0].delta.content
-                    full_response += content
-                    yield f"data: {json.dumps({'response': content, 'timestamp': datetime.now().isoformat()})}\n\n"
-                    await asyncio.sleep(0.05)
-
-            yield "data: [DONE]\n\n"
-
-            total_time = time.time() - start_time
-            streaming_time = time.time() - api_start_time if 'api_start_time' in locals() else 0
-            logger.info(f"🏁 Total request time: {total_time:.3f}s")
-            logger.info(f"🏁 OpenAI streaming time: {streaming_time:.3f}s")
-            logger.info(f"🏁 Response length: {len(full_response)} characters")
-
-           
-        except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
-            raise HTTPException(status_code=500, detail=str(e))
+async def check_domain(ctx: ChatContext) -> None:
+    if not validate_domain(ctx.request, ctx.company_data):
+        raise HTTPException(status_code=403, detail="Domain not allowed")
 
-    return StreamingResponse(stream_response(), media_type="text/event-stream")
+async def open_session(ctx: ChatContext) -> None:
+    if ctx.message_data.session_id is None:
+        ctx.session_id = generate_session_id()
+        await redis_client.hincrby(f"stats:{ctx.api_key}", "total_sessions", 1) #προσθέτει +1 στο total session
+    else:
+        ctx.session_id = ctx.message_data.session_id
+    ctx.reqlog.set(session_id=ctx.session_id, new_session=ctx.message_data.session_id is None)
 
-@app.post("/widget-chat")
-async def chat_with_company(message_data: ChatMessage,request: Request , api_key: str = Query(...)):
-    # === TIMING START ===
-    start_time = time.time()
-    logger.info(f"🚀 Chat request started with API key")
+async def load_memory(ctx: ChatContext) -> None:
+    """
+    Το ιστορικό του session έρχεται από το Redis. Αν δεν υπάρχει (sessions από
+    παλιότερες εκδόσεις του widget), χρησιμοποιούμε ό,τι στείλει ο client.
+    """
+    if ctx.message_data.session_id is None:
+        return
+    ctx.conversation_summary, server_turns, _ = await conversation_memory.load(ctx.api_key, ctx.session_id)
+    if server_turns or ctx.conversation_summary:
+        ctx.message_data.history = [Turn(**turn) for turn in server_turns]
+
+async def publish_user_message(ctx: ChatContext) -> None:
+    await publish_chat_event(
+        session_id=ctx.session_id,
+        role="user",
+        content=ctx.message_data.message,
+        api_key=ctx.api_key,
+        company_name=ctx.company_name
+    )
 
-    company_data = get_company_by_api_key(api_key)
-    if not company_data:
-        raise HTTPException(status_code=403, detail="Invalid API key")
-    # Domain validation
-    if not validate_domain(request, company_data.get('allowedDomains', '')):
-        raise HTTPException(status_code=403, detail="Domain not allowed")
-    
-    companyName = company_data['companyName']  # Παίρνουμε το όνομα από τη βάση
-    logger.info(f"✅ Chat request for company: {companyName}")
+async def lookup_answer_cache(ctx: ChatContext) -> None:
+    """
+    Answer cache: μόνο για ερωτήσεις χωρίς history, όπου η απάντηση δεν εξαρτάται από τη συζήτηση
+    """
+    ctx.cacheable = not ctx.message_data.history and not ctx.conversation_summary
+    ctx.prompt_version = get_prompt_version(ctx.company_data)
+    if ctx.cacheable:
+        ctx.cached_answer = answer_cache.get(ctx.api_key, ctx.prompt_version, ctx.message_data.message)
+        if ctx.cached_answer is not None:
+            ctx.reqlog.set(source="answer_cache")
+
+async def assemble_context(ctx: ChatContext) -> None:
+    if ctx.cached_answer is not None:
+        return
+    system_prompt, retrieved, context_tokens = await build_system_prompt(ctx.company_data, ctx.api_key, ctx.message_data)
+    log_context_tokens(ctx.reqlog, ctx.company_data, context_tokens, ctx.message_data)
+    ctx.messages = build_chat_messages(system_prompt, retrieved, ctx.message_data, ctx.conversation_summary)
+    if ctx.cacheable:
+        ctx.flight_key = (ctx.api_key, ctx.prompt_version, normalize_question(ctx.message_data.message))
+
+async def reserve_capacity(ctx: ChatContext) -> None:
+    # Οι followers ενός in-flight stream δεν χρειάζονται δική τους θέση στην ουρά
+    if ctx.cached_answer is None and not (ctx.flight_key is not None and ctx.flight_key in inflight_chats):
+        ctx.llm_reservation = reserve_llm_capacity(ctx.api_key)
+
+async def llm_frames(ctx: ChatContext):
+    async with llm_scheduler.slot(ctx.api_key, ctx.company_data.get('llm_weight'), ctx.llm_reservation) as waited_ms:
+        ctx.reqlog.set(queue_wait_ms=round(waited_ms, 1))
+        ctx.reqlog.mark("slot")
+        stream = await openai_client.chat.completions.create(
+            model="gpt-4o",
+            messages=ctx.messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            temperature=0.5,
+            max_tokens=1000
+        )
+        usage_sink = {}
+        frames = coalesce_deltas(iter_stream_deltas(stream, usage_sink), flush_policy)
+        try:
+            async for frame in frames:
+                yield frame
+        finally:
+            # Πρώτα σταματά η ανάγνωση των deltas, μετά κλείνει η σύνδεση με το
+            # OpenAI ώστε να σταματήσει η παραγωγή tokens
+            with anyio.CancelScope(shield=True):
+                await frames.aclose()
+                await stream.close()
+    log_prompt_cache_usage(ctx.reqlog, await record_prompt_cache_usage(ctx.api_key, usage_sink.get('usage')))
+
+def chat_frames(ctx: ChatContext):
+    if ctx.cached_answer is not None:
+        # Ίδιο SSE framing με το live stream
+        return replay_text(ctx.cached_answer, flush_policy)
+    if ctx.flight_key is not None:
+        # Ίδια ερώτηση που τρέχει ήδη για την ίδια εταιρεία: attach στο stream της
+        frames, leader = inflight_chats.subscribe(ctx.flight_key, lambda: llm_frames(ctx))
+        ctx.reqlog.set(source="upstream" if leader else "inflight")
+        return frames
+    ctx.reqlog.set(source="upstream")
+    return llm_frames(ctx)
+
+async def publish_assistant_message(ctx: ChatContext) -> None:
+    await publish_chat_event(
+        session_id=ctx.session_id,
+        role="assistant",
+        content=ctx.full_response,
+        company_name=ctx.company_name,
+        api_key=ctx.api_key,
+        response_time_ms=(time.time() - ctx.stream_started_at) * 1000
+    )
 
-    # Session handling για widget
-    if message_data.session_id is None:
-        session_id = generate_session_id()
-        logger.info(f"New widget session created: {session_id}")
-        redis_client.hincrby(f"stats:{api_key}", "total_sessions", 1) #προσθέτει +1 στο total session
+async def save_session_state(ctx: ChatContext) -> None:
+    await update_session_state(ctx.session_id, ctx.api_key, ctx.company_name)
+
+async def remember_turns(ctx: ChatContext) -> None:
+    # Server-side ιστορικό· οι παλιοί γύροι διπλώνονται σε summary στο background
+    await conversation_memory.append(ctx.api_key, ctx.session_id, ("user", ctx.message_data.message), ("assistant", ctx.full_response))
+    run_in_background(conversation_memory.compact(ctx.api_key, ctx.session_id))
+
+async def store_answer(ctx: ChatContext) -> None:
+    if ctx.cacheable and ctx.cached_answer is None:
+        answer_cache.put(ctx.api_key, ctx.prompt_version, ctx.message_data.message, ctx.full_response)
+
+async def record_aborted_stream(ctx: ChatContext) -> None:
+    await handle_aborted_stream(ctx.session_id, ctx.api_key, ctx.company_name, ctx.message_data.message,
+                                ctx.full_response, (time.time() - ctx.started_at) * 1000)
+
+# Κοινός encoder για τα SSE frames όλων των chat endpoints
+sse_encoder = SSEEncoder.from_env()
+
+# Web app chat: το history το στέλνει ο client
+web_chat_pipeline = ChatPipeline(
+    "/chat",
+    stages=[
+        ("tenant", load_tenant),
+        ("prompt", assemble_context),
+        ("capacity", reserve_capacity),
+    ],
+    source=chat_frames,
+    encoder=sse_encoder,
+    disconnect_poll_interval=DISCONNECT_POLL_INTERVAL,
+)
 
-    else:
-        session_id = message_data.session_id
-        logger.info(f"Continuing widget session: {session_id}")
-
-# Publish user message event
-    publish_chat_event(
-        session_id=session_id,
-        role="user", 
-        content=message_data.message,
-        api_key=api_key,
-        company_name=companyName
-    )
+# Widget: domain check, όρια, server-side session / memory, answer cache και events
+widget_chat_pipeline = ChatPipeline(
+    "/widget-chat",
+    stages=[
+        ("tenant", load_tenant),
+        ("rate_limit", limit_rate("widget-chat")),
+        ("domain", check_domain),
+        ("session", open_session),
+        ("memory", load_memory),
+        ("user_event", publish_user_message),
+        ("answer_cache", lookup_answer_cache),
+        ("prompt", assemble_context),
+        ("capacity", reserve_capacity),
+    ],
+    source=chat_frames,
+    on_complete=[
+        ("assistant_event", publish_assistant_message),
+        ("session_state", save_session_state),
+        ("memory_append", remember_turns),
+        ("answer_cache_put", store_answer),
+    ],
+    on_abort=record_aborted_stream,
+    encoder=sse_encoder,
+    first_frame_fields=lambda ctx: {'session_id': ctx.session_id},  # Include session_id in first chunk only
+    disconnect_poll_interval=DISCONNECT_POLL_INTERVAL,
+)
 
-    system_prompt = company_data['prompt_snapshot']
-     
-    
-    prep_time = time.time()
-    system_tokens = count_tokens(system_prompt)
-    history_text = ' '.join([f"{turn.role}: {turn.content}" for turn in message_data.history])
-    history_tokens = count_tokens(history_text) if message_data.history else 0
-    user_tokens = count_tokens(message_data.message)
-    total_tokens = system_tokens + history_tokens + user_tokens
-
-    logger.info(f"📊 System prompt: {system_tokens} tokens")
-    logger.info(f"📊 History: {history_tokens} tokens") 
-    logger.info(f"📊 User message_data.message: {user_tokens} tokens")
-    logger.info(f"📊 Total context: {total_tokens} tokens")
-    logger.info(f"⏱️ Preparation time: {prep_time - start_time:.3f}s")
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        *[{"role": turn.role, "content": turn.content} for turn in message_data.history],
-        {"role": "user", "content": message_data.message}
-    ]
 
-    async def stream_response():
-        try:
-            api_start_time = time.time()
-            logger.info("🔄 Starting OpenAI API call...")
-            
-            stream = openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                stream=True,
-                temperature=0.5,
-                max_tokens=1000
-            )
-
-            full_response = ""
-            first_chunk_time = None
-
-            first_chunk_sent = False
-            for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
-                    if first_chunk_time is None:
-                        first_chunk_time = time.time()
-                        logger.info(f"⚡ First chunk received: {first_chunk_time - api_start_time:.3f}s")
-        
-                    content = chunk.choices[0].delta.content
-                    full_response += content
-        
-        # Include session_id in first chunk only
-                    if not first_chunk_sent:
-                        yield f"data: {json.dumps({'response': content, 'timestamp': datetime.now().isoformat(), 'session_id': session_id})}\n\n"
-                        first_chunk_sent = True
-                    else:
-                        yield f"data: {json.dumps({'response': content, 'timestamp': datetime.now().isoformat()})}\n\n"
-                    await asyncio.sleep(0.05)
-
-            yield "data: [DONE]\n\n"
-
-            # Calculate response time and publish bot event
-            total_response_time_ms = (time.time() - api_start_time) * 1000
-
-            publish_chat_event(
-                session_id=session_id,
-                role="assistant", 
-                content=full_response,
-                company_name=companyName,
-                api_key=api_key,
-                response_time_ms=total_response_time_ms
-            )
-
-            # Update session state
-            update_session_state(session_id, api_key, companyName)
-
-            total_time = time.time() - start_time
-            streaming_time = time.time() - api_start_time if 'api_start_time' in locals() else 0
-            logger.info(f"🏁 Total request time: {total_time:.3f}s")
-            logger.info(f"🏁 OpenAI streaming time: {streaming_time:.3f}s")
-            logger.info(f"🏁 Response length: {len(full_response)} characters")
-
-           
-        except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
-            raise HTTPException(status_code=500, detail=str(e))
+#web app chat
+@app.post("/chat")
+async def chat_with_company(message_data: ChatMessage, request: Request, api_key: str = Query(...)):
+    ctx = await web_chat_pipeline.prepare(web_chat_pipeline.context(api_key, message_data, request))
+    return StreamingResponse(web_chat_pipeline.stream(ctx), media_type="text/event-stream")
 
-    return StreamingResponse(stream_response(), media_type="text/event-stream")
+@app.post("/widget-chat")
+async def widget_chat_with_company(message_data: ChatMessage, request: Request, api_key: str = Query(...)):
+    ctx = await widget_chat_pipeline.prepare(widget_chat_pipeline.context(api_key, message_data, request))
+    return StreamingResponse(widget_chat_pipeline.stream(ctx), media_type="text/event-stream")
 
 @app.post("/create_chatbot")
 async def create_chatbot_unified(
@@ -633,19 +851,11 @@ async def create_chatbot_unified(
         company_info_obj = CompanyInfo(**company_data)
 
         companies_db[company_info_obj.companyName] = company_info_obj
-        print(f"✅ Company '{company_info_obj.companyName}' registered")
+        logger.info("✅ Company '%s' registered", company_info_obj.companyName)
 
         # Process FAQ data
         faq_items = company_data.get('faqItems', [])
-        print(f"📝 Received {len(faq_items)} FAQ items")
-
-# Convert FAQ to text format for system prompt
-        faq_text = ""
-        if faq_items:
-            faq_text = "\n=== FAQ SECTION ===\n"
-            for item in faq_items:
-                faq_text += f"Q: {item.get('question', '')}\nA: {item.get('answer', '')}\n\n"
-            print(f"📝 FAQ text prepared: {len(faq_text)} characters")
+        logger.debug("📝 Received %d FAQ items", len(faq_items))
 
         logo_data = ""
         if logo:
@@ -661,7 +871,7 @@ async def create_chatbot_unified(
             bot_avatar_data = f"data:{botAvatar.content_type};base64,{avatar_base64}"
 
 
-        print(f"🔄 Starting scraping for: {company_info_obj.websiteURL}")
+        logger.info("🔄 Starting scraping for: %s", company_info_obj.websiteURL)
         scraper = ScrapingController()
         scraped_data = await scraper.scrape_website_async(str(company_info_obj.websiteURL))
         
@@ -672,7 +882,7 @@ async def create_chatbot_unified(
         #    json.dump(scraped_data, f, indent=2, ensure_ascii=False)
         #print(f"✅ Scraped data saved to: {json_filename}")
         
-        print(f"📝 Extracting plain text content...")
+        logger.debug("📝 Extracting plain text content...")
         website_data = ""
         if scraped_data.get("main_page", {}).get("status") == "success":
             website_data += scraped_data["main_page"].get("plain_text", "")
@@ -684,34 +894,45 @@ async def create_chatbot_unified(
 
         website_data_db[company_info_obj.companyName] = website_data
         files_data_db[company_info_obj.companyName] = files_content
-        print(f"✅ Website και files επεξεργασία ολοκληρώθηκε")
+        logger.debug("✅ Website και files επεξεργασία ολοκληρώθηκε")
 
 
         # Δημιουργία API Key
-        print(f"🔑 Δημιουργία API key...")
+        logger.debug("🔑 Δημιουργία API key...")
         api_key = generate_api_key()
-        print(f"✅ API key created: {api_key}")
+        logger.info("✅ API key created: %s", api_key)
         
+        # Knowledge index: στο chat μπαίνουν μόνο τα σχετικά chunks αντί για όλο το site
+        logger.debug("📚 Δημιουργία knowledge index...")
+        knowledge_index = await asyncio.to_thread(
+            build_knowledge_index, api_key, scraped_data, files_content, faq_items
+        )
+        await asyncio.to_thread(
+            build_vector_index, api_key, [chunk['text'] for chunk in knowledge_index.chunks]
+        )
+        logger.info("✅ Knowledge index created (%d chunks)", len(knowledge_index.chunks))
+
         # Δημιουργία System Prompt
-        print(f"📝 Δημιουργία system prompt...")
+        logger.debug("📝 Δημιουργία system prompt...")
         system_prompt = create_system_prompt(
-            website_data=website_data,  
-            files_data=files_content,
+            website_data="",
+            files_data="",
             description=company_info_obj.description,
             personaSelect=company_info_obj.personaSelect,
             botRestrictions=company_info_obj.botRestrictions,
-            faq_text=faq_text,
+            faq_text="",
             botTypePreset=company_data.get('botTypePreset', ''),
             coreFeatures=company_info_obj.coreFeatures or {},
             leadCaptureFields=company_info_obj.leadCaptureFields or {}
         )
-        print(f"✅ System prompt created ({len(system_prompt)} characters)")
+        prompt_tokens = count_tokens(system_prompt)
+        logger.info("✅ System prompt created (%d characters, %d tokens)", len(system_prompt), prompt_tokens)
         
         # Δημιουργία Widget Script
-        print(f"🎨 Δημιουργία widget script...")
+        logger.debug("🎨 Δημιουργία widget script...")
         domain = os.getenv('WIDGET_DOMAIN') 
         widget_script = f'<script src="{domain}/widget.js?key={api_key}"></script>'
-        print(f"✅ Widget script created")
+        logger.debug("✅ Widget script created")
         
         # Προετοιμασία δεδομένων για βάση
         company_data_for_db = {
@@ -726,6 +947,7 @@ async def create_chatbot_unified(
             'files_data': files_content,
             'website_data': website_data,
             'prompt_snapshot': system_prompt,
+            'prompt_tokens': prompt_tokens,
             'api_key': api_key,
             'script': widget_script,
             'allowedDomains': company_info_obj.allowedDomains,
@@ -747,13 +969,13 @@ async def create_chatbot_unified(
         
         
         # Αποθήκευση στη βάση δεδομένων
-        print(f"💾 Αποθήκευση στη βάση δεδομένων...")
-        success = insert_company(company_data_for_db)
+        logger.debug("💾 Αποθήκευση στη βάση δεδομένων...")
+        success = await insert_company(company_data_for_db)
         
         if not success:
             raise HTTPException(status_code=500, detail=f"Failed to save company data to database")
         
-        print(f"✅ Όλα αποθηκεύτηκαν επιτυχώς στη βάση")
+        logger.info("✅ Όλα αποθηκεύτηκαν επιτυχώς στη βάση")
         
         # Ενημερωμένο response
         return {
@@ -765,7 +987,7 @@ async def create_chatbot_unified(
         }
         
     except Exception as e:
-        print(f"❌ Error creating chatbot: {e}")
+        logger.exception("❌ Error creating chatbot: %s", e)
         raise HTTPException(status_code=500, detail=f"Error creating chatbot: {str(e)}")
 
 
@@ -778,7 +1000,7 @@ async def create_chatbot_unified(
 @app.get("/widget.js")
 async def serve_widget(request: Request, key: str = Query(...)):
     try:
-        company_data = get_company_by_api_key(key)
+        company_data = await get_company_by_api_key(key)
         if not company_data:
             raise HTTPException(status_code=403, detail="Invalid API key")
         # Load leadForm.js content
@@ -813,9 +1035,7 @@ async def serve_widget(request: Request, key: str = Query(...)):
         )
         
     except Exception as e:
-        print(f"⚠️ Widget error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("⚠️ Widget error: %s", e)
         raise HTTPException(status_code=500, detail=f"Widget generation failed: {str(e)}")
 
 @app.get("/dashboard", response_class=HTMLResponse)
@@ -830,7 +1050,7 @@ async def dashboard():
 async def get_analytics_overview():
     try:
         # Total messages count
-        total_messages = await analytics_db.chat_events.count_documents({})
+        total_messages = await analytics_db.chat_events.count_documents({"aborted": {"$ne": True}})
         
         # Active chatbots (distinct company_name - api_key combinations)
         active_chatbots_pipeline = [
@@ -842,7 +1062,7 @@ async def get_analytics_overview():
         
         # Average response time (only for assistant messages)
         avg_response_pipeline = [
-            {"$match": {"role": "assistant", "response_time_ms": {"$exists": True, "$ne": None}}},
+            {"$match": {"role": "assistant", "aborted": {"$ne": True}, "response_time_ms": {"$exists": True, "$ne": None}}},
             {"$group": {"_id": None, "avg_response": {"$avg": "$response_time_ms"}}}
         ]
         avg_response_result = await analytics_db.chat_events.aggregate(avg_response_pipeline).to_list(length=1)
@@ -855,7 +1075,7 @@ async def get_analytics_overview():
         }
         
     except Exception as e:
-        logger.error(f"Error fetching overview analytics: {e}")
+        logger.error("Error fetching overview analytics: %s", e)
         raise HTTPException(status_code=500, detail="Failed to fetch analytics data")
 
 
@@ -869,21 +1089,25 @@ async def get_company_analytics(
     
     try:
         # Βρες company info
-        company_data = get_company_by_api_key(api_key)
+        company_data = await get_company_by_api_key(api_key)
         if not company_data:
             raise HTTPException(status_code=404, detail="Invalid API key")
         
         company_name = company_data['companyName']
 
         # 1. Today data από Redis (real-time)
-        today_stats = redis_client.hgetall(f"stats:{api_key}")
-        today_ratings = redis_client.hgetall(f"ratings:{api_key}")
-        today_response = redis_client.hgetall(f"response_stats:{api_key}")
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hgetall(f"stats:{api_key}")
+        pipe.hgetall(f"ratings:{api_key}")
+        pipe.hgetall(f"response_stats:{api_key}")
+        pipe.scard(f"active_sessions:{api_key}")
+        today_stats, today_ratings, today_response, active_sessions = await pipe.execute()
 
         today_messages = int(today_stats.get('total_messages', 0))
         today_user_messages = int(today_stats.get('total_user_messages', 0))
         today_assistant_messages = int(today_stats.get('total_assistant_messages', 0))
         today_sessions = int(today_stats.get('total_sessions', 0))
+        today_aborted_streams = int(today_stats.get('aborted_streams', 0))
 
         today_ratings_sum = int(today_ratings.get('sum', 0))
         today_ratings_count = int(today_ratings.get('count', 0))
@@ -891,16 +1115,11 @@ async def get_company_analytics(
         today_avg_response_time = float(today_response.get('avg', 0))
 
 # Real-time metrics
-        active_sessions = redis_client.scard(f"active_sessions:{api_key}")
-        last_message_at = redis_client.hget(f"stats:{api_key}", "last_message_at")
+        last_message_at = today_stats.get("last_message_at")
 
         # Συλλογή ιστορικών δεδομένων από MySQL
-        conn = get_database_connection()
-        cursor = conn.cursor()
-        
         # Παίρνε συνολικά δεδομένα από total_analytics
-        cursor.execute("SELECT * FROM total_analytics WHERE api_key = %s", (api_key,))
-        historical_data = cursor.fetchone()
+        historical_data = await db.fetchone("SELECT * FROM total_analytics WHERE api_key = %s", (api_key,))
         
         
 
@@ -928,17 +1147,13 @@ async def get_company_analytics(
         
             
 
-        cursor.execute("""
+        yesterday_data = await db.fetchone("""
             SELECT * FROM daily_analytics 
             WHERE api_key = %s 
             ORDER BY date DESC 
             LIMIT 1
         """, (api_key,))
 
-        yesterday_data = cursor.fetchone()
-
-        conn.close()
-
         if yesterday_data:
             yesterday_messages = yesterday_data['total_messages']
             yesterday_user_messages = yesterday_data['user_messages']
@@ -1008,6 +1223,7 @@ async def get_company_analytics(
             "today_user_messages": today_user_messages,
             "today_assistant_messages": today_assistant_messages,
             "today_sessions": today_sessions,
+            "today_aborted_streams": today_aborted_streams,
             "today_avg_rating": today_avg_rating,
             "today_ratings_count": today_ratings_count,
     
@@ -1018,11 +1234,62 @@ async def get_company_analytics(
   }
     
     except Exception as e:
-        logger.error(f"Error fetching analytics for {api_key}: {e}")
+        logger.error("Error fetching analytics for %s: %s", api_key, e)
         raise HTTPException(status_code=500, detail="Failed to fetch analytics data")
         
         
 
+@app.get("/api/tenant-cache/stats")
+async def get_tenant_cache_stats():
+    """
+    Hits / misses του cache για τα στοιχεία εταιρείας σε αυτόν τον worker
+    """
+    return company_cache.stats()
+
+@app.get("/api/answer-cache/stats")
+async def get_answer_cache_stats(api_key: str = Query(...)):
+    """
+    Hit rate του answer cache για ένα chatbot σε αυτόν τον worker
+    """
+    return answer_cache.stats(api_key)
+
+@app.get("/api/llm-scheduler/stats")
+async def get_llm_scheduler_stats():
+    """
+    Ενεργές κλήσεις, ουρές και χρόνοι αναμονής ανά εταιρεία σε αυτόν τον worker
+    """
+    return llm_scheduler.stats()
+
+@app.get("/api/db-pool/stats")
+async def get_db_pool_stats():
+    """
+    Μέγεθος του MySQL pool, χρόνοι απόκτησης σύνδεσης και αναμονές σε αυτόν τον worker
+    """
+    return db.pool_stats()
+
+@app.get("/api/browser-pool/stats")
+async def get_browser_pool_stats():
+    """
+    Browsers του scraping pool σε αυτόν τον worker: σε χρήση, αναμονές, ανακυκλώσεις,
+    και πόσο περιμένουν οι σελίδες να ηρεμήσουν (για να ρυθμιστεί το PAGE_SETTLE_MAX_SECONDS)
+    """
+    return {**get_browser_pool().stats(), "settle": settle_stats.stats()}
+
+@app.get("/api/prompt-cache/stats")
+async def get_prompt_cache_stats(api_key: str = Query(...)):
+    """
+    Πόσα prompt tokens ενός chatbot σερβιρίστηκαν από το prefix cache του provider
+    """
+    stats = {k: int(v) for k, v in (await redis_client.hgetall(f"prompt_cache:{api_key}")).items()}
+    prompt_tokens = stats.get("prompt_tokens", 0)
+    return {
+        "requests": stats.get("requests", 0),
+        "cache_hits": stats.get("cache_hits", 0),
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": stats.get("cached_tokens", 0),
+        "cached_ratio": round(stats.get("cached_tokens", 0) / prompt_tokens, 4) if prompt_tokens else 0.0,
+    }
+
 @app.get("/dashboard/{api_key}", response_class=HTMLResponse)
 async def dashboard_for_company(request: Request, api_key: str):
     return templates.TemplateResponse(
@@ -1032,19 +1299,19 @@ async def dashboard_for_company(request: Request, api_key: str):
 
 
 #Αξιολόγηση
-@app.post("/rating")
+@app.post("/rating", dependencies=[Depends(rate_limited("rating"))])
 async def rating(
     request: Request,
     api_key: str=Query(...),
     data: dict = Body(...)
 ):
     try:
-        company_data = get_company_by_api_key(api_key)
+        company_data = await get_company_by_api_key(api_key)
         if not company_data:
             return {"status": "error", "message": "invalid api key"}
             
         # Domain validation
-        if not validate_domain(request, company_data.get('allowedDomains', '')):
+        if not validate_domain(request, company_data):
             return {"status": "error", "message": "domain not allowed"}
         
         rating_value = int(data.get("rating", 0))
@@ -1054,11 +1321,13 @@ async def rating(
             return {"status": "error", "message": "invalid rating"}
 
         # Αποθήκευση counters στη Redis
-        redis_client.hincrby(f"ratings:{api_key}", "count", 1)
-        redis_client.hincrby(f"ratings:{api_key}", "sum", rating_value)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(f"ratings:{api_key}", "count", 1)
+        pipe.hincrby(f"ratings:{api_key}", "sum", rating_value)
 
         # (προαιρετικά) αν θες να ξέρεις και ποιο session έδωσε rating:
-        redis_client.set(f"rated:{session_id}", "1", ex=1800)  # TTL 30 λεπτά
+        pipe.set(f"rated:{session_id}", "1", ex=1800)  # TTL 30 λεπτά
+        await pipe.execute()
 
         return {"status": "ok", "message": "rating stored"}
 
@@ -1071,18 +1340,18 @@ async def has_rated(api_key: str, session_id: str):
     """
     Επιστρέφει true αν το συγκεκριμένο session έχει ήδη δώσει rating
     """
-    has_rated = bool(redis_client.get(f"rated:{session_id}"))
+    has_rated = bool(await redis_client.get(f"rated:{session_id}"))
     return {"hasRated": has_rated}
 
-@app.post("/submit-lead")
+@app.post("/submit-lead", dependencies=[Depends(rate_limited("submit-lead"))])
 async def submit_lead(request: Request, api_key: str = Query(...)):
     try:
-        company_data = get_company_by_api_key(api_key)
+        company_data = await get_company_by_api_key(api_key)
         if not company_data:
             raise HTTPException(status_code=403, detail="Invalid API key")
         
         # Domain validation
-        if not validate_domain(request, company_data.get('allowedDomains', '')):
+        if not validate_domain(request, company_data):
             raise HTTPException(status_code=403, detail="Domain not allowed")
         
         # Parse JSON body
@@ -1091,12 +1360,12 @@ async def submit_lead(request: Request, api_key: str = Query(...)):
         company_name = body.get('companyName', company_data['companyName'])
         
         # Log lead capture (for now just console, later can save to database)
-        logger.info(f"📝 Lead captured for {company_name}: {lead_data}")
+        logger.info("📝 Lead captured for %s: %s", company_name, lead_data)
         
         return {"status": "success", "message": "Lead data received"}
         
     except Exception as e:
-        logger.error(f"Lead submission error: {e}")
+        logger.error("Lead submission error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to save lead data")
     
 from calendar_helper import GoogleCalendarHelper
@@ -1104,7 +1373,7 @@ from calendar_helper import GoogleCalendarHelper
 @app.get("/calendar-auth/{api_key}")
 async def calendar_auth(api_key: str):
     """Δημιουργεί auth URL για συγκεκριμένη εταιρεία"""
-    company_data = get_company_by_api_key(api_key)
+    company_data = await get_company_by_api_key(api_key)
     if not company_data:
         raise HTTPException(status_code=403, detail="Invalid API key")
     
@@ -1141,12 +1410,12 @@ async def oauth2_callback(code: str | None = None, state: str | None = None):
         return post_message_and_close("{ type: 'gcal_error', reason: 'missing_state_or_code' }")
 
     try:
-        calendar_helper = GoogleCalendarHelper(state)  # state = api_key
-        credentials = calendar_helper.get_credentials_from_code(code)
+        calendar_helper = GoogleCalendarHelper(state, company_cache)  # state = api_key
+        credentials = await calendar_helper.get_credentials_from_code(code)
         if not credentials:
             return post_message_and_close("{ type: 'gcal_error', reason: 'invalid_grant' }")
 
-        saved = calendar_helper.save_credentials_to_db(credentials)
+        saved = await calendar_helper.save_credentials_to_db(credentials)
         if not saved:
             return post_message_and_close("{ type: 'gcal_error', reason: 'save_failed' }")
 
@@ -1157,9 +1426,9 @@ async def oauth2_callback(code: str | None = None, state: str | None = None):
         return post_message_and_close("{ type: 'gcal_error', reason: 'exception' }")
 
 
-@app.get("/available-slots/{api_key}")
+@app.get("/available-slots/{api_key}", dependencies=[Depends(rate_limited("available-slots"))])
 async def get_available_slots(api_key: str, date: str = Query(...)):
-    company_data = get_company_by_api_key(api_key)
+    company_data = await get_company_by_api_key(api_key)
     if not company_data:
         raise HTTPException(status_code=403, detail="Invalid API key")
     
@@ -1170,11 +1439,11 @@ async def get_available_slots(api_key: str, date: str = Query(...)):
     except:
         pass
     
-    calendar_helper = GoogleCalendarHelper(api_key)
-    if not calendar_helper.load_credentials():
+    calendar_helper = GoogleCalendarHelper(api_key, company_cache)
+    if not await calendar_helper.load_credentials():
         raise HTTPException(status_code=409, detail="Calendar is not connected for this company")
     
-    slots = calendar_helper.get_available_slots(date, appointment_settings)
+    slots = await calendar_helper.get_available_slots(date, appointment_settings)
     
     return {"available_slots": slots, "date": date}
 
@@ -1193,13 +1462,13 @@ async def create_appointment(api_key: str, payload: Dict[str, Any] = Body(...)):
     }
     """
     # 1) Εύρεση εταιρείας & έλεγχος εγκυρότητας api_key
-    company_data = get_company_by_api_key(api_key)
+    company_data = await get_company_by_api_key(api_key)
     if not company_data:
         raise HTTPException(status_code=403, detail="Invalid API key")
 
     # 2) Φόρτωση Google credentials της εταιρείας
-    helper = GoogleCalendarHelper(api_key=api_key)
-    creds = helper.load_credentials()
+    helper = GoogleCalendarHelper(api_key=api_key, company_cache=company_cache)
+    creds = await helper.load_credentials()
     if not creds:
         # Δεν έχει ολοκληρωθεί το OAuth για αυτή την εταιρεία
         raise HTTPException(status_code=409, detail="Calendar is not connected for this company")
@@ -1241,7 +1510,7 @@ async def create_appointment(api_key: str, payload: Dict[str, Any] = Body(...)):
 
 # 5) Δημιουργία event με dynamic διάρκεια
     try:
-        event_id = helper.create_event(
+        event_id = await helper.create_event(
             title=title,
             description=description,
             start_datetime=start_datetime,   # π.χ. "2025-09-25T11:00:00"
@@ -0,0 +1,98 @@
+"""
+Single Flight Module
+Όταν πολλοί επισκέπτες στέλνουν την ίδια ερώτηση ταυτόχρονα (π.χ. το ίδιο
+suggested prompt μετά από ένα campaign), γίνεται μία κλήση στο upstream και
+όλα τα SSE streams διαβάζουν τα ίδια frames από αυτήν.
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """
+    Ένα upstream stream σε εξέλιξη: τα frames που έχουν βγει ως τώρα,
+    ώστε όποιος μπαίνει αργότερα να τα πάρει από την αρχή
+    """
+
+    def __init__(self):
+        self.frames: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        # Ξυπνάμε όσους περιμένουν και ετοιμάζουμε νέο event για το επόμενο frame
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait(self) -> None:
+        await self._changed.wait()
+
+
+class SingleFlight:
+    """
+    Κρατά ανά key το upstream stream που τρέχει. Ο πρώτος (leader) το ξεκινά
+    σε δικό του task, οι υπόλοιποι (followers) κάνουν attach στο ίδιο.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def subscribe(self, key: Hashable,
+                  produce: Callable[[], AsyncIterator[str]]) -> Tuple[AsyncIterator[str], bool]:
+        """
+        Επιστρέφει (frames, is_leader). Το produce καλείται μόνο από τον leader.
+        """
+        flight = self._flights.get(key)
+        leader = flight is None or flight.abandoned
+        if leader:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._pump(key, flight, produce()))
+        return self._follow(flight), leader
+
+    def __contains__(self, key: Hashable) -> bool:
+        flight = self._flights.get(key)
+        return flight is not None and not flight.abandoned
+
+    async def _pump(self, key: Hashable, flight: _Flight, source: AsyncIterator[str]) -> None:
+        try:
+            async for frame in source:
+                flight.frames.append(frame)
+                flight.notify()
+        except asyncio.CancelledError:
+            flight.error = RuntimeError("upstream stream cancelled")
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.notify()
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def _follow(self, flight: _Flight) -> AsyncIterator[str]:
+        flight.subscribers += 1
+        position = 0
+        try:
+            while True:
+                while position < len(flight.frames):
+                    yield flight.frames[position]
+                    position += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.wait()
+        finally:
+            flight.subscribers -= 1
+            # Δεν ακούει πια κανείς: δεν έχει νόημα να συνεχίσει η κλήση στο upstream
+            if flight.subscribers == 0 and not flight.done and flight.task is not None:
+                flight.abandoned = True
+                flight.task.cancel()
@@ -0,0 +1,228 @@
+"""
+Site Crawler Module
+Crawling του site μιας εταιρείας σε βάθος, αντί για μόνο τα links της αρχικής:
+
+    - frontier με προτεραιότητα: πρώτα ρηχές σελίδες και σελίδες που μοιάζουν
+      χρήσιμες (προϊόντα, υπηρεσίες, FAQ, επικοινωνία). Λίστες tags /
+      σελιδοποίησης ανοίγουν μόνο όταν δεν τρέχει τίποτα άλλο (μια σελίδα σε
+      εξέλιξη μπορεί να βρει καλύτερα links). Καλάθι, feeds, αναζήτηση κλπ
+      δεν ανοίγουν καθόλου.
+    - dedupe με κανονικοποιημένο URL (tracking params, trailing slash, σειρά
+      query params) και με το rel=canonical της σελίδας
+    - όρια σελίδων (max_pages) και βάθους (max_depth)
+    - ανά host: το πολύ CRAWL_PER_HOST_CONCURRENCY σελίδες ταυτόχρονα και
+      CRAWL_POLITENESS_DELAY_MS ανάμεσα στις αρχές τους
+
+Το crawl() δίνει κάθε σελίδα μόλις ολοκληρωθεί (stream), δεν περιμένει όλο
+το site. Το fetch (GET / browser, καθάρισμα, links) το κάνει ο caller:
+    fetch(url) -> (page_data, links_info του LinkExplorer)
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import re
+import time
+from itertools import count
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+PageFetch = Callable[[str], Awaitable[Tuple[Dict[str, Any], Dict[str, Any]]]]
+
+TRACKING_PARAMS = frozenset({
+    'gclid', 'gbraid', 'wbraid', 'fbclid', 'msclkid', 'yclid', 'dclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi', 'ref', 'ref_src', 'srsltid',
+})
+_DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+# Σελίδες που δεν έχουν περιεχόμενο για το chatbot: δεν μπαίνουν στο frontier
+_SKIP = re.compile(
+    r'/(cart|basket|checkout|my-account|wishlist|compare|wp-json|wp-admin|xmlrpc\.php|feed|rss|search|print)(/|$)'
+    r'|[?&](add-to-cart|replytocom|share|print|s|q|orderby|sort|filter_[a-z_]+)='
+    r'|\.(xml|json|rss|atom)$',
+    re.IGNORECASE,
+)
+# Λίστες που συνήθως επαναλαμβάνουν περιεχόμενο: στο τέλος της ουράς
+_LOW_PRIORITY = re.compile(
+    r'/(tag|tags|author|category|categories|archive|page)/|/\d{4}/\d{2}/|[?&](page|p|paged)=',
+    re.IGNORECASE,
+)
+# Σελίδες που συνήθως απαντούν ερωτήσεις πελατών: μπροστά στην ουρά
+_HIGH_PRIORITY = re.compile(
+    r'(faq|question|product|proion|service|ypiresi|pricing|price|timh|timokatalog|menu|shop|catalog|katalog'
+    r'|about|sxetika|company|etaireia|contact|epikoinonia|shipping|apostol|delivery|return|policy|terms|oroi)',
+    re.IGNORECASE,
+)
+
+
+def normalize_url(url: str) -> str:
+    """
+    Το κλειδί dedupe ενός URL: πεζό scheme / host, χωρίς default port, fragment,
+    tracking params και trailing slash, με ταξινομημένα query params
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and str(parts.port) != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r'/{2,}', '/', parts.path or '/')
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith('utm_')
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+def is_low_value(url: str) -> bool:
+    return bool(_LOW_PRIORITY.search(url))
+
+
+def url_priority(url: str, depth: int) -> int:
+    """
+    Μικρότερο = νωρίτερα: βάθος, μήκος path, query, λέξεις του path
+    """
+    parts = urlsplit(url)
+    score = depth * 10 + parts.path.strip('/').count('/') + (2 if parts.query else 0)
+    if is_low_value(url):
+        score += 100
+    elif _HIGH_PRIORITY.search(parts.path):
+        score -= 5
+    return score
+
+
+class Frontier:
+    """
+    Ουρά προτεραιότητας των URLs που μένουν (ίδια προτεραιότητα = σειρά ανακάλυψης)
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[int, int, str, int]] = []
+        self._order = count()
+
+    def push(self, url: str, depth: int) -> None:
+        heapq.heappush(self._heap, (url_priority(url, depth), next(self._order), url, depth))
+
+    def next_is_low_value(self) -> bool:
+        return is_low_value(self._heap[0][2])
+
+    def pop(self) -> Tuple[str, int]:
+        _, _, url, depth = heapq.heappop(self._heap)
+        return url, depth
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class SiteCrawler:
+    def __init__(self, fetch: PageFetch, max_pages: int = 51, max_depth: int = 3,
+                 concurrency: int = 4, per_host_concurrency: int = 2, politeness_delay_ms: float = 250):
+        self.fetch = fetch
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.concurrency = max(concurrency, 1)
+        self.per_host_concurrency = max(per_host_concurrency, 1)
+        self.politeness_delay = max(politeness_delay_ms, 0) / 1000
+
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_next_start: Dict[str, float] = {}
+        self.counters = {"fetched": 0, "duplicates": 0, "skipped": 0, "discovered": 0,
+                         "max_depth_reached": 0, "frontier_left": 0}
+
+    @classmethod
+    def from_env(cls, fetch: PageFetch, max_pages: int, concurrency: int) -> "SiteCrawler":
+        return cls(
+            fetch,
+            max_pages=max_pages,
+            max_depth=int(os.getenv('CRAWL_MAX_DEPTH', 3)),
+            concurrency=concurrency,
+            per_host_concurrency=int(os.getenv('CRAWL_PER_HOST_CONCURRENCY', 2)),
+            politeness_delay_ms=float(os.getenv('CRAWL_POLITENESS_DELAY_MS', 250)),
+        )
+
+    async def crawl(self, start_url: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Δίνει το page_data κάθε σελίδας (με το "depth" της) μόλις ολοκληρωθεί
+        """
+        frontier = Frontier()
+        frontier.push(start_url, 0)
+        seen: Set[str] = {normalize_url(start_url)}  # ό,τι μπήκε ποτέ στο frontier
+        crawled: Set[str] = set()  # σελίδες που δόθηκαν (url + canonical)
+        in_flight: Set[asyncio.Task] = set()
+        scheduled = 0
+
+        try:
+            while True:
+                while frontier and len(in_flight) < self.concurrency and scheduled < self.max_pages:
+                    if in_flight and frontier.next_is_low_value():
+                        break
+                    url, depth = frontier.pop()
+                    in_flight.add(asyncio.create_task(self._visit(url, depth)))
+                    scheduled += 1
+                if not in_flight:
+                    break
+
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url, depth, page_data, links_info = task.result()
+                    self.counters["fetched"] += 1
+
+                    keys = {normalize_url(url)}
+                    canonical = links_info.get("canonical")
+                    if canonical and urlsplit(canonical).hostname == urlsplit(url).hostname:
+                        keys.add(normalize_url(canonical))
+                        seen.add(normalize_url(canonical))
+                    if keys & crawled:
+                        self.counters["duplicates"] += 1
+                        continue
+                    crawled |= keys
+
+                    page_data["depth"] = depth
+                    self.counters["max_depth_reached"] = max(self.counters["max_depth_reached"], depth)
+                    yield page_data
+
+                    if depth < self.max_depth and page_data.get("status") == "success":
+                        self._enqueue(frontier, seen, links_info.get("links", []), depth + 1)
+        finally:
+            for task in in_flight:
+                task.cancel()
+            self.counters["frontier_left"] = len(frontier)
+
+    def _enqueue(self, frontier: Frontier, seen: Set[str], links: List[str], depth: int) -> None:
+        for link in links:
+            key = normalize_url(link)
+            if key in seen:
+                continue
+            seen.add(key)
+            if _SKIP.search(link):
+                self.counters["skipped"] += 1
+                continue
+            self.counters["discovered"] += 1
+            frontier.push(link, depth)
+
+    async def _visit(self, url: str, depth: int) -> Tuple[str, int, Dict[str, Any], Dict[str, Any]]:
+        host = urlsplit(url).hostname or ''
+        slot = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+        async with slot:
+            # Politeness: οι αρχές των requests στον ίδιο host απέχουν politeness_delay
+            now = time.monotonic()
+            start_at = max(now, self._host_next_start.get(host, now))
+            self._host_next_start[host] = start_at + self.politeness_delay
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+            try:
+                page_data, links_info = await self.fetch(url)
+            except Exception as e:
+                logger.warning("Crawl fetch failed for %s: %s", url, e)
+                page_data = {"url": url, "title": "", "clean_content": "", "status": "failed", "error": str(e)}
+                links_info = {"success": False, "links": []}
+        return url, depth, page_data, links_info
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters)
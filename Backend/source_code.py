@@ -1,47 +1,53 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from webdriver_manager.chrome import ChromeDriverManager # For Chrome
+from browser_pool import launch_chrome # Chrome με τον chromedriver που βρέθηκε στο startup
 # from selenium.webdriver.firefox.service import Service as FirefoxService
 # from selenium.webdriver.firefox.options import Options as FirefoxOptions
 # from webdriver_manager.firefox import GeckoDriverManager # For Firefox
-import time # Optional, for adding explicit waits if needed
+from page_readiness import wait_until_ready # Adaptive wait instead of a fixed sleep
 
-def get_website_source_code_selenium(url, wait_for_dynamic_content_seconds=0, headless=True):
+def get_website_source_code_selenium(url, wait_for_dynamic_content_seconds=0, headless=True, browser_pool=None):
     """
     Fetches the HTML source code of a given URL using Selenium,
     allowing JavaScript to execute.
 
     Args:
         url (str): The URL of the website.
-        wait_for_dynamic_content_seconds (int): Optional number of seconds to explicitly
-                                               wait after the page loads, to allow
-                                               more JavaScript to execute.
-                                               Use with caution; explicit waits are
-                                               generally less reliable than WebDriverWait.
+        wait_for_dynamic_content_seconds (int): Optional maximum number of seconds to wait
+                                               after the page loads for JavaScript to
+                                               finish rendering. The wait ends as soon as
+                                               the DOM and the network have been quiet for
+                                               a short window (see page_readiness).
         headless (bool): If True, runs the browser in headless mode (no visible UI).
+                         Ignored when browser_pool is given.
+        browser_pool (BrowserPool): Optional pool to borrow a warm browser from
+                                    (a fresh tab per page) instead of launching Chrome.
 
     Returns:
         str: The HTML source code as a string, or None if an error occurs.
     """
-    # --- Chrome Setup ---
-    chrome_options = ChromeOptions()
-    if headless:
-        chrome_options.add_argument("--headless") # Run in headless mode
-    chrome_options.add_argument("--disable-gpu") # Recommended for headless
-    chrome_options.add_argument("--no-sandbox") # Bypass OS security model, can be necessary in some environments
-    chrome_options.add_argument("--disable-dev-shm-usage") # Overcome limited resource problems
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+    return fetch_rendered_page(url, wait_for_dynamic_content_seconds, headless, browser_pool)[0]
+
+def fetch_rendered_page(url, max_wait_seconds=0, headless=True, browser_pool=None):
+    """
+    Same as get_website_source_code_selenium, but also returns how long the page took to settle.
 
+    Returns:
+        tuple: (html_source or None, SettleResult or None)
+    """
+    if browser_pool is not None:
+        try:
+            with browser_pool.page() as driver:
+                return _load_page_source(driver, url, max_wait_seconds)
+        except Exception as e:
+            print(f"An error occurred with Selenium: {e}")
+            return None, None
 
-    # Use webdriver_manager to automatically download and manage ChromeDriver
+    # --- Chrome Setup ---
     try:
-        service = ChromeService(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
+        driver = launch_chrome(headless)
     except Exception as e:
         print(f"Error setting up Chrome WebDriver: {e}")
         print("Please ensure Google Chrome is installed and webdriver-manager can access the internet.")
-        return None
+        return None, None
 
     # --- Firefox Setup (Alternative) ---
     # firefox_options = FirefoxOptions()
@@ -57,28 +63,29 @@ def get_website_source_code_selenium(url, wait_for_dynamic_content_seconds=0, he
     #     return None
 
     try:
-        print(f"Navigating to {url} with Selenium...")
-        driver.get(url)
-
-        # Optional: Add an explicit wait if you know the page needs more time
-        # for specific JavaScript to load content.
-        # Using WebDriverWait for a specific element is more robust if possible.
-        if wait_for_dynamic_content_seconds > 0:
-            print(f"Waiting for {wait_for_dynamic_content_seconds} seconds for dynamic content...")
-            time.sleep(wait_for_dynamic_content_seconds)
-
-        # Get the page source after JavaScript has potentially modified the DOM
-        html_source = driver.page_source
-        return html_source
+        return _load_page_source(driver, url, max_wait_seconds)
 
     except Exception as e:
         print(f"An error occurred with Selenium: {e}")
-        return None
+        return None, None
     finally:
         if 'driver' in locals() and driver:
             print("Closing browser...")
             driver.quit()
 
+def _load_page_source(driver, url, max_wait_seconds):
+    print(f"Navigating to {url} with Selenium...")
+    driver.get(url)
+
+    # Wait (up to max_wait_seconds) until the DOM and the network go quiet
+    settle = None
+    if max_wait_seconds > 0:
+        settle = wait_until_ready(driver, max_wait_seconds)
+        print(f"Page settled in {settle.ms:.0f} ms ({settle.reason})")
+
+    # Get the page source after JavaScript has potentially modified the DOM
+    return driver.page_source, settle
+
 # --- Example Usage ---
 # if __name__ == "__main__":
 #     target_url = "https://www.conferience.com/eventPage/WM25" # The Conferience event page
@@ -0,0 +1,61 @@
+"""
+SSE Encoder Module
+Κωδικοποίηση των SSE frames του chat χωρίς dict + json.dumps ανά frame:
+το σταθερό κομμάτι του frame (prefix / suffix) είναι έτοιμο σε bytes,
+μόνο το κείμενο περνά από JSON escaping (orjson αν υπάρχει) και το
+timestamp ξαναϋπολογίζεται το πολύ μία φορά ανά SSE_TIMESTAMP_INTERVAL_MS,
+οπότε τα frames που φεύγουν μαζί μοιράζονται το ίδιο.
+
+    data: {"response":"...","timestamp":"2025-01-01T10:00:00.000000"}\n\n
+"""
+
+import os
+import time
+from datetime import datetime
+from typing import Any
+
+try:
+    import orjson
+
+    def _dumps(value: Any) -> bytes:
+        return orjson.dumps(value)
+except ImportError:
+    import json
+
+    def _dumps(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class SSEEncoder:
+    DONE = b"data: [DONE]\n\n"
+
+    def __init__(self, field: str = "response", timestamp_interval_ms: float = 50):
+        self._prefix = b'data: {' + _dumps(field) + b':'
+        self._timestamp_key = b',"timestamp":"'
+        self._suffix = b'"}\n\n'
+        self.timestamp_interval = max(timestamp_interval_ms, 0) / 1000
+        self._stamp = b""
+        self._stamped_at = float("-inf")
+
+    @classmethod
+    def from_env(cls) -> "SSEEncoder":
+        return cls(timestamp_interval_ms=float(os.getenv('SSE_TIMESTAMP_INTERVAL_MS', 50)))
+
+    def timestamp(self) -> bytes:
+        now = time.monotonic()
+        if now - self._stamped_at >= self.timestamp_interval:
+            self._stamp = datetime.now().isoformat().encode()
+            self._stamped_at = now
+        return self._stamp
+
+    def frame(self, content: str, **extra: Any) -> bytes:
+        """
+        Ένα data frame· τα extra πεδία (π.χ. session_id στο πρώτο frame) μπαίνουν μετά το timestamp
+        """
+        head = self._prefix + _dumps(content) + self._timestamp_key + self.timestamp()
+        if not extra:
+            return head + self._suffix
+        return head + b'",' + _dumps(extra)[1:] + b'\n\n'
+
+    def error(self, message: str) -> bytes:
+        return b'data: ' + _dumps({'error': message}) + b'\n\n'
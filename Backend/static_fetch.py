@@ -0,0 +1,165 @@
+"""
+Static Fetch Module
+Οι περισσότερες σελίδες των εταιρειών είναι server-rendered: ένα απλό GET
+φέρνει ήδη όλο το περιεχόμενο, χωρίς browser και χωρίς αναμονή για JS.
+Το StaticFetcher κάνει το GET με ένα κοινό aiohttp session (pooled
+συνδέσεις) και το needs_browser() κρίνει από το HTML αν η σελίδα χρειάζεται
+browser (τρέχει στο thread του scraping, το parsing δεν μπαίνει στο event loop):
+
+    thin_text    πολύ λίγο ορατό κείμενο (< STATIC_MIN_TEXT_CHARS)
+    spa_root     άδειο root element SPA (#root, #app, #__next, ...) ή ng-app
+                 και λίγο κείμενο (< STATIC_SPA_TEXT_CHARS)
+    noscript     <noscript> που ζητά JavaScript και λίγο κείμενο
+    http_<code> / not_html / too_large / error / unparseable
+                 το GET δεν έδωσε χρήσιμο HTML
+"""
+
+import logging
+import os
+import re
+from typing import Optional
+
+import aiohttp
+import lxml.html
+from lxml import etree
+
+from browser_pool import USER_AGENT
+
+logger = logging.getLogger(__name__)
+
+MIN_TEXT_CHARS = int(os.getenv('STATIC_MIN_TEXT_CHARS', 300))
+SPA_TEXT_CHARS = int(os.getenv('STATIC_SPA_TEXT_CHARS', 1500))
+
+SPA_ROOT_IDS = ('root', 'app', '__next', '__nuxt', '___gatsby', 'svelte', 'q-app')
+_SPA_ROOT_XPATH = etree.XPath(
+    '//*[' + ' or '.join(f"@id='{root_id}'" for root_id in SPA_ROOT_IDS) + ' or @ng-app]'
+)
+# Αποτυχίες του GET που ο browser δεν θα διορθώσει (η σελίδα δεν υπάρχει / δεν είναι HTML)
+NO_BROWSER_REASONS = frozenset({'http_404', 'http_410', 'not_html'})
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+
+class StaticResult:
+    __slots__ = ("url", "status", "html", "reason")
+
+    def __init__(self, url: str, status: int = 0, html: Optional[str] = None, reason: Optional[str] = None):
+        self.url = url  # το τελικό URL μετά από redirects όταν υπάρχει html
+        self.status = status
+        self.html = html
+        self.reason = reason  # γιατί το GET δεν έδωσε HTML (html = None)
+
+
+def _visible_text_length(root) -> int:
+    etree.strip_elements(root, 'script', 'style', 'noscript', 'template', with_tail=False)
+    body = root.find('body')
+    text = (body if body is not None else root).text_content()
+    return len(' '.join(text.split()))
+
+
+def needs_browser(html: str) -> Optional[str]:
+    """
+    Ο λόγος που η σελίδα θέλει browser, ή None αν το στατικό HTML αρκεί
+    """
+    try:
+        root = lxml.html.document_fromstring(html.encode('utf-8'),
+                                             parser=lxml.html.HTMLParser(encoding='utf-8'))
+    except (etree.ParserError, ValueError):
+        return "unparseable"
+
+    spa_root = any(not ' '.join(el.text_content().split()) or el.get('ng-app') is not None
+                   for el in _SPA_ROOT_XPATH(root))
+    noscript_js = any('javascript' in el.text_content().lower() for el in root.iter('noscript'))
+
+    text_chars = _visible_text_length(root)
+    if text_chars < MIN_TEXT_CHARS:
+        return "thin_text"
+    if spa_root and text_chars < SPA_TEXT_CHARS:
+        return "spa_root"
+    if noscript_js and text_chars < SPA_TEXT_CHARS:
+        return "noscript"
+    return None
+
+
+def _decode(body: bytes, charset: Optional[str]) -> str:
+    if not charset:
+        match = _META_CHARSET.search(body[:4096])
+        charset = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        return body.decode(charset, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+class StaticFetcher:
+    def __init__(self, timeout: float = 10, max_connections: int = 32, max_per_host: int = 4,
+                 max_bytes: int = 5 * 1024 * 1024):
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.max_bytes = max_bytes
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    def from_env(cls) -> "StaticFetcher":
+        return cls(
+            timeout=float(os.getenv('STATIC_FETCH_TIMEOUT', 10)),
+            max_connections=int(os.getenv('STATIC_FETCH_MAX_CONNECTIONS', 32)),
+            max_per_host=int(os.getenv('STATIC_FETCH_MAX_PER_HOST', 4)),
+            max_bytes=int(os.getenv('STATIC_FETCH_MAX_BYTES', 5 * 1024 * 1024)),
+        )
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_per_host),
+                timeout=self.timeout,
+                headers={'User-Agent': USER_AGENT, 'Accept': 'text/html,application/xhtml+xml'},
+            )
+        return self._session
+
+    async def fetch(self, url: str) -> StaticResult:
+        """
+        GET της σελίδας· δεν πετάει εξαιρέσεις, αποτυχία = html None με reason
+        """
+        try:
+            async with self._get_session().get(url, allow_redirects=True) as resp:
+                if resp.status >= 400:
+                    return StaticResult(url, resp.status, reason=f"http_{resp.status}")
+                if resp.content_type not in ('text/html', 'application/xhtml+xml'):
+                    return StaticResult(url, resp.status, reason="not_html")
+                if (resp.content_length or 0) > self.max_bytes:
+                    return StaticResult(url, resp.status, reason="too_large")
+                body = bytearray()
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    body += chunk
+                    if len(body) > self.max_bytes:
+                        return StaticResult(url, resp.status, reason="too_large")
+                return StaticResult(str(resp.url), resp.status, _decode(bytes(body), resp.charset))
+        except Exception as e:
+            logger.debug("Static fetch failed for %s: %s", url, e)
+            return StaticResult(url, reason="error")
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+_fetcher: Optional[StaticFetcher] = None
+
+
+def get_static_fetcher() -> StaticFetcher:
+    """
+    Ο κοινός fetcher του process (ένα connection pool για όλα τα scraping jobs)
+    """
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = StaticFetcher.from_env()
+    return _fetcher
+
+
+async def close_static_fetcher() -> None:
+    global _fetcher
+    if _fetcher is not None:
+        await _fetcher.close()
+        _fetcher = None
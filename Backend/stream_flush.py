@@ -0,0 +1,150 @@
+import asyncio
+import os
+from collections import deque
+from typing import Any, AsyncIterator, Deque, List, Optional
+
+import anyio
+
+
+class FlushPolicy:
+    """
+    Πότε ένα SSE frame στέλνεται στον client: όταν μαζευτούν max_chars
+    χαρακτήρες ή όταν περάσει interval_ms από το πρώτο buffered delta.
+    Το πρώτο delta στέλνεται πάντα αμέσως για να μη χαθεί το time-to-first-token.
+    """
+
+    def __init__(self, interval_ms: float = 30, max_chars: int = 64):
+        self.interval = max(interval_ms, 0) / 1000
+        self.max_chars = max(max_chars, 1)
+
+    @classmethod
+    def from_env(cls) -> "FlushPolicy":
+        return cls(
+            interval_ms=float(os.getenv('SSE_FLUSH_INTERVAL_MS', 30)),
+            max_chars=int(os.getenv('SSE_FLUSH_MAX_CHARS', 64)),
+        )
+
+
+class StreamReader:
+    """
+    Διαβάζει ένα async iterator σε ένα task για όλο το stream. Ο consumer
+    περιμένει το επόμενο item με timeout χωρίς να ακυρώνει την ανάγνωση
+    που είναι σε εξέλιξη και χωρίς νέο task ανά item.
+    """
+
+    END = object()
+
+    def __init__(self, source: AsyncIterator[Any]):
+        self._source = source.__aiter__()
+        self._items: Deque[Any] = deque()
+        self._error: Optional[BaseException] = None
+        self._done = False
+        self._waiter: Optional[asyncio.Future] = None
+        self._task = asyncio.ensure_future(self._pump())
+
+    async def _pump(self) -> None:
+        try:
+            async for item in self._source:
+                self._items.append(item)
+                self._wake()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._wake()
+
+    def _wake(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def next(self, timeout: Optional[float] = None) -> Any:
+        """
+        Το επόμενο item ή END· asyncio.TimeoutError αν δεν ήρθε μέσα σε timeout
+        """
+        if not self._items and not self._done:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                done, _ = await asyncio.wait((self._waiter,), timeout=timeout)
+            finally:
+                self._waiter = None
+            if not done:
+                raise asyncio.TimeoutError()
+        if self._items:
+            return self._items.popleft()
+        if self._error is not None:
+            raise self._error
+        return self.END
+
+    async def aclose(self) -> None:
+        """
+        Σταματά την ανάγνωση, περιμένει το task να τελειώσει και κλείνει το source
+        """
+        self._task.cancel()
+        with anyio.CancelScope(shield=True):
+            await asyncio.wait((self._task,))
+            aclose = getattr(self._source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+async def coalesce_deltas(deltas: AsyncIterator[str], policy: FlushPolicy) -> AsyncIterator[str]:
+    """
+    Ενώνει τα deltas του upstream σε frames σύμφωνα με το policy.
+
+    Τα deltas διαβάζονται από ένα StreamReader ώστε το time window να
+    λήγει ακόμα κι αν το upstream σταματήσει για λίγο.
+    """
+    loop = asyncio.get_running_loop()
+    reader = StreamReader(deltas)
+    buffer: List[str] = []
+    buffered = 0
+    deadline: Optional[float] = None
+    first_sent = False
+
+    try:
+        while True:
+            timeout = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                delta = await reader.next(timeout)
+            except asyncio.TimeoutError:
+                # Έληξε το time window με δεδομένα στο buffer
+                yield ''.join(buffer)
+                buffer.clear()
+                buffered = 0
+                deadline = None
+                continue
+
+            if delta is StreamReader.END:
+                break
+            if not delta:
+                continue
+
+            if not first_sent:
+                first_sent = True
+                yield delta
+                continue
+
+            buffer.append(delta)
+            buffered += len(delta)
+
+            if buffered >= policy.max_chars or policy.interval == 0:
+                yield ''.join(buffer)
+                buffer.clear()
+                buffered = 0
+                deadline = None
+            elif deadline is None:
+                deadline = loop.time() + policy.interval
+
+        if buffer:
+            yield ''.join(buffer)
+    finally:
+        await reader.aclose()
+
+
+async def replay_text(text: str, policy: FlushPolicy) -> AsyncIterator[str]:
+    """
+    Στέλνει ένα έτοιμο κείμενο (π.χ. από cache) σε frames ίδιου μεγέθους
+    με αυτά του live stream, ώστε ο client να μη βλέπει διαφορά.
+    """
+    for start in range(0, len(text), policy.max_chars):
+        yield text[start:start + policy.max_chars]
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, Optional
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+
+def _json_types(company: dict) -> dict:
+    """
+    Οι στήλες που δεν είναι JSON (created_at / updated_at, DECIMAL) σε ISO string / float,
+    ώστε το company_data να έχει τους ίδιους τύπους είτε ήρθε από το MySQL είτε από το L2
+    """
+    converted = {}
+    for column, value in company.items():
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)
+        converted[column] = value
+    return converted
+
+
+class TenantConfigCache:
+    """
+    Cache δύο επιπέδων για τα στοιχεία εταιρείας (γραμμή του companies):
+    - L1: LRU με TTL μέσα στο process
+    - L2: Redis, κοινό για όλους τους workers
+    Όταν αλλάζει μια εταιρεία, το invalidate() σβήνει το L2 και στέλνει
+    μήνυμα μέσω Redis pub/sub ώστε κάθε worker να καθαρίσει το L1 του.
+    Ο loader είναι coroutine που διαβάζει από το MySQL pool. Ταυτόχρονα
+    misses για την ίδια εταιρεία μοιράζονται ένα load (ένα query, όχι stampede).
+    """
+
+    def __init__(self, redis_client: aioredis.Redis, loader: Callable[[str], Awaitable[Optional[dict]]],
+                 max_entries: int = 512, l1_ttl: float = 60, l2_ttl: int = 600,
+                 key_prefix: str = "tenant_config:", channel: str = "tenant_config:invalidate"):
+        self.redis = redis_client
+        self.loader = loader
+        self.max_entries = max_entries
+        self.l1_ttl = l1_ttl
+        self.l2_ttl = l2_ttl
+        self.key_prefix = key_prefix
+        self.channel = channel
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener: Optional[asyncio.Task] = None
+        self._loads: Dict[str, asyncio.Task] = {}  # api_key -> load σε εξέλιξη (L2 + MySQL)
+        self.counters = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    # ---------- lookups ----------
+    async def get(self, api_key: str) -> Optional[dict]:
+        company = self._get_l1(api_key)
+        if company is not None:
+            self._count("l1_hits")
+            return company
+
+        load = self._loads.get(api_key)
+        if load is None:
+            load = self._loads[api_key] = asyncio.ensure_future(self._load(api_key))
+            load.add_done_callback(lambda task: self._loads.pop(api_key, None) if self._loads.get(api_key) is task else None)
+        else:
+            self._count("coalesced")
+        # shield: αν ακυρωθεί ένα request, το load συνεχίζει για τους υπόλοιπους
+        return await asyncio.shield(load)
+
+    async def _load(self, api_key: str) -> Optional[dict]:
+        load = asyncio.current_task()
+        company = await self._get_l2(api_key)
+        if company is not None:
+            self._count("l2_hits")
+        else:
+            self._count("misses")
+            company = await self.loader(api_key)
+            if company is not None:
+                company = _json_types(company)
+            if company is not None and self._loads.get(api_key) is load:
+                await self._set_l2(api_key, company)
+
+        # Αν έγινε invalidate όσο διαβάζαμε, δεν γράφουμε την (ίσως παλιά) τιμή στο L1
+        if company is not None and self._loads.get(api_key) is load:
+            self._set_l1(api_key, company)
+        return company
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _get_l1(self, api_key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(api_key)
+            if entry is None:
+                return None
+            expires_at, company = entry
+            if expires_at < time.monotonic():
+                del self._entries[api_key]
+                return None
+            self._entries.move_to_end(api_key)
+            return company
+
+    def _set_l1(self, api_key: str, company: dict) -> None:
+        with self._lock:
+            self._entries[api_key] = (time.monotonic() + self.l1_ttl, company)
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def _get_l2(self, api_key: str) -> Optional[dict]:
+        try:
+            raw = await self.redis.get(self.key_prefix + api_key)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"Tenant cache L2 read failed: {e}")
+            return None
+
+    async def _set_l2(self, api_key: str, company: dict) -> None:
+        try:
+            await self.redis.set(self.key_prefix + api_key, json.dumps(company), ex=self.l2_ttl)
+        except Exception as e:
+            logger.warning(f"Tenant cache L2 write failed: {e}")
+
+    # ---------- invalidation ----------
+    async def invalidate(self, api_key: str) -> None:
+        """
+        Καλείται μετά από κάθε UPDATE στη γραμμή της εταιρείας
+        """
+        self._count("invalidations")
+        self._drop_l1(api_key)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.delete(self.key_prefix + api_key)
+            pipe.publish(self.channel, api_key)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Tenant cache invalidation broadcast failed: {e}")
+
+    def _drop_l1(self, api_key: str) -> None:
+        with self._lock:
+            self._entries.pop(api_key, None)
+        # Ένα load σε εξέλιξη μπορεί να έχει διαβάσει την παλιά γραμμή: τα επόμενα gets ξεκινούν νέο
+        self._loads.pop(api_key, None)
+
+    def _on_invalidate_message(self, message: dict) -> None:
+        api_key = message.get("data")
+        if isinstance(api_key, bytes):
+            api_key = api_key.decode()
+        if api_key:
+            self._drop_l1(api_key)
+
+    def start_listener(self) -> None:
+        """
+        Ξεκινά task στο event loop που ακούει το κανάλι invalidation
+        """
+        if self._listener is not None:
+            return
+        self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._on_invalidate_message(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Χάθηκε η σύνδεση: ό,τι είναι στο L1 λήγει μόνο του με το TTL, ξανασυνδεόμαστε
+                logger.error(f"Tenant cache listener error, reconnecting: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def stop_listener(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    # ---------- metrics ----------
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters["l1_hits"] + counters["l2_hits"] + counters["misses"] + counters["coalesced"]
+        hits = counters["l1_hits"] + counters["l2_hits"]
+        return {
+            **counters,
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "l1_size": len(self._entries),
+        }
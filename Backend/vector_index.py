@@ -0,0 +1,216 @@
+"""
+Vector Index Module
+Τοπικό semantic index ανά εταιρεία: τα embeddings των chunks αποθηκεύονται
+ως ενιαίος float32 πίνακας (.npy) και φορτώνονται με memory-map, ώστε όλοι
+οι workers να μοιράζονται το ίδιο page cache αντί για δικά τους αντίγραφα.
+Τα embeddings υπολογίζονται offline από pluggable embedder (π.χ. hashing).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from knowledge_index import KNOWLEDGE_DIR, tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class HashingEmbedder:
+    """
+    Feature hashing πάνω σε λέξεις, bigrams λέξεων και char n-grams.
+    Δεν χρειάζεται εκπαίδευση ούτε δίκτυο και είναι ντετερμινιστικό
+    ανάμεσα σε processes (crc32 αντί για το salted hash() της Python).
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 512, char_ngram: int = 3):
+        self.dim = dim
+        self.char_ngram = char_ngram
+
+    def params(self) -> Dict[str, int]:
+        return {"dim": self.dim, "char_ngram": self.char_ngram}
+
+    def _features(self, text: str) -> List[Tuple[str, float]]:
+        words = tokenize(text)
+        features = [(w, 1.0) for w in words]
+        features += [(f"{a}_{b}", 0.5) for a, b in zip(words, words[1:])]
+        n = self.char_ngram
+        for w in words:
+            padded = f"#{w}#"
+            # Τα char n-grams πιάνουν κλίσεις/καταλήξεις (π.χ. "τιμή" / "τιμές")
+            features += [(padded[i:i + n], 0.3) for i in range(len(padded) - n + 1)]
+        return features
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                matrix[row, h % self.dim] += sign * weight
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+# Διαθέσιμοι embedders: το όνομα και οι παράμετροι γράφονται στο metadata
+# του index ώστε η ερώτηση να γίνεται embed με τον ίδιο τρόπο
+EMBEDDERS: Dict[str, Callable[..., Callable[[Sequence[str]], np.ndarray]]] = {
+    HashingEmbedder.name: HashingEmbedder,
+}
+
+
+def default_embedder():
+    name = os.getenv('VECTOR_EMBEDDER', HashingEmbedder.name)
+    return EMBEDDERS[name](dim=int(os.getenv('VECTOR_DIM', 512)))
+
+
+class VectorIndex:
+    """
+    Πίνακας (n_chunks x dim) με κανονικοποιημένα vectors. Η γραμμή i
+    αντιστοιχεί στο chunk i του BM25 index της ίδιας εταιρείας.
+    """
+
+    def __init__(self, matrix: np.ndarray, embedder):
+        self.matrix = matrix
+        self.embedder = embedder
+
+    @classmethod
+    def build(cls, texts: Sequence[str], embedder=None, batch_size: int = 256) -> "VectorIndex":
+        embedder = embedder or default_embedder()
+        matrix = np.zeros((len(texts), embedder.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            matrix[start:start + batch_size] = embedder(texts[start:start + batch_size])
+        return cls(matrix, embedder)
+
+    def search(self, query: str, top_k: int = 6, block_rows: int = 16384) -> List[Tuple[int, float]]:
+        return self.search_many([query], top_k, block_rows)[0]
+
+    def search_many(self, queries: Sequence[str], top_k: int = 6,
+                    block_rows: int = 16384) -> List[List[Tuple[int, float]]]:
+        """
+        Batched dot-product top-k: όλες οι ερωτήσεις μαζί απέναντι σε blocks
+        του πίνακα, ώστε να διαβάζεται κάθε σελίδα του mmap μία φορά.
+        Επιστρέφει για κάθε ερώτηση λίστα (chunk_id, score) με φθίνουσα σειρά.
+        """
+        n = self.matrix.shape[0]
+        if n == 0 or not queries:
+            return [[] for _ in queries]
+
+        q = self.embedder(queries)
+        k = min(top_k, n)
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+        for start in range(0, n, block_rows):
+            block = self.matrix[start:start + block_rows]
+            scores = q @ block.T
+            kk = min(k, scores.shape[1])
+            part = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+            best_ids = np.concatenate([best_ids, part + start], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, part, axis=1)], axis=1)
+
+            # Κρατάμε μόνο τα k καλύτερα ως τώρα
+            if best_ids.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_ids = np.take_along_axis(best_ids, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        results = []
+        for row in range(len(queries)):
+            results.append([
+                (int(best_ids[row, i]), float(best_scores[row, i]))
+                for i in order[row]
+                if best_scores[row, i] > 0
+            ])
+        return results
+
+
+_loaded_vectors: "OrderedDict[str, Optional[VectorIndex]]" = OrderedDict()
+_loaded_lock = threading.Lock()
+_MAX_LOADED = int(os.getenv('VECTOR_INDEX_CACHE_SIZE', 256))
+
+
+def _paths(api_key: str) -> Tuple[str, str]:
+    base = os.path.join(KNOWLEDGE_DIR, api_key)
+    return base + ".vectors.npy", base + ".vectors.json"
+
+
+def save_vector_index(api_key: str, index: VectorIndex) -> str:
+    os.makedirs(KNOWLEDGE_DIR, exist_ok=True)
+    matrix_path, meta_path = _paths(api_key)
+
+    tmp_path = matrix_path + ".tmp.npy"
+    np.save(tmp_path, np.ascontiguousarray(index.matrix, dtype=np.float32))
+    os.replace(tmp_path, matrix_path)
+
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": 1,
+            "embedder": index.embedder.name,
+            "params": index.embedder.params(),
+            "rows": int(index.matrix.shape[0]),
+        }, f)
+    return matrix_path
+
+
+def build_vector_index(api_key: str, texts: Sequence[str], embedder=None) -> VectorIndex:
+    """
+    Χτίζει και αποθηκεύει τα vectors των chunks (καλείται στη δημιουργία του chatbot)
+    """
+    index = VectorIndex.build(texts, embedder)
+    save_vector_index(api_key, index)
+    with _loaded_lock:
+        # Το επόμενο load θα ανοίξει το αρχείο με mmap αντί να κρατάμε αντίγραφο στη μνήμη
+        _loaded_vectors.pop(api_key, None)
+    logger.info(f"Vector index built for {api_key}: {index.matrix.shape[0]} x {index.matrix.shape[1]}")
+    return index
+
+
+def load_vector_index(api_key: str) -> Optional[VectorIndex]:
+    """
+    Ανοίγει τα vectors μιας εταιρείας με mmap (read-only) ή None αν δεν υπάρχουν
+    """
+    with _loaded_lock:
+        if api_key in _loaded_vectors:
+            _loaded_vectors.move_to_end(api_key)
+            return _loaded_vectors[api_key]
+
+    index = None
+    matrix_path, meta_path = _paths(api_key)
+    if os.path.exists(matrix_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            embedder = EMBEDDERS[meta["embedder"]](**meta.get("params", {}))
+            matrix = np.load(matrix_path, mmap_mode="r")
+            index = VectorIndex(matrix, embedder)
+        except Exception as e:
+            logger.error(f"Failed to load vector index {matrix_path}: {e}")
+
+    with _loaded_lock:
+        _loaded_vectors[api_key] = index
+        _loaded_vectors.move_to_end(api_key)
+        while len(_loaded_vectors) > _MAX_LOADED:
+            _loaded_vectors.popitem(last=False)
+    return index
+
+
+async def load_vector_index_async(api_key: str) -> Optional[VectorIndex]:
+    """
+    Το load_vector_index για async handlers: το άνοιγμα των αρχείων γίνεται σε thread
+    """
+    with _loaded_lock:
+        if api_key in _loaded_vectors:
+            _loaded_vectors.move_to_end(api_key)
+            return _loaded_vectors[api_key]
+    return await asyncio.to_thread(load_vector_index, api_key)